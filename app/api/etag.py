@@ -0,0 +1,44 @@
+import hashlib
+from typing import Any, Optional, Sequence
+
+from fastapi import Request, Response, status
+
+
+def _etag(data: str) -> str:
+    return f'"{hashlib.blake2b(data.encode(), digest_size=16).hexdigest()}"'
+
+
+def entity_etag(entity: Any) -> str:
+    """Strong ETag of one row, from its id and date_modification (an ORM row, a narrow Row or a schema)"""
+    return _etag(f"{entity.id}:{entity.date_modification.isoformat()}")
+
+
+def collection_etag(entities: Sequence[Any], variant: str = "") -> str:
+    """
+    Strong ETag of a page: the latest date_modification catches updates, the ordered
+    ids catch rows entering, leaving or moving within the page. variant tells apart
+    representations of the same rows (e.g. with embedded relations).
+    """
+    latest = max((entity.date_modification for entity in entities), default=None)
+    ids = ",".join(str(entity.id) for entity in entities)
+    return _etag(f"{variant}:{latest.isoformat() if latest else ''}:{ids}")
+
+
+def has_preconditions(request: Request) -> bool:
+    return "if-none-match" in request.headers
+
+
+def not_modified(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """
+    Set the ETag header and, if the client already has this version, return the
+    304 to send instead of the body (with the headers already set on response).
+    """
+    response.headers["ETag"] = etag
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    # GET uses the weak comparison: W/ prefixes are ignored
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(response.headers))
+    return None
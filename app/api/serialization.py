@@ -0,0 +1,20 @@
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app.config import settings
+
+
+def json_response(adapter: TypeAdapter, data: Any, response: Response) -> Any:
+    """
+    Serialize data already validated by the service straight to JSON bytes.
+
+    Returning a Response makes FastAPI skip its response_model pass (a second
+    validation, jsonable_encoder and json.dumps); response_model still documents
+    the endpoint. Headers set on the injected response are carried over. With
+    FAST_SERIALIZATION off, data is returned as is for FastAPI to serialize.
+    """
+    if not settings.FAST_SERIALIZATION:
+        return data
+    return Response(content=adapter.dump_json(data), media_type="application/json", headers=dict(response.headers))
@@ -1,9 +1,11 @@
 from fastapi import APIRouter
 
-from app.api.v1 import categories, products, stock
+from app.api.v1 import categories, changes, products, reservations, stock
 
 api_router = APIRouter()
 
 api_router.include_router(products.router)
 api_router.include_router(categories.router)
 api_router.include_router(stock.router)
+api_router.include_router(reservations.router)
+api_router.include_router(changes.router)
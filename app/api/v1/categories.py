@@ -1,49 +1,79 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.api.etag import collection_etag, entity_etag, has_preconditions, not_modified
+from app.api.serialization import json_response
+from app.database import get_async_db
+from app.schemas.adapters import category_adapter, category_list_adapter
 from app.schemas.category import CategoryCreate, CategoryResponse, CategoryUpdate
-from app.services.category_service import CategoryService
+from app.services.category_service import AsyncCategoryService
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
 
 @router.get("/", response_model=List[CategoryResponse])
-def get_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_categories(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
     """Get all categories"""
-    service = CategoryService(db)
-    return service.get_categories(skip, limit)
+    service = AsyncCategoryService(db)
+    try:
+        categories = await service.get_categories(skip, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    next_cursor = service.next_cursor(categories, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return not_modified(request, response, collection_etag(categories)) or json_response(
+        category_list_adapter, categories, response
+    )
 
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-def get_category(category_id: UUID, db: Session = Depends(get_db)):
+async def get_category(
+    category_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
     """Get a specific category by ID"""
-    service = CategoryService(db)
-    category = service.get_category(category_id)
+    service = AsyncCategoryService(db)
+    if has_preconditions(request):
+        # Revalidation only needs (id, date_modification)
+        version = await service.get_category_version(category_id)
+        unchanged = version and not_modified(request, response, entity_etag(version))
+        if unchanged:
+            return unchanged
+
+    category = await service.get_category(category_id)
     if not category:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Category with id {category_id} not found")
-    return category
+    response.headers["ETag"] = entity_etag(category)
+    return json_response(category_adapter, category, response)
 
 
 @router.post("/", response_model=CategoryResponse, status_code=status.HTTP_201_CREATED)
-def create_category(category: CategoryCreate, db: Session = Depends(get_db)):
+async def create_category(category: CategoryCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new category"""
-    service = CategoryService(db)
+    service = AsyncCategoryService(db)
     try:
-        return service.create_category(category)
+        return await service.create_category(category)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.put("/{category_id}", response_model=CategoryResponse)
-def update_category(category_id: UUID, category_update: CategoryUpdate, db: Session = Depends(get_db)):
+async def update_category(category_id: UUID, category_update: CategoryUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update a category"""
-    service = CategoryService(db)
+    service = AsyncCategoryService(db)
     try:
-        updated_category = service.update_category(category_id, category_update)
+        updated_category = await service.update_category(category_id, category_update)
         if not updated_category:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=f"Category with id {category_id} not found"
@@ -54,9 +84,9 @@ def update_category(category_id: UUID, category_update: CategoryUpdate, db: Sess
 
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(category_id: UUID, db: Session = Depends(get_db)):
+async def delete_category(category_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """Delete a category"""
-    service = CategoryService(db)
-    if not service.delete_category(category_id):
+    service = AsyncCategoryService(db)
+    if not await service.delete_category(category_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Category with id {category_id} not found")
     return None
@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+
+from app.api.serialization import json_response
+from app.database import get_db
+from app.schemas.adapters import change_feed_adapter
+from app.schemas.change import ChangeFeed
+from app.services.change_service import ChangeService, ResyncRequired
+
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+
+@router.get("", response_model=ChangeFeed)
+def get_changes(
+    response: Response,
+    since: Optional[str] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db),
+):
+    """
+    Category, product and stock changes after `since`, in commit order, for incremental sync.
+
+    Without `since` the feed starts with one entry per entity of the catalog. Pass the
+    returned `next_token` as `since` to resume; `has_more` means the next page is ready.
+    Deletions are tombstones (`operation` = "delete"), kept a limited time: a token older
+    than that gets 410 and the client has to sync again from the beginning.
+    """
+    try:
+        feed = ChangeService(db).get_changes(since, limit)
+    except ResyncRequired as e:
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_response(change_feed_adapter, feed, response)
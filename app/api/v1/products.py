@@ -1,125 +1,281 @@
+import csv
+import io
+import json
 import logging
-from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, AsyncIterator, FrozenSet, Iterator, List, Mapping, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.database import get_db
-from app.events.producer import event_producer
+from app.api.etag import collection_etag, entity_etag, has_preconditions, not_modified
+from app.api.serialization import json_response
+from app.config import settings
+from app.database import get_async_db, get_db
 from app.models.product import ProductStatus
-from app.schemas.event import EventType
-from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate
-from app.services.product_service import ProductService
+from app.schemas.adapters import PRODUCT_INCLUDE_MODELS, product_include_adapters, product_list_include_adapters
+from app.schemas.product import (
+    ProductBulkResponse,
+    ProductCreate,
+    ProductResponse,
+    ProductUpdate,
+    ProductWithRelations,
+)
+from app.services.product_service import AsyncProductService, ProductService
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/products", tags=["products"])
 
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+EXPORT_MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+EXPORT_CHUNK_ROWS = 500
+INCLUDE_NAMES = frozenset().union(*PRODUCT_INCLUDE_MODELS)
 
-@router.get("/", response_model=List[ProductResponse])
-def get_products(
+
+def parse_include(
+    include: Optional[str] = Query(None, description="Relations à embarquer, séparées par des virgules: stock,category")
+) -> FrozenSet[str]:
+    names = frozenset(name.strip() for name in include.split(",") if name.strip()) if include else frozenset()
+    unknown = names - INCLUDE_NAMES
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown include: {', '.join(sorted(unknown))}"
+        )
+    return names
+
+
+def _products_etag(products: List[ProductResponse], include: FrozenSet[str]) -> str:
+    # Embedded rows change the representation without touching the product
+    entities = list(products)
+    for product in products:
+        if "stock" in include and product.stock:
+            entities.append(product.stock)
+        if "category" in include and product.categorie:
+            entities.append(product.categorie)
+    return collection_etag(entities, ",".join(sorted(include)))
+
+
+@router.get("/", response_model=List[ProductWithRelations], response_model_exclude_unset=True)
+async def get_products(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
-    status: Optional[ProductStatus] = None,
+    cursor: Optional[str] = None,
+    product_status: Optional[ProductStatus] = Query(None, alias="status"),
     category_id: Optional[UUID] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    include: FrozenSet[str] = Depends(parse_include),
+    db: AsyncSession = Depends(get_async_db),
 ):
-    """Get all products with optional filtering"""
-    service = ProductService(db)
+    """
+    Get all products with optional filtering.
+    Pass the X-Next-Cursor header of a page as `cursor` to fetch the next one.
+    Send the ETag of a page back in If-None-Match to get a 304 if it has not changed.
+    `include=stock,category` embeds the stock and category of each product.
+    """
+    service = AsyncProductService(db)
 
     if search:
-        return service.search_products(search, skip, limit)
-    elif category_id:
-        return service.get_products_by_category(category_id, skip, limit)
+        products = await service.search_products(search, skip, limit, include)
     else:
-        return service.get_products(skip, limit, status)
+        try:
+            if category_id:
+                products = await service.get_products_by_category(category_id, skip, limit, cursor, include)
+            else:
+                products = await service.get_products(skip, limit, product_status, cursor, include)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+        next_cursor = service.next_cursor(products, limit)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+
+    return not_modified(request, response, _products_etag(products, include)) or json_response(
+        product_list_include_adapters[include], products, response
+    )
 
 
-@router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: UUID, db: Session = Depends(get_db)):
-    """Get a specific product by ID"""
+@router.get("/export", response_class=StreamingResponse)
+def export_products(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    product_status: Optional[ProductStatus] = Query(None, alias="status"),
+    category_id: Optional[UUID] = None,
+    search: Optional[str] = None,
+    include_stock: bool = False,
+    db: Session = Depends(get_db),
+):
+    """
+    Stream the whole catalog as CSV or NDJSON.
+    Takes the list filters, plus include_stock to add the stock levels of each product.
+    """
     service = ProductService(db)
-    product = service.get_product(product_id)
+    rows = service.export_products(product_status, category_id, search, include_stock)
+    chunks = _csv_chunks(rows) if export_format == "csv" else _ndjson_chunks(rows)
+    # The session from get_db stays open until the response has been fully sent
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="products.{export_format}"'},
+    )
+
+
+def _export_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def _csv_chunks(rows: Iterator[Mapping[str, Any]]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = None
+    for count, row in enumerate(rows, start=1):
+        if writer is None:
+            writer = csv.writer(buffer)
+            writer.writerow(row.keys())
+        writer.writerow(_export_value(value) for value in row.values())
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows: Iterator[Mapping[str, Any]]) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({key: _export_value(value) for key, value in row.items()}, ensure_ascii=False))
+        if len(lines) == EXPORT_CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+@router.get("/{product_id}", response_model=ProductWithRelations, response_model_exclude_unset=True)
+async def get_product(
+    product_id: UUID,
+    request: Request,
+    response: Response,
+    include: FrozenSet[str] = Depends(parse_include),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Get a specific product by ID, with `include=stock,category` to embed its stock and category"""
+    service = AsyncProductService(db)
+    if has_preconditions(request) and not include:
+        # Revalidation only needs (id, date_modification)
+        version = await service.get_product_version(product_id)
+        unchanged = version and not_modified(request, response, entity_etag(version))
+        if unchanged:
+            return unchanged
+
+    product = await service.get_product(product_id, include)
     if not product:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {product_id} not found")
-    return product
+    etag = _products_etag([product], include) if include else entity_etag(product)
+    return not_modified(request, response, etag) or json_response(product_include_adapters[include], product, response)
 
 
 @router.post("/", response_model=ProductResponse, status_code=status.HTTP_201_CREATED)
-async def create_product(product: ProductCreate, db: Session = Depends(get_db)):
-    """Create a new product"""
-    service = ProductService(db)
+async def create_product(product: ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    """Create a new product (its PRODUCT_CREATED event is written to the outbox in the same transaction)"""
+    service = AsyncProductService(db)
     try:
-        created_product = service.create_product(product)
-
-        # Publish event
-        try:
-            await event_producer.publish_event(
-                EventType.PRODUCT_CREATED,
-                {
-                    "product_id": str(created_product.id),
-                    "sku": created_product.sku,
-                    "nom": created_product.nom,
-                    "statut": created_product.statut.value,
-                },
-            )
-        except Exception as e:
-            # Log error but don't fail the request
-            logger.error(f"Failed to publish event: {e}")
-
-        return created_product
+        return await service.create_product(product)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.put("/{product_id}", response_model=ProductResponse)
-async def update_product(product_id: UUID, product_update: ProductUpdate, db: Session = Depends(get_db)):
-    """Update a product"""
+@router.post(
+    "/bulk",
+    response_model=ProductBulkResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/ProductCreate"}}
+                },
+                "application/x-ndjson": {"schema": {"type": "string", "description": "One ProductCreate per line"}},
+            },
+        }
+    },
+)
+async def bulk_create_products(request: Request, db: Session = Depends(get_db)):
+    """
+    Import products from a JSON array or an NDJSON stream.
+    Rows are inserted in transactions of BULK_BATCH_SIZE rows; the response reports every row.
+    """
     service = ProductService(db)
-    try:
-        updated_product = service.update_product(product_id, product_update)
-        if not updated_product:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {product_id} not found")
+    report = ProductBulkResponse(created=0, failed=0, results=[])
+    seen_skus: set = set()
 
-        # Publish event
+    async for batch in _iter_bulk_batches(request, settings.BULK_BATCH_SIZE):
+        results, _ = await run_in_threadpool(service.bulk_create_products, batch, len(report.results), seen_skus)
+        report.results.extend(results)
+
+    report.created = sum(result.status == "created" for result in report.results)
+    report.failed = len(report.results) - report.created
+    return report
+
+
+async def _iter_bulk_batches(request: Request, batch_size: int) -> AsyncIterator[List[Any]]:
+    """Split the request body into batches of rows, streaming NDJSON line by line"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+
+    if content_type not in NDJSON_CONTENT_TYPES:
         try:
-            await event_producer.publish_event(
-                EventType.PRODUCT_UPDATED,
-                {
-                    "product_id": str(updated_product.id),
-                    "sku": updated_product.sku,
-                    "nom": updated_product.nom,
-                    "statut": updated_product.statut.value,
-                },
-            )
-        except Exception as e:
-            logger.error(f"Failed to publish event: {e}")
+            rows = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body must be a JSON array")
+        for start in range(0, len(rows), batch_size):
+            yield rows[start : start + batch_size]
+        return
+
+    # NDJSON: lines are handed over unparsed, pydantic validates the JSON directly
+    batch: List[Any] = []
+    pending = b""
+    async for chunk in request.stream():
+        *lines, pending = (pending + chunk).split(b"\n")
+        batch.extend(line for line in lines if line.strip())
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if pending.strip():
+        batch.append(pending)
+    if batch:
+        yield batch
+
 
-        return updated_product
+@router.put("/{product_id}", response_model=ProductResponse)
+async def update_product(product_id: UUID, product_update: ProductUpdate, db: AsyncSession = Depends(get_async_db)):
+    """Update a product"""
+    service = AsyncProductService(db)
+    try:
+        updated_product = await service.update_product(product_id, product_update)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not updated_product:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {product_id} not found")
+    return updated_product
 
 
 @router.delete("/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_product(product_id: UUID, db: Session = Depends(get_db)):
+async def delete_product(product_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """Delete a product"""
-    service = ProductService(db)
-
-    # Get product details before deleting
-    product = service.get_product(product_id)
-    if not product:
+    service = AsyncProductService(db)
+    if not await service.delete_product(product_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {product_id} not found")
-
-    if not service.delete_product(product_id):
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Product with id {product_id} not found")
-
-    # Publish event
-    try:
-        await event_producer.publish_event(
-            EventType.PRODUCT_DELETED, {"product_id": str(product_id), "sku": product.sku}
-        )
-    except Exception as e:
-        logger.error(f"Failed to publish event: {e}")
-
     return None
@@ -0,0 +1,81 @@
+import logging
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_async_db
+from app.events.stock_alerts import stock_alert_publisher
+from app.schemas.reservation import ReservationCreate, ReservationResponse
+from app.services.reservation_service import AsyncReservationService, ReservationChange
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/stock/reservations", tags=["stock"])
+
+
+async def publish_alert(change: ReservationChange) -> None:
+    """Low stock alert or recovery when the hold moved the alert flag"""
+    try:
+        await stock_alert_publisher.publish([change.stock])
+    except Exception as e:
+        logger.error(f"Failed to publish event: {e}")
+
+
+@router.post("/", response_model=ReservationResponse, status_code=status.HTTP_201_CREATED)
+async def create_reservation(reservation: ReservationCreate, db: AsyncSession = Depends(get_async_db)):
+    """Hold stock for a product until the reservation is confirmed, released or expires"""
+    service = AsyncReservationService(db)
+    try:
+        created = await service.reserve(reservation)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not created:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Stock for product {reservation.produit_id} not found"
+        )
+    await publish_alert(created)
+    return created.reservation
+
+
+@router.get("/{reservation_id}", response_model=ReservationResponse)
+async def get_reservation(reservation_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    """Get a stock reservation by ID"""
+    service = AsyncReservationService(db)
+    reservation = await service.get_reservation(reservation_id)
+    if not reservation:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Reservation with id {reservation_id} not found"
+        )
+    return reservation
+
+
+@router.post("/{reservation_id}/confirm", response_model=ReservationResponse)
+async def confirm_reservation(reservation_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    """Confirm a reservation: the held quantity leaves the stock"""
+    service = AsyncReservationService(db)
+    try:
+        change = await service.confirm(reservation_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not change:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Reservation with id {reservation_id} not found"
+        )
+    await publish_alert(change)
+    return change.reservation
+
+
+@router.post("/{reservation_id}/release", response_model=ReservationResponse)
+async def release_reservation(reservation_id: UUID, db: AsyncSession = Depends(get_async_db)):
+    """Release a reservation: the held quantity is available again"""
+    service = AsyncReservationService(db)
+    try:
+        change = await service.release(reservation_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not change:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=f"Reservation with id {reservation_id} not found"
+        )
+    await publish_alert(change)
+    return change.reservation
@@ -1,93 +1,177 @@
 import logging
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-
-from app.database import get_db
-from app.events.producer import event_producer
-from app.schemas.event import EventType
-from app.schemas.stock import StockAdjustment, StockCreate, StockResponse, StockUpdate
-from app.services.stock_service import StockService
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.etag import collection_etag, entity_etag, has_preconditions, not_modified
+from app.api.serialization import json_response
+from app.config import settings
+from app.database import get_async_db
+from app.events.stock_alerts import stock_alert_publisher
+from app.schemas.adapters import (
+    stock_adapter,
+    stock_alert_list_adapter,
+    stock_alert_with_product_list_adapter,
+    stock_list_adapter,
+)
+from app.schemas.stock import (
+    StockAdjustment,
+    StockAlertWithProduct,
+    StockBatchAdjustment,
+    StockCreate,
+    StockResponse,
+    StockUpdate,
+)
+from app.services.stock_service import AsyncStockService
+from app.services.stock_stream import stock_stream_hub
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/stock", tags=["stock"])
 
 
 @router.get("/", response_model=List[StockResponse])
-def get_all_stocks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def get_all_stocks(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+):
     """Get all stock entries"""
-    service = StockService(db)
-    return service.get_all_stocks(skip, limit)
+    service = AsyncStockService(db)
+    try:
+        stocks = await service.get_all_stocks(skip, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
+    next_cursor = service.next_cursor(stocks, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return not_modified(request, response, collection_etag(stocks)) or json_response(
+        stock_list_adapter, stocks, response
+    )
+
+
+@router.get("/alerts", response_model=List[StockAlertWithProduct], response_model_exclude_unset=True)
+async def get_low_stock_alerts(
+    request: Request,
+    response: Response,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    include_product: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Get products with low stock alerts, most severe first (lowest disponible / minimum).
+    Pass the X-Next-Cursor header of a page as `cursor` to fetch the next one.
+    `include_product=true` adds the product sku and nom to each alert.
+    """
+    service = AsyncStockService(db)
+    try:
+        alerts = await service.get_low_stock_alerts(skip, limit, cursor, include_product)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-@router.get("/alerts", response_model=List[StockResponse])
-def get_low_stock_alerts(db: Session = Depends(get_db)):
-    """Get products with low stock alerts"""
-    service = StockService(db)
-    return service.get_low_stock_alerts()
+    next_cursor = service.next_alert_cursor(alerts, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if include_product:
+        # The page ETag only tracks the stock rows, not the joined products
+        return json_response(stock_alert_with_product_list_adapter, alerts, response)
+    return not_modified(request, response, collection_etag(alerts)) or json_response(
+        stock_alert_list_adapter, alerts, response
+    )
+
+
+@router.get("/stream")
+async def stream_stock(product_id: Optional[List[UUID]] = Query(None), alerts: bool = False):
+    """
+    Server-Sent Events stream of live stock levels: stock.updated for the given products
+    (their current level first), stock.low_alert / stock.alert_recovered for every product
+    if alerts is set. A client too slow to keep up is disconnected and should reconnect.
+    """
+    product_ids = frozenset(product_id or ())
+    if not product_ids and not alerts:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one product_id or to alerts")
+    if len(product_ids) > settings.STOCK_STREAM_MAX_PRODUCTS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.STOCK_STREAM_MAX_PRODUCTS} products per stream")
+
+    subscriber = await stock_stream_hub.subscribe(product_ids, alerts)
+    return StreamingResponse(
+        stock_stream_hub.stream(subscriber, settings.STOCK_STREAM_HEARTBEAT_SECONDS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{stock_id}", response_model=StockResponse)
-def get_stock(stock_id: UUID, db: Session = Depends(get_db)):
+async def get_stock(stock_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get a specific stock entry by ID"""
-    service = StockService(db)
-    stock = service.get_stock(stock_id)
+    service = AsyncStockService(db)
+    if has_preconditions(request):
+        # Revalidation only needs (id, date_modification)
+        version = await service.get_stock_version(stock_id)
+        unchanged = version and not_modified(request, response, entity_etag(version))
+        if unchanged:
+            return unchanged
+
+    stock = await service.get_stock(stock_id)
     if not stock:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Stock with id {stock_id} not found")
-    return stock
+    response.headers["ETag"] = entity_etag(stock)
+    return json_response(stock_adapter, stock, response)
 
 
 @router.get("/product/{product_id}", response_model=StockResponse)
-def get_stock_by_product(product_id: UUID, db: Session = Depends(get_db)):
+async def get_stock_by_product(
+    product_id: UUID, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)
+):
     """Get stock for a specific product"""
-    service = StockService(db)
-    stock = service.get_stock_by_product(product_id)
+    service = AsyncStockService(db)
+    if has_preconditions(request):
+        # Revalidation only needs (id, date_modification)
+        version = await service.get_stock_version_by_product(product_id)
+        unchanged = version and not_modified(request, response, entity_etag(version))
+        if unchanged:
+            return unchanged
+
+    stock = await service.get_stock_by_product(product_id)
     if not stock:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Stock for product {product_id} not found")
-    return stock
+    response.headers["ETag"] = entity_etag(stock)
+    return json_response(stock_adapter, stock, response)
 
 
 @router.post("/", response_model=StockResponse, status_code=status.HTTP_201_CREATED)
-def create_stock(stock: StockCreate, db: Session = Depends(get_db)):
+async def create_stock(stock: StockCreate, db: AsyncSession = Depends(get_async_db)):
     """Create a new stock entry"""
-    service = StockService(db)
+    service = AsyncStockService(db)
     try:
-        return service.create_stock(stock)
+        return await service.create_stock(stock)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 @router.put("/{stock_id}", response_model=StockResponse)
-async def update_stock(stock_id: UUID, stock_update: StockUpdate, db: Session = Depends(get_db)):
+async def update_stock(stock_id: UUID, stock_update: StockUpdate, db: AsyncSession = Depends(get_async_db)):
     """Update a stock entry"""
-    service = StockService(db)
-    updated_stock = service.update_stock(stock_id, stock_update)
-    if not updated_stock:
+    service = AsyncStockService(db)
+    try:
+        change = await service.update_stock(stock_id, stock_update)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not change:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Stock with id {stock_id} not found")
+    updated_stock = change.stock
 
-    # Publish event
+    # STOCK_UPDATED went to the outbox; low stock alert or recovery only when the alert flag changed
     try:
-        await event_producer.publish_event(
-            EventType.STOCK_UPDATED,
-            {
-                "product_id": str(updated_stock.produit_id),
-                "quantite_disponible": updated_stock.quantite_disponible,
-                "alerte_stock_bas": updated_stock.alerte_stock_bas,
-            },
-        )
-
-        # Publish low stock alert if needed
-        if updated_stock.alerte_stock_bas:
-            await event_producer.publish_event(
-                EventType.STOCK_LOW_ALERT,
-                {
-                    "product_id": str(updated_stock.produit_id),
-                    "quantite_disponible": updated_stock.quantite_disponible,
-                    "quantite_minimum": updated_stock.quantite_minimum,
-                },
-            )
+        await stock_alert_publisher.publish([change])
     except Exception as e:
         logger.error(f"Failed to publish event: {e}")
 
@@ -95,38 +179,20 @@ async def update_stock(stock_id: UUID, stock_update: StockUpdate, db: Session =
 
 
 @router.post("/product/{product_id}/adjust", response_model=StockResponse)
-async def adjust_stock(product_id: UUID, adjustment: StockAdjustment, db: Session = Depends(get_db)):
+async def adjust_stock(product_id: UUID, adjustment: StockAdjustment, db: AsyncSession = Depends(get_async_db)):
     """Adjust stock quantity for a product (add or remove)"""
-    service = StockService(db)
+    service = AsyncStockService(db)
     try:
-        updated_stock = service.adjust_stock(product_id, adjustment.quantite)
-        if not updated_stock:
+        change = await service.adjust_stock(product_id, adjustment.quantite)
+        if not change:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail=f"Stock for product {product_id} not found"
             )
+        updated_stock = change.stock
 
-        # Publish event
+        # STOCK_UPDATED went to the outbox; low stock alert or recovery only when the alert flag changed
         try:
-            await event_producer.publish_event(
-                EventType.STOCK_UPDATED,
-                {
-                    "product_id": str(updated_stock.produit_id),
-                    "quantite_disponible": updated_stock.quantite_disponible,
-                    "alerte_stock_bas": updated_stock.alerte_stock_bas,
-                    "adjustment": adjustment.quantite,
-                },
-            )
-
-            # Publish low stock alert if needed
-            if updated_stock.alerte_stock_bas:
-                await event_producer.publish_event(
-                    EventType.STOCK_LOW_ALERT,
-                    {
-                        "product_id": str(updated_stock.produit_id),
-                        "quantite_disponible": updated_stock.quantite_disponible,
-                        "quantite_minimum": updated_stock.quantite_minimum,
-                    },
-                )
+            await stock_alert_publisher.publish([change])
         except Exception as e:
             logger.error(f"Failed to publish event: {e}")
 
@@ -135,10 +201,28 @@ async def adjust_stock(product_id: UUID, adjustment: StockAdjustment, db: Sessio
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post("/adjust-batch", response_model=List[StockResponse])
+async def adjust_stock_batch(batch: StockBatchAdjustment, db: AsyncSession = Depends(get_async_db)):
+    """Apply several stock adjustments in one transaction (all or nothing)"""
+    service = AsyncStockService(db)
+    try:
+        changes = await service.adjust_stock_batch(batch.lignes)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # One STOCK_UPDATED for the whole batch went to the outbox
+    try:
+        await stock_alert_publisher.publish(changes)
+    except Exception as e:
+        logger.error(f"Failed to publish event: {e}")
+
+    return [change.stock for change in changes]
+
+
 @router.delete("/{stock_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_stock(stock_id: UUID, db: Session = Depends(get_db)):
+async def delete_stock(stock_id: UUID, db: AsyncSession = Depends(get_async_db)):
     """Delete a stock entry"""
-    service = StockService(db)
-    if not service.delete_stock(stock_id):
+    service = AsyncStockService(db)
+    if not await service.delete_stock(stock_id):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Stock with id {stock_id} not found")
     return None
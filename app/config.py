@@ -8,6 +8,12 @@ class Settings(BaseSettings):
     POSTGRES_USER: str = "user"
     POSTGRES_PASSWORD: str = "password"
     POSTGRES_DB: str = "produits_db"
+    # Per engine: the sync one (jobs, consumers, bulk import, export) and the async one of the handlers
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+
+    # Worker threads running the handlers still on sync sessions (anyio default: 40)
+    THREADPOOL_SIZE: int = 40
 
     # RabbitMQ - FOR RAILWAY PRODUCTION
     RABBITMQ_URL: Optional[str] = None  # Laisser None pour utiliser l'URL Railway
@@ -17,11 +23,95 @@ class Settings(BaseSettings):
     RABBITMQ_USERNAME: str = "guest"
     RABBITMQ_PASSWORD: str = "guest"
     RABBITMQ_VHOST: str = "/"
-    
+
     # Exchange and Queue names
     RABBITMQ_EXCHANGE: str = "mspr.events"
     RABBITMQ_QUEUE_PRODUCTS: str = "produits.queue"
 
+    # One connection per process: publisher-confirm channels; each consumer has a channel of its own
+    RABBITMQ_PUBLISH_CHANNELS: int = 4
+    RABBITMQ_CONNECT_TIMEOUT_SECONDS: float = 10
+    RABBITMQ_HEARTBEAT_SECONDS: int = 30
+
+    # Search: "fulltext" (tsvector on PostgreSQL, FTS5 on SQLite), "memory" (in-process index) or "ilike"
+    SEARCH_BACKEND: str = "fulltext"
+    SEARCH_INDEX_MAX_DOCUMENTS: int = 200000
+
+    # Read endpoints serialize service results once with precompiled TypeAdapters
+    FAST_SERIALIZATION: bool = True
+
+    # Bulk import: rows validated and inserted per transaction
+    BULK_BATCH_SIZE: int = 1000
+
+    # Read cache of single product and stock lookups: "memory" (per process), "redis" or "none"
+    CACHE_BACKEND: str = "memory"
+    CACHE_TTL_SECONDS: int = 60
+    CACHE_MAX_ENTRIES: int = 10000
+    CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Stock reservations: default and maximum hold duration, sweeper period and batch size
+    RESERVATION_TTL_SECONDS: int = 900
+    RESERVATION_MAX_TTL_SECONDS: int = 86400
+    RESERVATION_SWEEP_INTERVAL_SECONDS: int = 30
+    RESERVATION_SWEEP_BATCH_SIZE: int = 1000
+
+    # Low-stock alerts: 0 publishes each alert edge at once, > 0 merges them into one digest per window
+    STOCK_ALERT_DIGEST_SECONDS: float = 0
+
+    # Event publishing: queue bound, wait for room when full, drain batch size, retry delay, flush on shutdown
+    EVENT_QUEUE_SIZE: int = 10000
+    EVENT_ENQUEUE_TIMEOUT_SECONDS: float = 1.0
+    EVENT_BATCH_SIZE: int = 100
+    EVENT_RETRY_DELAY_SECONDS: float = 1.0
+    EVENT_FLUSH_TIMEOUT_SECONDS: float = 10.0
+
+    # Event bodies: "json" or "msgpack" (needs the msgpack package); gzip above a size (0: never)
+    EVENT_CODEC: str = "json"
+    EVENT_COMPRESSION_THRESHOLD_BYTES: int = 0
+    EVENT_COMPRESSION_LEVEL: int = 6
+
+    # Event consumer: handler tasks (prefetch is twice that), event data field keeping per-key order
+    # ("" for none), acks per basic.ack(multiple=True) and longest delay of an ack
+    CONSUMER_CONCURRENCY: int = 10
+    CONSUMER_ORDERING_KEY: str = "product_id"
+    CONSUMER_ACK_BATCH_SIZE: int = 50
+    CONSUMER_ACK_INTERVAL_SECONDS: float = 0.1
+
+    # Consumer deduplication: message ids kept in memory, in processed_messages, purged per transaction
+    DEDUP_CACHE_SIZE: int = 100000
+    DEDUP_RETENTION_HOURS: float = 72
+    DEDUP_PURGE_BATCH_SIZE: int = 10000
+
+    # Transactional outbox: relay in this process, batch size, idle poll period, retention of sent events,
+    # failed attempts after which an event is parked (date_echec) instead of retried
+    OUTBOX_RELAY_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_RETENTION_HOURS: int = 24
+    OUTBOX_MAX_ATTEMPTS: int = 10
+
+    # Order events: consumer in this process, queue, event types decrementing stock (comma-separated),
+    # orders merged per transaction and longest wait for a batch to fill
+    ORDER_CONSUMER_ENABLED: bool = True
+    RABBITMQ_QUEUE_ORDERS: str = "produits.commandes"
+    ORDER_STOCK_EVENTS: str = "order.created"
+    ORDER_BATCH_SIZE: int = 100
+    ORDER_BATCH_WINDOW_SECONDS: float = 0.2
+
+    # Change feed: compaction period and batch size, how long deletions stay in the log
+    # (older resume tokens get 410 Gone)
+    CHANGE_LOG_COMPACT_INTERVAL_SECONDS: int = 300
+    CHANGE_LOG_COMPACT_BATCH_SIZE: int = 10000
+    CHANGE_LOG_TOMBSTONE_RETENTION_HOURS: int = 168
+
+    # Live stock stream (SSE): change log poll period, frames buffered per client before
+    # it is disconnected as too slow, keep-alive period, products per subscription
+    STOCK_STREAM_POLL_INTERVAL_SECONDS: float = 0.5
+    STOCK_STREAM_BUFFER_SIZE: int = 100
+    STOCK_STREAM_HEARTBEAT_SECONDS: float = 15
+    STOCK_STREAM_MAX_PRODUCTS: int = 1000
+
     # Service identification
     SERVICE_NAME: str = "produits"
 
@@ -42,4 +132,4 @@ class Settings(BaseSettings):
         case_sensitive = True
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
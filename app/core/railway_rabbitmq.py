@@ -1,41 +1,26 @@
 import os
-import json
 import logging
+from aio_pika import Message, DeliveryMode
+from aio_pika.exceptions import AMQPConnectionError
 import asyncio
-import aio_pika
-from aio_pika import ExchangeType, Message, DeliveryMode
-from typing import Optional
-import ssl
+import uuid
+
+from app.events import codecs
+from app.events.connection import RabbitMQConnection, rabbitmq_connection
 
 logger = logging.getLogger(__name__)
 
 class RailwayRabbitMQ:
-    """RabbitMQ client for Railway PRODUCTION"""
+    """RabbitMQ client for Railway PRODUCTION, over the process' shared connection"""
     
-    def __init__(self):
-        # 1. PRIORITÉ: URL privée Railway
-        self.rabbitmq_url = os.getenv("RABBITMQ_PRIVATE_URL")
-        
-        # 2. Fallback: URL publique Railway
-        if not self.rabbitmq_url:
-            self.rabbitmq_url = os.getenv("RABBITMQ_URL")
-        
-        # 3. Fallback: Construire à partir des variables d'environnement
-        if not self.rabbitmq_url:
-            host = os.getenv("RABBITMQ_HOST", "rabbitmq")
-            port = os.getenv("RABBITMQ_PORT", "5672")
-            username = os.getenv("RABBITMQ_USERNAME", "guest")
-            password = os.getenv("RABBITMQ_PASSWORD", "guest")
-            vhost = os.getenv("RABBITMQ_VHOST", "/")
-            
-            self.rabbitmq_url = f"amqp://{username}:{password}@{host}:{port}/{vhost}"
+    def __init__(self, connection: RabbitMQConnection = rabbitmq_connection):
+        # URL: RABBITMQ_PRIVATE_URL, then RABBITMQ_URL, then built from RABBITMQ_* variables
+        self.connection = connection
+        self.rabbitmq_url = connection.url
         
         self.service_name = os.getenv("SERVICE_NAME", "produits")
         self.exchange_name = os.getenv("RABBITMQ_EXCHANGE", "mspr.events")
         
-        self.connection: Optional[aio_pika.RobustConnection] = None
-        self.channel: Optional[aio_pika.Channel] = None
-        
         logger.info(f"🔧 Initializing RabbitMQ for {self.service_name}")
         logger.info(f"📡 URL: {self._mask_url(self.rabbitmq_url)}")
         logger.info(f"🏷️  Service: {self.service_name}")
@@ -51,15 +36,6 @@ class RailwayRabbitMQ:
             return f"{cred_part}@{parts[1]}"
         return url or "not set"
     
-    def _get_ssl_context(self):
-        """Get SSL context if URL uses amqps://"""
-        if self.rabbitmq_url and self.rabbitmq_url.startswith("amqps://"):
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            return ssl_context
-        return None
-    
     async def connect(self) -> bool:
         """Connect to RabbitMQ with retry logic"""
         max_retries = 3
@@ -73,28 +49,13 @@ class RailwayRabbitMQ:
                     logger.error("❌ No RabbitMQ URL configured")
                     return False
                 
-                ssl_context = self._get_ssl_context()
-                
-                # Railway PRODUCTION connection parameters
-                self.connection = await aio_pika.connect_robust(
-                    self.rabbitmq_url,
-                    ssl_context=ssl_context,
-                    timeout=10,  # Timeout court pour Railway
-                    heartbeat=30,  # Keepalive important
-                    client_properties={
-                        "connection_name": f"{self.service_name}-service",
-                        "product": "MSPR-Produits",
-                        "platform": "Railway"
-                    }
-                )
-                
-                self.channel = await self.connection.channel()
-                await self.channel.set_qos(prefetch_count=10)
+                # Railway PRODUCTION connection parameters (timeout, heartbeat, SSL) come from settings
+                await self.connection.connect()
                 
                 logger.info("✅ Connected to RabbitMQ")
                 return True
                 
-            except aio_pika.exceptions.AMQPConnectionError as e:
+            except AMQPConnectionError as e:
                 logger.error(f"❌ AMQP Connection Error (attempt {attempt + 1}): {e}")
                 
             except Exception as e:
@@ -110,19 +71,13 @@ class RailwayRabbitMQ:
     async def setup(self):
         """Setup exchange and queue for this service"""
         try:
-            # Declare exchange
-            exchange = await self.channel.declare_exchange(
-                self.exchange_name,
-                ExchangeType.TOPIC,
-                durable=True,
-                auto_delete=False,
-            )
+            # Declare exchange (once per connection)
+            await self.connection.declare_exchange(self.exchange_name, auto_delete=False)
             
             # Service-specific queue
             queue_name = f"{self.service_name}.queue"
-            queue = await self.channel.declare_queue(
+            await self.connection.declare_queue(
                 queue_name,
-                durable=True,
                 auto_delete=False,
                 arguments={
                     "x-max-length": 10000,
@@ -131,12 +86,12 @@ class RailwayRabbitMQ:
             )
             
             # Bind queue to exchange
-            await queue.bind(exchange, routing_key=f"{self.service_name}.#")
+            await self.connection.bind(queue_name, f"{self.service_name}.#", self.exchange_name)
             
             # Bind to other services for cross-communication
+            # (order events have their own queue, consumed by OrderStockConsumer)
             if self.service_name == "produits":
-                await queue.bind(exchange, routing_key="commandes.#")
-                await queue.bind(exchange, routing_key="clients.#")
+                await self.connection.bind(queue_name, "clients.#", self.exchange_name)
             
             logger.info(f"✅ Setup complete: {queue_name}")
             return True
@@ -148,18 +103,21 @@ class RailwayRabbitMQ:
     async def publish(self, event_type: str, data: dict, target_service: str = None):
         """Publish an event"""
         try:
-            exchange = await self.channel.get_exchange(self.exchange_name)
-            
             # Determine routing key
             if target_service:
                 routing_key = f"{target_service}.{event_type}"
             else:
                 routing_key = f"{self.service_name}.{event_type}"
             
+            # EVENT_CODEC body, gzipped above EVENT_COMPRESSION_THRESHOLD_BYTES
+            encoded = codecs.encode(data)
             message = Message(
-                body=json.dumps(data, ensure_ascii=False).encode('utf-8'),
+                body=encoded.body,
                 delivery_mode=DeliveryMode.PERSISTENT,
-                content_type="application/json",
+                content_type=encoded.content_type,
+                content_encoding=encoded.content_encoding,
+                # Lets consumers skip redeliveries
+                message_id=str(uuid.uuid4()),
                 headers={
                     "source_service": self.service_name,
                     "event_type": event_type,
@@ -167,7 +125,8 @@ class RailwayRabbitMQ:
                 }
             )
             
-            await exchange.publish(message, routing_key=routing_key)
+            # Pooled confirm channel, exchange handle cached: no lookup per publish
+            await self.connection.publish(message, routing_key, self.exchange_name)
             
             logger.info(f"📤 Published: {routing_key}")
             return True
@@ -178,7 +137,7 @@ class RailwayRabbitMQ:
     
     async def health_check(self) -> dict:
         """Health check for Railway"""
-        if not self.connection or self.connection.is_closed:
+        if not self.connection.is_connected:
             return {
                 "status": "disconnected",
                 "service": self.service_name,
@@ -187,7 +146,7 @@ class RailwayRabbitMQ:
         
         try:
             # Test by declaring a temporary queue
-            test_queue = await self.channel.declare_queue(
+            test_queue = await self.connection.channel.declare_queue(
                 f"health-check-{self.service_name}",
                 durable=False,
                 auto_delete=True
@@ -210,9 +169,8 @@ class RailwayRabbitMQ:
     
     async def close(self):
         """Close connection gracefully"""
-        if self.connection:
-            await self.connection.close()
-            logger.info("Connection closed")
+        await self.connection.close()
+        logger.info("Connection closed")
 
 # Singleton instance
 rabbitmq = RailwayRabbitMQ()
\ No newline at end of file
@@ -1,12 +1,39 @@
+from typing import Any, AsyncIterator, Dict
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, echo=settings.DEBUG)
+# Driver of the async engine for each backend
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def engine_options(url: str) -> Dict[str, Any]:
+    """Engine arguments; SQLite pools (SingletonThreadPool, StaticPool) take no size"""
+    options: Dict[str, Any] = {"pool_pre_ping": True, "echo": settings.DEBUG}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(pool_size=settings.DB_POOL_SIZE, max_overflow=settings.DB_MAX_OVERFLOW)
+    return options
+
+
+def async_database_url(url: str) -> str:
+    """The same database through its async driver (asyncpg, aiosqlite)"""
+    parsed = make_url(url)
+    return parsed.set(drivername=ASYNC_DRIVERS[parsed.get_backend_name()]).render_as_string(hide_password=False)
+
+
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Request handlers: queries await on the event loop instead of holding a threadpool worker
+async_engine = create_async_engine(async_database_url(settings.DATABASE_URL), **engine_options(settings.DATABASE_URL))
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
+
 
 def get_db():
     """
@@ -17,3 +44,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency for getting an async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,8 +1,11 @@
+from app.events.connection import RabbitMQConnection, rabbitmq_connection
 from app.events.consumer import EventConsumer, event_consumer
 from app.events.producer import EventProducer, event_producer
 from app.events.schemas import Event, EventType, ProductEvent, StockEvent
 
 __all__ = [
+    "rabbitmq_connection",
+    "RabbitMQConnection",
     "event_producer",
     "EventProducer",
     "event_consumer",
@@ -0,0 +1,97 @@
+"""
+Event body codecs, named by the AMQP content_type and content_encoding properties.
+
+Publishers encode with EVENT_CODEC ("json" or "msgpack") and gzip bodies larger than
+EVENT_COMPRESSION_THRESHOLD_BYTES; consumers decode from the message properties, so
+JSON and msgpack publishers can share a queue while a rollout is in progress.
+"""
+import gzip
+import json
+import logging
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+GZIP = "gzip"
+
+
+class Codec(NamedTuple):
+    content_type: str
+    encode: Callable[[Any], bytes]
+    decode: Callable[[bytes], Any]
+
+
+class EncodedBody(NamedTuple):
+    body: bytes
+    content_type: str
+    content_encoding: Optional[str] = None
+
+
+def _json_codec() -> Codec:
+    def encode(obj: Any) -> bytes:
+        return json.dumps(obj, default=str, ensure_ascii=False, separators=(",", ":")).encode()
+
+    return Codec(JSON, encode, json.loads)
+
+
+def _msgpack_codec() -> Optional[Codec]:
+    try:
+        import msgpack
+    except ImportError:
+        return None
+
+    packer_options = {"default": str, "use_bin_type": True}
+
+    def encode(obj: Any) -> bytes:
+        return msgpack.packb(obj, **packer_options)
+
+    def decode(body: bytes) -> Any:
+        return msgpack.unpackb(body, raw=False)
+
+    return Codec(MSGPACK, encode, decode)
+
+
+# Codecs by content type; msgpack only when the package is installed
+codecs: Dict[str, Codec] = {JSON: _json_codec()}
+_msgpack = _msgpack_codec()
+if _msgpack:
+    codecs[MSGPACK] = _msgpack
+
+
+def default_codec() -> Codec:
+    """Codec selected by EVENT_CODEC, JSON when msgpack is not installed"""
+    if settings.EVENT_CODEC == "msgpack":
+        if MSGPACK in codecs:
+            return codecs[MSGPACK]
+        logger.warning("msgpack is not installed, encoding events as JSON")
+    return codecs[JSON]
+
+
+def encode(obj: Any, codec: Optional[Codec] = None) -> EncodedBody:
+    codec = codec or default_codec()
+    body = codec.encode(obj)
+    threshold = settings.EVENT_COMPRESSION_THRESHOLD_BYTES
+    if threshold and len(body) > threshold:
+        return EncodedBody(gzip.compress(body, settings.EVENT_COMPRESSION_LEVEL), codec.content_type, GZIP)
+    return EncodedBody(body, codec.content_type)
+
+
+def decode(body: bytes, content_type: Optional[str] = None, content_encoding: Optional[str] = None) -> Any:
+    """Decode a message body from its properties; ValueError if it cannot be read"""
+    codec = codecs.get(content_type or JSON)
+    if codec is None:
+        raise ValueError(f"Unsupported content type: {content_type}")
+    try:
+        if content_encoding == GZIP:
+            body = gzip.decompress(body)
+        elif content_encoding:
+            raise ValueError(f"Unsupported content encoding: {content_encoding}")
+        return codec.decode(body)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Undecodable {content_type} body: {e}") from e
@@ -0,0 +1,258 @@
+"""
+RabbitMQ connection shared by the producer, the consumer and the Railway client.
+
+One robust connection per process, a channel pool for publishing with confirms, a
+channel of its own for each consumer, and the exchanges, queues and bindings declared
+once, then cached.
+"""
+import asyncio
+import itertools
+import logging
+import ssl
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import aio_pika
+from aio_pika import ExchangeType, Message
+from aio_pika.abc import AbstractChannel, AbstractExchange, AbstractQueue, AbstractRobustConnection
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def rabbitmq_url() -> str:
+    """Railway private URL, then RABBITMQ_URL, then the URL built from the RABBITMQ_* parts"""
+    if settings.RABBITMQ_PRIVATE_URL:
+        return settings.RABBITMQ_PRIVATE_URL
+    if settings.RABBITMQ_URL:
+        return settings.RABBITMQ_URL
+    return (
+        f"amqp://{settings.RABBITMQ_USERNAME}:{settings.RABBITMQ_PASSWORD}"
+        f"@{settings.RABBITMQ_HOST}:{settings.RABBITMQ_PORT}/{settings.RABBITMQ_VHOST}"
+    )
+
+
+def ssl_context(url: str) -> Optional[ssl.SSLContext]:
+    """SSL context for amqps:// URLs; Railway certificates are not verified"""
+    if not url.startswith("amqps://"):
+        return None
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+class PooledChannel:
+    """A pooled channel with the exchange and queue handles bound to it"""
+
+    def __init__(self, channel: AbstractChannel):
+        self.channel = channel
+        self._exchanges: Dict[str, AbstractExchange] = {}
+        self._queues: Dict[str, AbstractQueue] = {}
+
+    async def exchange(self, name: str) -> AbstractExchange:
+        """Handle on an exchange declared beforehand; no round trip to the broker"""
+        exchange = self._exchanges.get(name)
+        if exchange is None:
+            exchange = self._exchanges[name] = await self.channel.get_exchange(name, ensure=False)
+        return exchange
+
+    async def queue(self, name: str) -> AbstractQueue:
+        """Queue to consume from on this channel, restored with it after a reconnection"""
+        queue = self._queues.get(name)
+        if queue is None:
+            queue = self._queues[name] = await self.channel.get_queue(name)
+        return queue
+
+
+class ChannelPool:
+    """
+    Up to size channels, opened on first use and handed out round-robin. Channels are
+    shared rather than leased: many publishes can wait for their confirm on one channel.
+    Robust channels reopen themselves after a reconnection.
+    """
+
+    def __init__(self, open_channel: Callable[[], Awaitable[AbstractChannel]], size: int):
+        self.open_channel = open_channel
+        self.size = max(size, 1)
+        self.channels: List[PooledChannel] = []
+        self._turns = itertools.count()
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> PooledChannel:
+        if len(self.channels) < self.size:
+            async with self._lock:
+                if len(self.channels) < self.size:
+                    self.channels.append(PooledChannel(await self.open_channel()))
+                    return self.channels[-1]
+        return self.channels[next(self._turns) % self.size]
+
+    def clear(self) -> None:
+        self.channels = []
+
+
+class RabbitMQConnection:
+    """
+    Owns the process' single robust connection to RabbitMQ.
+
+    Publishes go round-robin over RABBITMQ_PUBLISH_CHANNELS channels in publisher-confirm
+    mode; each consumer leases a channel of its own (consume_channel).
+    Exchanges, queues and bindings are declared once on a topology channel and cached, so
+    a publish after the first costs no declare or lookup round trip.
+    """
+
+    def __init__(self, url: str, publish_channels: int, **connect_kwargs: Any):
+        self.url = url
+        self.connect_kwargs = connect_kwargs
+        self.connection: Optional[AbstractRobustConnection] = None
+        # Declarations: robust, so they are replayed after a reconnection
+        self.channel: Optional[AbstractChannel] = None
+        self.publish_channels = ChannelPool(self._open_publish_channel, publish_channels)
+        # Leased by consumers, one each
+        self.consume_channels: List[PooledChannel] = []
+        self._exchanges: Dict[str, AbstractExchange] = {}
+        self._queues: Dict[str, AbstractQueue] = {}
+        self._bindings: Set[Tuple[str, str, str]] = set()
+        self._lock = asyncio.Lock()
+        self._declare_lock = asyncio.Lock()
+        self.connects = 0
+
+    @property
+    def is_connected(self) -> bool:
+        return self.connection is not None and not self.connection.is_closed
+
+    async def connect(self) -> None:
+        """Open the connection; callers racing here share the same one"""
+        if self.is_connected:
+            return
+        async with self._lock:
+            if self.is_connected:
+                return
+            try:
+                self.connection = await self._connect()
+                self.channel = await self.connection.channel()
+            except Exception as e:
+                logger.error(f"Failed to connect to RabbitMQ: {e}")
+                raise
+            self.connects += 1
+            logger.info("Connected to RabbitMQ")
+
+    async def close(self) -> None:
+        """Close the connection with its channels; the next use reconnects"""
+        connection, self.connection = self.connection, None
+        self.channel = None
+        self.publish_channels.clear()
+        self.consume_channels = []
+        self._exchanges.clear()
+        self._queues.clear()
+        self._bindings.clear()
+        if connection and not connection.is_closed:
+            await connection.close()
+            logger.info("Disconnected from RabbitMQ")
+
+    async def declare_exchange(
+        self, name: Optional[str] = None, type: ExchangeType = ExchangeType.TOPIC, **kwargs: Any
+    ) -> AbstractExchange:
+        """Declare an exchange (durable by default) the first time, then return it from the cache"""
+        name = name or settings.RABBITMQ_EXCHANGE
+        if name not in self._exchanges:
+            async with self._declare_lock:
+                if name not in self._exchanges:
+                    await self.connect()
+                    kwargs.setdefault("durable", True)
+                    self._exchanges[name] = await self.channel.declare_exchange(name, type, **kwargs)
+        return self._exchanges[name]
+
+    async def declare_queue(self, name: str, **kwargs: Any) -> AbstractQueue:
+        """Declare a queue (durable by default) the first time, then return it from the cache"""
+        if name not in self._queues:
+            async with self._declare_lock:
+                if name not in self._queues:
+                    await self.connect()
+                    kwargs.setdefault("durable", True)
+                    self._queues[name] = await self.channel.declare_queue(name, **kwargs)
+        return self._queues[name]
+
+    async def bind(self, queue_name: str, routing_key: str, exchange_name: Optional[str] = None) -> None:
+        """Bind a queue to an exchange, once"""
+        exchange_name = exchange_name or settings.RABBITMQ_EXCHANGE
+        binding = (queue_name, exchange_name, routing_key)
+        if binding in self._bindings:
+            return
+        exchange = await self.declare_exchange(exchange_name)
+        queue = await self.declare_queue(queue_name)
+        await queue.bind(exchange, routing_key=routing_key)
+        self._bindings.add(binding)
+
+    async def publish(self, message: Message, routing_key: str, exchange_name: Optional[str] = None) -> None:
+        """Publish on a pooled channel, returning once the broker has confirmed the message"""
+        exchange_name = exchange_name or settings.RABBITMQ_EXCHANGE
+        if exchange_name not in self._exchanges:
+            await self.declare_exchange(exchange_name)
+        channel = await self.publish_channels.get()
+        exchange = await channel.exchange(exchange_name)
+        await exchange.publish(message, routing_key=routing_key)
+
+    async def consume_channel(self, prefetch_count: int) -> PooledChannel:
+        """
+        A channel for one consumer, with its prefetch_count, until release_channel.
+        Never shared: delivery tags, and so acks with multiple=True, are scoped to a
+        channel, and the prefetch limit applies to the channel.
+        """
+        channel = PooledChannel(await self._open_channel())
+        await channel.channel.set_qos(prefetch_count=prefetch_count)
+        self.consume_channels.append(channel)
+        return channel
+
+    async def release_channel(self, channel: PooledChannel) -> None:
+        """Close a consume channel; its unacked messages go back to their queue"""
+        if channel in self.consume_channels:
+            self.consume_channels.remove(channel)
+            if self.is_connected:
+                await channel.channel.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.is_connected,
+            "connects": self.connects,
+            "publish_channels": len(self.publish_channels.channels),
+            "consume_channels": len(self.consume_channels),
+            "exchanges": len(self._exchanges),
+            "queues": len(self._queues),
+        }
+
+    async def _connect(self) -> AbstractRobustConnection:
+        if self.url.startswith("memory://"):
+            # In-process stand-in: no broker needed
+            from app.events.memory_broker import memory_broker
+
+            return await memory_broker.connect(self.url)
+        return await aio_pika.connect_robust(self.url, **self.connect_kwargs)
+
+    async def _open_channel(self) -> AbstractChannel:
+        await self.connect()
+        return await self.connection.channel()
+
+    async def _open_publish_channel(self) -> AbstractChannel:
+        await self.connect()
+        return await self.connection.channel(publisher_confirms=True)
+
+
+def create_connection() -> RabbitMQConnection:
+    url = rabbitmq_url()
+    return RabbitMQConnection(
+        url,
+        settings.RABBITMQ_PUBLISH_CHANNELS,
+        ssl_context=ssl_context(url),
+        timeout=settings.RABBITMQ_CONNECT_TIMEOUT_SECONDS,
+        heartbeat=settings.RABBITMQ_HEARTBEAT_SECONDS,
+        client_properties={
+            "connection_name": f"{settings.SERVICE_NAME}-service",
+            "product": "MSPR-Produits",
+            "platform": "Railway",
+        },
+    )
+
+
+# Global RabbitMQ connection
+rabbitmq_connection = create_connection()
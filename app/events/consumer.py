@@ -1,68 +1,259 @@
-import json
+import asyncio
 import logging
-from typing import Callable
+import zlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 
-import aio_pika
-from aio_pika import ExchangeType, IncomingMessage
+from aio_pika.abc import AbstractIncomingMessage
 
 from app.config import settings
+from app.events import codecs
+from app.events.connection import RabbitMQConnection, rabbitmq_connection
+from app.events.dedup import DedupStore, dedup_store
 
 logger = logging.getLogger(__name__)
 
+Handler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class AckBatcher:
+    """
+    Acks handled messages with one basic.ack(multiple=True) per batch instead of one per
+    message. Handlers finish out of order, so an ack only covers the run of settled
+    delivery tags that follows the last ack; failed messages are nacked right away.
+    """
+
+    def __init__(self, batch_size: int):
+        self.batch_size = max(batch_size, 1)
+        # Delivery tag -> [message, settled, succeeded], in delivery order
+        self._unacked: "OrderedDict[int, List[Any]]" = OrderedDict()
+        self._settled = 0
+        # Acks go out in delivery tag order: a multiple ack must not overtake an earlier one
+        self._lock = asyncio.Lock()
+        self.acks = 0
+        self.acked = 0
+        self.nacked = 0
+
+    def received(self, message: AbstractIncomingMessage) -> None:
+        self._unacked[message.delivery_tag] = [message, False, False]
+
+    async def done(self, message: AbstractIncomingMessage) -> None:
+        self._settle(message, True)
+        if self._settled >= self.batch_size:
+            await self.flush()
+
+    async def failed(self, message: AbstractIncomingMessage) -> None:
+        # Requeued once; a second failure drops it (or dead-letters it, if the queue has a DLX)
+        await message.nack(requeue=not message.redelivered)
+        self.nacked += 1
+        self._settle(message, False)
+
+    async def flush(self) -> None:
+        """Ack the settled messages at the head of the delivery order"""
+        async with self._lock:
+            last, count = None, 0
+            while self._unacked:
+                tag, (message, settled, succeeded) = next(iter(self._unacked.items()))
+                if not settled:
+                    break
+                del self._unacked[tag]
+                self._settled -= 1
+                if succeeded:
+                    last, count = message, count + 1
+            if last is not None:
+                await last.ack(multiple=True)
+                self.acks += 1
+                self.acked += count
+
+    def _settle(self, message: AbstractIncomingMessage, succeeded: bool) -> None:
+        entry = self._unacked.get(message.delivery_tag)
+        if entry is not None:
+            entry[1], entry[2] = True, succeeded
+            self._settled += 1
+
 
 class EventConsumer:
-    def __init__(self):
-        self.connection = None
+    """
+    Consumes the products queue on a channel of its own on the shared connection.
+
+    Messages are handled by CONSUMER_CONCURRENCY worker tasks, with a prefetch of twice
+    that so each worker has its next message waiting. With CONSUMER_ORDERING_KEY set, a
+    message goes to the worker chosen by that field of its event data: events of one
+    product are handled in delivery order, events of different products in parallel.
+    Acks are batched by AckBatcher, at most CONSUMER_ACK_INTERVAL_SECONDS late.
+
+    With a DedupStore, messages whose message_id was already processed, or is being
+    processed by another worker, are acked without calling the handler.
+    """
+
+    def __init__(
+        self,
+        connection: RabbitMQConnection = rabbitmq_connection,
+        concurrency: Optional[int] = None,
+        ordering_key: Optional[str] = None,
+        dedup: Optional[DedupStore] = None,
+    ):
+        self.connection = connection
+        self.dedup = dedup
+        self.concurrency = max(concurrency or settings.CONSUMER_CONCURRENCY, 1)
+        self.ordering_key = settings.CONSUMER_ORDERING_KEY if ordering_key is None else ordering_key
+        self.prefetch_count = self.concurrency * 2
         self.channel = None
-        self.exchange = None
         self.queue = None
+        self.acks = AckBatcher(min(settings.CONSUMER_ACK_BATCH_SIZE, self.prefetch_count // 2))
+        self._consumer_tag: Optional[str] = None
+        self._inboxes: List["asyncio.Queue[Tuple[AbstractIncomingMessage, Any]]"] = []
+        self._tasks: List[asyncio.Task] = []
+        self._in_flight: Set[str] = set()
+        self.handled = 0
+        self.failed = 0
+        self.duplicates = 0
 
     async def connect(self):
-        """Establish connection to RabbitMQ"""
+        """Declare the products queue and take a consume channel"""
         try:
-            self.connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
-            self.channel = await self.connection.channel()
-            await self.channel.set_qos(prefetch_count=10)
-
-            self.exchange = await self.channel.declare_exchange(
-                settings.RABBITMQ_EXCHANGE, ExchangeType.TOPIC, durable=True
-            )
-
-            self.queue = await self.channel.declare_queue(settings.RABBITMQ_QUEUE_PRODUCTS, durable=True)
-
+            await self.connection.declare_exchange(settings.RABBITMQ_EXCHANGE)
+            await self.connection.declare_queue(settings.RABBITMQ_QUEUE_PRODUCTS)
+            self.channel = await self.connection.consume_channel(self.prefetch_count)
+            self.queue = await self.channel.queue(settings.RABBITMQ_QUEUE_PRODUCTS)
             logger.info("Consumer connected to RabbitMQ")
         except Exception as e:
             logger.error(f"Failed to connect consumer to RabbitMQ: {e}")
             raise
 
     async def disconnect(self):
-        """Close RabbitMQ connection"""
-        if self.connection and not self.connection.is_closed:
-            await self.connection.close()
-            logger.info("Consumer disconnected from RabbitMQ")
+        """Stop consuming, then close RabbitMQ connection"""
+        await self.stop_consuming()
+        await self.connection.close()
+        self.channel = None
+        self.queue = None
+        logger.info("Consumer disconnected from RabbitMQ")
 
     async def bind_queue(self, routing_key: str):
         """Bind queue to exchange with routing key"""
-        await self.queue.bind(self.exchange, routing_key=routing_key)
+        await self.connection.bind(settings.RABBITMQ_QUEUE_PRODUCTS, routing_key)
         logger.info(f"Queue bound to routing key: {routing_key}")
 
-    async def start_consuming(self, callback: Callable):
-        """Start consuming messages from the queue"""
+    async def start_consuming(self, callback: Handler):
+        """Start consuming messages from the queue with the worker tasks"""
         if not self.queue:
             await self.connect()
 
-        async def process_message(message: IncomingMessage):
-            async with message.process():
-                try:
-                    body = json.loads(message.body.decode())
-                    logger.info(f"Received message: {body}")
-                    await callback(body)
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
+        # Ordered: one inbox per worker; unordered: one inbox shared by all workers
+        inboxes = self.concurrency if self.ordering_key else 1
+        self._inboxes = [asyncio.Queue() for _ in range(inboxes)]
+        self._tasks = [
+            asyncio.create_task(self._work(self._inboxes[worker % inboxes], callback))
+            for worker in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._flush_acks()))
+        self._consumer_tag = await self.queue.consume(self._dispatch)
+        logger.info(f"Started consuming messages with {self.concurrency} workers")
+
+    async def stop_consuming(self):
+        """Stop receiving, finish the messages already received and ack them"""
+        if self._consumer_tag:
+            await self.queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+        for inbox in self._inboxes:
+            await inbox.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.acks.flush()
+        if self.channel:
+            await self.connection.release_channel(self.channel)
+            self.channel = None
+            self.queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "prefetch": self.prefetch_count,
+            "handled": self.handled,
+            "failed": self.failed,
+            "acked": self.acks.acked,
+            "acks_sent": self.acks.acks,
+            "nacked": self.acks.nacked,
+            "duplicates": self.duplicates,
+            "dedup": self.dedup.stats() if self.dedup else None,
+        }
+
+    async def _dispatch(self, message: AbstractIncomingMessage):
+        """Decode the message once and hand it to its worker's inbox"""
+        self.acks.received(message)
+        try:
+            body = codecs.decode(message.body, message.content_type, message.content_encoding)
+        except ValueError as e:
+            body = e
+        inbox = self._inboxes[0]
+        if len(self._inboxes) > 1 and isinstance(body, dict):
+            key = str((body.get("data") or {}).get(self.ordering_key))
+            inbox = self._inboxes[zlib.crc32(key.encode()) % len(self._inboxes)]
+        inbox.put_nowait((message, body))
+
+    async def _work(self, inbox: "asyncio.Queue[Tuple[AbstractIncomingMessage, Any]]", callback: Handler):
+        while True:
+            message, body = await inbox.get()
+            succeeded = False
+            try:
+                await self._handle(message, body, callback)
+                succeeded = True
+            except Exception as e:
+                logger.error(f"Error processing message {message.message_id or message.delivery_tag}: {e}")
+            try:
+                await self._settle(message, succeeded)
+            except Exception as e:
+                logger.error(f"Failed to ack message {message.delivery_tag}: {e}")
+            finally:
+                inbox.task_done()
+
+    async def _handle(self, message: AbstractIncomingMessage, body: Any, callback: Handler):
+        if isinstance(body, Exception):
+            raise body
+        message_id = message.message_id
+        if not (self.dedup and message_id):
+            logger.debug(f"Received event: {body.get('event_type')}")
+            await callback(body)
+            return
+
+        # Claimed before the first await: concurrent copies see each other
+        if message_id in self._in_flight:
+            self.duplicates += 1
+            return
+        self._in_flight.add(message_id)
+        try:
+            if await self.dedup.seen(message_id):
+                self.duplicates += 1
+                logger.debug(f"Skipped duplicate message {message_id}")
+                return
+            logger.debug(f"Received event: {body.get('event_type')}")
+            await callback(body)
+            try:
+                await self.dedup.mark(message_id)
+            except Exception as e:
+                # Handled all the same: ack it, a redelivery would run the handler again
+                logger.warning(f"Failed to record processed message {message_id}: {e}")
+        finally:
+            self._in_flight.discard(message_id)
+
+    async def _settle(self, message: AbstractIncomingMessage, succeeded: bool):
+        if succeeded:
+            self.handled += 1
+            await self.acks.done(message)
+        else:
+            self.failed += 1
+            await self.acks.failed(message)
 
-        await self.queue.consume(process_message)
-        logger.info("Started consuming messages")
+    async def _flush_acks(self):
+        while True:
+            await asyncio.sleep(settings.CONSUMER_ACK_INTERVAL_SECONDS)
+            try:
+                await self.acks.flush()
+            except Exception as e:
+                logger.error(f"Failed to ack messages: {e}")
 
 
 # Global event consumer instance
-event_consumer = EventConsumer()
+event_consumer = EventConsumer(dedup=dedup_store)
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+import anyio.to_thread
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repositories.processed_message_repo import ProcessedMessageRepository
+
+logger = logging.getLogger(__name__)
+
+
+class DedupStore:
+    """
+    Message ids the consumer already processed, in two tiers: an LRU of the most recent
+    DEDUP_CACHE_SIZE ids in memory, in front of the processed_messages table that keeps
+    them DEDUP_RETENTION_HOURS across restarts and consumers. A redelivery of a recent
+    message costs a dict lookup; only cache misses reach the database.
+    """
+
+    # Expired ids are purged at most this often
+    purge_interval = 3600
+
+    def __init__(self, session_factory: Callable[[], Session], capacity: int, retention_hours: float):
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.retention_hours = retention_hours
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self.hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.purged = 0
+
+    async def seen(self, message_id: str) -> bool:
+        """Whether the message was already processed"""
+        if message_id in self._recent:
+            self._recent.move_to_end(message_id)
+            self.hits += 1
+            return True
+        if await anyio.to_thread.run_sync(self._exists, message_id):
+            self._remember(message_id)
+            self.db_hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    async def mark(self, message_id: str) -> None:
+        """Record the message as processed"""
+        self._remember(message_id)
+        await anyio.to_thread.run_sync(self._add, message_id)
+
+    async def purge(self) -> int:
+        """Delete one batch of ids processed more than retention_hours ago"""
+        before = datetime.utcnow() - timedelta(hours=self.retention_hours)
+        purged = await anyio.to_thread.run_sync(self._purge, before)
+        self.purged += purged
+        return purged
+
+    async def run(self) -> None:
+        """Purge loop; started once per process by its owner, not by each consumer sharing the store"""
+        while True:
+            await asyncio.sleep(self.purge_interval)
+            try:
+                # One batch per transaction until the expired ids are gone
+                while await self.purge() == settings.DEDUP_PURGE_BATCH_SIZE:
+                    pass
+            except Exception as e:
+                logger.error(f"Failed to purge processed message ids: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached": len(self._recent),
+            "hits": self.hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "purged": self.purged,
+        }
+
+    def _remember(self, message_id: str) -> None:
+        self._recent[message_id] = None
+        self._recent.move_to_end(message_id)
+        if len(self._recent) > self.capacity:
+            self._recent.popitem(last=False)
+
+    def _exists(self, message_id: str) -> bool:
+        with self.session_factory() as db:
+            return ProcessedMessageRepository(db).exists(message_id)
+
+    def _add(self, message_id: str) -> None:
+        with self.session_factory() as db:
+            ProcessedMessageRepository(db).add(message_id)
+
+    def _purge(self, before: datetime) -> int:
+        with self.session_factory() as db:
+            return ProcessedMessageRepository(db).purge(before, settings.DEDUP_PURGE_BATCH_SIZE)
+
+
+# Global dedup store of the event consumer
+dedup_store = DedupStore(SessionLocal, settings.DEDUP_CACHE_SIZE, settings.DEDUP_RETENTION_HOURS)
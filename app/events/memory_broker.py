@@ -0,0 +1,375 @@
+"""
+In-process stand-in for RabbitMQ, implementing the part of aio_pika used by
+RabbitMQConnection, EventProducer, EventConsumer and RailwayRabbitMQ: topic, direct
+and fanout exchanges, queue bindings, durable queues with x-max-length, per-consumer
+prefetch, acks (multiple), nacks with requeue and publisher confirms.
+
+Selected with RABBITMQ_URL=memory:// to run the service, tests or benchmarks
+without a broker. Messages live in this process only.
+"""
+import asyncio
+import itertools
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from aio_pika import ExchangeType, Message
+from aio_pika.exceptions import ChannelNotFoundEntity, ChannelPreconditionFailed
+
+
+def topic_matches(binding_key: List[str], words: List[str]) -> bool:
+    """AMQP topic matching on dot-separated words: * is one word, # zero or more"""
+    if not binding_key:
+        return not words
+    head, rest = binding_key[0], binding_key[1:]
+    if head == "#":
+        return any(topic_matches(rest, words[start:]) for start in range(len(words) + 1))
+    return bool(words) and head in ("*", words[0]) and topic_matches(rest, words[1:])
+
+
+class StoredMessage:
+    """A message as held by a queue"""
+
+    __slots__ = ("message", "exchange", "routing_key", "redelivered")
+
+    def __init__(self, message: Message, exchange: str, routing_key: str):
+        self.message = message
+        self.exchange = exchange
+        self.routing_key = routing_key
+        self.redelivered = False
+
+
+class IncomingMessage:
+    """What a consumer callback receives, with the aio_pika IncomingMessage attributes in use"""
+
+    def __init__(self, channel: "MemoryChannel", delivery_tag: int, stored: StoredMessage):
+        message = stored.message
+        self.channel = channel
+        self.delivery_tag = delivery_tag
+        self.body = message.body
+        self.content_type = message.content_type
+        self.content_encoding = message.content_encoding
+        self.message_id = message.message_id
+        self.headers = message.headers
+        self.exchange = stored.exchange
+        self.routing_key = stored.routing_key
+        self.redelivered = stored.redelivered
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.channel.settle(self.delivery_tag, multiple)
+
+    async def nack(self, multiple: bool = False, requeue: bool = True) -> None:
+        self.channel.settle(self.delivery_tag, multiple, requeue=requeue, ack=False)
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.channel.settle(self.delivery_tag, False, requeue=requeue, ack=False)
+
+
+class Consumer:
+    def __init__(self, tag: str, channel: "MemoryChannel", callback: Callable[[Any], Awaitable[Any]], prefetch: int):
+        self.tag = tag
+        self.channel = channel
+        self.callback = callback
+        self.prefetch = prefetch
+        self.unacked = 0
+
+    @property
+    def has_room(self) -> bool:
+        return not self.prefetch or self.unacked < self.prefetch
+
+
+class BrokerQueue:
+    def __init__(self, broker: "InMemoryBroker", name: str, durable: bool, arguments: Optional[Dict[str, Any]]):
+        self.broker = broker
+        self.name = name
+        self.durable = durable
+        self.max_length = (arguments or {}).get("x-max-length")
+        self.messages: Deque[StoredMessage] = deque()
+        self.consumers: List[Consumer] = []
+        self._turn = 0
+
+    def put(self, stored: StoredMessage) -> None:
+        self.messages.append(stored)
+        if self.max_length is not None and len(self.messages) > self.max_length:
+            # Default overflow behaviour: drop from the head
+            self.messages.popleft()
+            self.broker.dropped += 1
+        self.dispatch()
+
+    def dispatch(self) -> None:
+        """Deliver queued messages round-robin to the consumers with prefetch room"""
+        while self.messages and self.consumers:
+            consumer = self._next_consumer()
+            if consumer is None:
+                return
+            consumer.channel.deliver(self, consumer, self.messages.popleft())
+
+    def _next_consumer(self) -> Optional[Consumer]:
+        for _ in range(len(self.consumers)):
+            self._turn = (self._turn + 1) % len(self.consumers)
+            consumer = self.consumers[self._turn]
+            if consumer.has_room:
+                return consumer
+        return None
+
+
+class BrokerExchange:
+    def __init__(self, name: str, type: ExchangeType, durable: bool):
+        self.name = name
+        self.type = ExchangeType(type)
+        self.durable = durable
+        self.bindings: Set[Tuple[str, str]] = set()
+        # Routing key -> queue names, until the bindings change
+        self._routes: Dict[str, Set[str]] = {}
+
+    def bind(self, queue_name: str, routing_key: str) -> None:
+        self.bindings.add((queue_name, routing_key))
+        self._routes.clear()
+
+    def unbind_queue(self, queue_name: str) -> None:
+        self.bindings = {binding for binding in self.bindings if binding[0] != queue_name}
+        self._routes.clear()
+
+    def route(self, routing_key: str) -> Set[str]:
+        if routing_key not in self._routes:
+            self._routes[routing_key] = {
+                queue_name for queue_name, binding_key in self.bindings if self._matches(binding_key, routing_key)
+            }
+        return self._routes[routing_key]
+
+    def _matches(self, binding_key: str, routing_key: str) -> bool:
+        if self.type == ExchangeType.FANOUT:
+            return True
+        if self.type == ExchangeType.DIRECT:
+            return binding_key == routing_key
+        return topic_matches(binding_key.split("."), routing_key.split("."))
+
+
+class ExchangeHandle:
+    """aio_pika Exchange counterpart, bound to a channel"""
+
+    def __init__(self, channel: "MemoryChannel", name: str):
+        self.channel = channel
+        self.name = name
+
+    async def publish(self, message: Message, routing_key: str, **kwargs: Any) -> None:
+        # Confirmed once routed, like a broker confirm; let other tasks run as a round trip would
+        self.channel.broker.publish(self.name, message, routing_key)
+        await asyncio.sleep(0)
+
+
+class QueueHandle:
+    """aio_pika Queue counterpart, bound to a channel"""
+
+    def __init__(self, channel: "MemoryChannel", name: str):
+        self.channel = channel
+        self.name = name
+
+    async def bind(self, exchange: Any, routing_key: Optional[str] = None, **kwargs: Any) -> None:
+        exchange_name = exchange if isinstance(exchange, str) else exchange.name
+        self.channel.broker.exchange(exchange_name).bind(self.name, routing_key or self.name)
+
+    async def consume(self, callback: Callable[[Any], Awaitable[Any]], no_ack: bool = False, **kwargs: Any) -> str:
+        return self.channel.consume(self.name, callback)
+
+    async def cancel(self, consumer_tag: str, **kwargs: Any) -> None:
+        self.channel.cancel(consumer_tag)
+
+    async def delete(self, **kwargs: Any) -> None:
+        self.channel.broker.delete_queue(self.name)
+
+
+class MemoryChannel:
+    """aio_pika Channel counterpart; delivery tags and unacked messages are per channel"""
+
+    def __init__(self, connection: "MemoryConnection", publisher_confirms: bool):
+        self.connection = connection
+        self.broker = connection.broker
+        self.publisher_confirms = publisher_confirms
+        self.prefetch_count = 0
+        self.is_closed = False
+        self._tags = itertools.count(1)
+        self._unacked: "OrderedDict[int, Tuple[BrokerQueue, Consumer, StoredMessage]]" = OrderedDict()
+        self._consumers: Dict[str, Consumer] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def declare_exchange(
+        self, name: str, type: ExchangeType = ExchangeType.DIRECT, durable: bool = False, passive: bool = False, **kw
+    ) -> ExchangeHandle:
+        if passive:
+            self.broker.exchange(name)
+        else:
+            self.broker.declare_exchange(name, type, durable)
+        return ExchangeHandle(self, name)
+
+    async def get_exchange(self, name: str, ensure: bool = True) -> ExchangeHandle:
+        if ensure:
+            self.broker.exchange(name)
+        return ExchangeHandle(self, name)
+
+    async def declare_queue(
+        self,
+        name: str,
+        durable: bool = False,
+        passive: bool = False,
+        arguments: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> QueueHandle:
+        if passive:
+            self.broker.queue(name)
+        else:
+            self.broker.declare_queue(name, durable, arguments)
+        return QueueHandle(self, name)
+
+    async def get_queue(self, name: str, ensure: bool = True) -> QueueHandle:
+        if ensure:
+            self.broker.queue(name)
+        return QueueHandle(self, name)
+
+    async def set_qos(self, prefetch_count: int = 0, **kwargs: Any) -> None:
+        """Prefetch of the consumers started on this channel from now on"""
+        self.prefetch_count = prefetch_count
+
+    def consume(self, queue_name: str, callback: Callable[[Any], Awaitable[Any]]) -> str:
+        queue = self.broker.queue(queue_name)
+        consumer = Consumer(f"ctag-{next(self.broker.consumer_tags)}", self, callback, self.prefetch_count)
+        self._consumers[consumer.tag] = consumer
+        queue.consumers.append(consumer)
+        queue.dispatch()
+        return consumer.tag
+
+    def cancel(self, consumer_tag: str) -> None:
+        consumer = self._consumers.pop(consumer_tag, None)
+        for queue in self.broker.queues.values():
+            if consumer in queue.consumers:
+                queue.consumers.remove(consumer)
+
+    def deliver(self, queue: BrokerQueue, consumer: Consumer, stored: StoredMessage) -> None:
+        tag = next(self._tags)
+        self._unacked[tag] = (queue, consumer, stored)
+        consumer.unacked += 1
+        self.broker.delivered += 1
+        # aio_pika runs each consumer callback in its own task
+        task = asyncio.create_task(consumer.callback(IncomingMessage(self, tag, stored)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def settle(self, delivery_tag: int, multiple: bool, requeue: bool = False, ack: bool = True) -> None:
+        if delivery_tag not in self._unacked:
+            raise ChannelPreconditionFailed(f"PRECONDITION_FAILED - unknown delivery tag {delivery_tag}")
+        tags = [tag for tag in self._unacked if tag <= delivery_tag] if multiple else [delivery_tag]
+        self.broker.ack_frames += 1
+        queues = set()
+        for tag in tags:
+            queue, consumer, stored = self._unacked.pop(tag)
+            consumer.unacked -= 1
+            queues.add(queue)
+            if ack:
+                self.broker.acked += 1
+                continue
+            self.broker.nacked += 1
+            if requeue:
+                stored.redelivered = True
+                queue.messages.appendleft(stored)
+        for queue in queues:
+            queue.dispatch()
+
+    async def close(self) -> None:
+        """Cancel this channel's consumers; its unacked messages go back to their queues"""
+        if self.is_closed:
+            return
+        self.is_closed = True
+        for consumer_tag in list(self._consumers):
+            self.cancel(consumer_tag)
+        for queue, _, stored in reversed(list(self._unacked.values())):
+            stored.redelivered = True
+            queue.messages.appendleft(stored)
+        queues = {queue for queue, _, _ in self._unacked.values()}
+        self._unacked.clear()
+        for queue in queues:
+            queue.dispatch()
+
+
+class MemoryConnection:
+    """aio_pika RobustConnection counterpart"""
+
+    def __init__(self, broker: "InMemoryBroker"):
+        self.broker = broker
+        self.is_closed = False
+        self.channels: List[MemoryChannel] = []
+
+    async def channel(self, publisher_confirms: bool = True, **kwargs: Any) -> MemoryChannel:
+        channel = MemoryChannel(self, publisher_confirms)
+        self.channels.append(channel)
+        return channel
+
+    async def close(self) -> None:
+        self.is_closed = True
+        for channel in self.channels:
+            await channel.close()
+
+
+class InMemoryBroker:
+    def __init__(self):
+        self.exchanges: Dict[str, BrokerExchange] = {}
+        self.queues: Dict[str, BrokerQueue] = {}
+        self.consumer_tags = itertools.count(1)
+        self.published = 0
+        self.unroutable = 0
+        self.delivered = 0
+        self.acked = 0
+        self.nacked = 0
+        self.ack_frames = 0
+        self.dropped = 0
+
+    async def connect(self, url: str = "memory://", **kwargs: Any) -> MemoryConnection:
+        """Same role as aio_pika.connect_robust"""
+        return MemoryConnection(self)
+
+    def declare_exchange(self, name: str, type: ExchangeType, durable: bool) -> BrokerExchange:
+        if name not in self.exchanges:
+            self.exchanges[name] = BrokerExchange(name, type, durable)
+        return self.exchanges[name]
+
+    def exchange(self, name: str) -> BrokerExchange:
+        if name not in self.exchanges:
+            raise ChannelNotFoundEntity(f"NOT_FOUND - no exchange '{name}'")
+        return self.exchanges[name]
+
+    def declare_queue(self, name: str, durable: bool, arguments: Optional[Dict[str, Any]]) -> BrokerQueue:
+        if name not in self.queues:
+            self.queues[name] = BrokerQueue(self, name, durable, arguments)
+        return self.queues[name]
+
+    def queue(self, name: str) -> BrokerQueue:
+        if name not in self.queues:
+            raise ChannelNotFoundEntity(f"NOT_FOUND - no queue '{name}'")
+        return self.queues[name]
+
+    def delete_queue(self, name: str) -> None:
+        self.queues.pop(name, None)
+        for exchange in self.exchanges.values():
+            exchange.unbind_queue(name)
+
+    def publish(self, exchange_name: str, message: Message, routing_key: str) -> None:
+        queue_names = self.exchange(exchange_name).route(routing_key)
+        self.published += 1
+        if not queue_names:
+            self.unroutable += 1
+        for queue_name in queue_names:
+            self.queues[queue_name].put(StoredMessage(message, exchange_name, routing_key))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "published": self.published,
+            "unroutable": self.unroutable,
+            "delivered": self.delivered,
+            "acked": self.acked,
+            "nacked": self.nacked,
+            "ack_frames": self.ack_frames,
+            "dropped": self.dropped,
+            "queued": {name: len(queue.messages) for name, queue in self.queues.items()},
+        }
+
+
+# Broker behind RABBITMQ_URL=memory://
+memory_broker = InMemoryBroker()
@@ -0,0 +1,261 @@
+"""
+Order consumer: decrements stock for the order events of the commandes service.
+
+Runs inside the API process (ORDER_CONSUMER_ENABLED) or as a separate worker:
+    python -m app.events.order_consumer
+"""
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import anyio.to_thread
+from aio_pika.abc import AbstractIncomingMessage
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.events import codecs
+from app.events.connection import RabbitMQConnection, rabbitmq_connection
+from app.events.dedup import dedup_store
+from app.events.producer import event_producer
+from app.events.stock_alerts import StockAlertPublisher, stock_alert_publisher
+from app.schemas.adapters import order_line_list_adapter
+from app.schemas.stock import StockAdjustmentLine
+from app.services.stock_service import StockChange, StockService
+
+logger = logging.getLogger(__name__)
+
+
+class PendingOrder(NamedTuple):
+    """A received order message and the stock decrements of its lines (none for other events)"""
+
+    message: AbstractIncomingMessage
+    lines: List[StockAdjustmentLine]
+
+
+class OrderStockConsumer:
+    """
+    Consumes the commandes.# events from their own queue and decrements stock for the
+    lines of the ORDER_STOCK_EVENTS ones, in micro-batches: orders are buffered until
+    batch_size of them arrived or window seconds passed, then their lines are merged per
+    produit_id and applied in one transaction. A hot product costs one row update per
+    batch instead of one per order line.
+
+    The same transaction records the message ids in processed_messages, so a redelivered
+    order is acked without decrementing twice. Messages are acked only after the commit,
+    with one basic.ack(multiple=True) on the consumer's own channel, so it covers no
+    other consumer's deliveries. When a batch fails (unknown product, stock too
+    low) its orders are applied one transaction each and only the failing ones rejected.
+    """
+
+    def __init__(
+        self,
+        connection: RabbitMQConnection,
+        session_factory: Callable[[], Session],
+        alerts: StockAlertPublisher,
+        batch_size: int,
+        window: float,
+        event_types: Iterable[str],
+    ):
+        self.connection = connection
+        self.session_factory = session_factory
+        self.alerts = alerts
+        self.batch_size = max(batch_size, 1)
+        self.window = window
+        self.event_types = set(event_types)
+        # The next batch is delivered while one is being committed
+        self.prefetch_count = self.batch_size * 2
+        self.channel = None
+        self.queue = None
+        self._pending: List[PendingOrder] = []
+        self._ready = asyncio.Event()
+        self._full = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._consumer_tag: Optional[str] = None
+        self._tasks: List[asyncio.Task] = []
+        self.batches = 0
+        self.orders = 0
+        self.lines = 0
+        self.rows = 0
+        self.ignored = 0
+        self.rejected = 0
+        self.fallbacks = 0
+
+    async def start(self) -> None:
+        """Declare and bind the orders queue, then consume it"""
+        await self.connection.declare_exchange(settings.RABBITMQ_EXCHANGE)
+        await self.connection.declare_queue(settings.RABBITMQ_QUEUE_ORDERS)
+        await self.connection.bind(settings.RABBITMQ_QUEUE_ORDERS, "commandes.#")
+        self.channel = await self.connection.consume_channel(self.prefetch_count)
+        self.queue = await self.channel.queue(settings.RABBITMQ_QUEUE_ORDERS)
+        self._tasks = [asyncio.create_task(self._run())]
+        self._consumer_tag = await self.queue.consume(self._receive)
+        logger.info(f"Consuming order events from {settings.RABBITMQ_QUEUE_ORDERS}")
+
+    async def stop(self) -> None:
+        """Stop receiving, apply the buffered orders and give the channel back"""
+        if self._consumer_tag:
+            await self.queue.cancel(self._consumer_tag)
+            self._consumer_tag = None
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+        if self.channel:
+            await self.connection.release_channel(self.channel)
+            self.channel = None
+            self.queue = None
+
+    async def flush(self) -> None:
+        """Apply the buffered orders in one transaction, then settle their messages"""
+        async with self._lock:
+            orders, self._pending = self._pending, []
+            self._ready.clear()
+            self._full.clear()
+            if not orders:
+                return
+            try:
+                changes, failed = await self._apply([order for order in orders if order.lines])
+            except Exception as e:
+                # Database unavailable: the broker delivers them again
+                logger.error(f"Failed to apply {len(orders)} orders, requeued: {e}")
+                for order in orders:
+                    await order.message.nack(requeue=True)
+                return
+
+            for order in failed:
+                await order.message.reject()
+            settled = [order for order in orders if order not in failed]
+            if settled:
+                await settled[-1].message.ack(multiple=True)
+            self.batches += 1
+            self.rows += len(changes)
+            self.rejected += len(failed)
+
+        try:
+            await self.alerts.publish(changes)
+        except Exception as e:
+            logger.error(f"Failed to publish stock alerts: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "orders": self.orders,
+            "lines": self.lines,
+            "rows_updated": self.rows,
+            "ignored": self.ignored,
+            "rejected": self.rejected,
+            "fallbacks": self.fallbacks,
+            "pending": len(self._pending),
+        }
+
+    async def _receive(self, message: AbstractIncomingMessage) -> None:
+        try:
+            order = self._parse(message)
+        except ValueError as e:
+            # Malformed: a redelivery would fail the same way
+            logger.error(f"Rejected order message {message.message_id or message.delivery_tag}: {e}")
+            self.rejected += 1
+            await message.reject()
+            return
+        if not order.lines:
+            self.ignored += 1
+        self._pending.append(order)
+        self._ready.set()
+        if len(self._pending) >= self.batch_size:
+            self._full.set()
+
+    def _parse(self, message: AbstractIncomingMessage) -> PendingOrder:
+        body = codecs.decode(message.body, message.content_type, message.content_encoding)
+        if not isinstance(body, dict):
+            raise ValueError("body is not an object")
+        # Enveloped by EventProducer, or bare data from RailwayRabbitMQ.publish
+        data = body.get("data", body)
+        event_type = body.get("event_type") or (message.headers or {}).get("event_type")
+        if not event_type:
+            event_type = (message.routing_key or "").partition(".")[2]
+        if event_type not in self.event_types:
+            return PendingOrder(message, [])
+        if not isinstance(data, dict):
+            raise ValueError("data is not an object")
+        lines = order_line_list_adapter.validate_python(data.get("lignes"))
+        return PendingOrder(
+            message, [StockAdjustmentLine(produit_id=line.produit_id, quantite=-line.quantite) for line in lines]
+        )
+
+    async def _apply(self, orders: List[PendingOrder]) -> Tuple[List[StockChange], List[PendingOrder]]:
+        """Apply the orders in one transaction, or one by one if that fails; returns the failed ones"""
+        if not orders:
+            return [], []
+        try:
+            changes = await anyio.to_thread.run_sync(self._apply_orders, orders)
+            self._count(orders)
+            return changes, []
+        except ValueError as e:
+            logger.warning(f"Batch of {len(orders)} orders failed ({e}), applying them one by one")
+            self.fallbacks += 1
+
+        changes, failed = [], []
+        for order in orders:
+            try:
+                changes += await anyio.to_thread.run_sync(self._apply_orders, [order])
+                self._count([order])
+            except ValueError as e:
+                logger.error(f"Rejected order message {order.message.message_id or order.message.delivery_tag}: {e}")
+                failed.append(order)
+        return changes, failed
+
+    def _apply_orders(self, orders: List[PendingOrder]) -> List[StockChange]:
+        with self.session_factory() as db:
+            return StockService(db).apply_orders([(order.message.message_id, order.lines) for order in orders])
+
+    def _count(self, orders: List[PendingOrder]) -> None:
+        self.orders += len(orders)
+        self.lines += sum(len(order.lines) for order in orders)
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            # Up to window seconds after the first buffered order, less if the batch fills
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self._full.wait(), self.window)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to settle order messages: {e}")
+
+
+# Global order consumer instance
+order_stock_consumer = OrderStockConsumer(
+    rabbitmq_connection,
+    SessionLocal,
+    stock_alert_publisher,
+    settings.ORDER_BATCH_SIZE,
+    settings.ORDER_BATCH_WINDOW_SECONDS,
+    filter(None, settings.ORDER_STOCK_EVENTS.split(",")),
+)
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    await event_producer.connect()
+    # Stock alerts of the applied orders go through the producer's queue
+    event_producer.start()
+    tasks = [asyncio.create_task(dedup_store.run())]
+    if stock_alert_publisher.window > 0:
+        tasks.append(asyncio.create_task(stock_alert_publisher.run()))
+    await order_stock_consumer.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await order_stock_consumer.stop()
+        for task in tasks:
+            task.cancel()
+        await event_producer.stop()
+        await event_producer.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+"""
+Outbox relay: publishes the events written to the outbox table by the write paths.
+
+Runs inside the API process (OUTBOX_RELAY_ENABLED) or as separate workers:
+    python -m app.events.outbox
+Relays share the table safely: each batch is claimed with FOR UPDATE SKIP LOCKED.
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import anyio.to_thread
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.events.producer import EventProducer, encode_event, event_producer
+from app.models.outbox import OutboxEvent
+from app.repositories.outbox_repo import OutboxRepository
+from app.schemas.event import EventType
+
+logger = logging.getLogger(__name__)
+
+
+def outbox_message_id(event_id: int) -> str:
+    """Stable id of an outbox event's message, unique across the services sharing the exchange"""
+    return f"{settings.SERVICE_NAME}.outbox.{event_id}"
+
+
+class OutboxRelay:
+    """
+    Claims pending outbox events in batches, publishes them with publisher confirms
+    and marks the confirmed ones sent in the same transaction that locked them.
+    Delivery is at least once: a relay stopped between the confirm and the commit
+    publishes the batch again, under the same message_id (derived from the outbox id),
+    which consumers use to skip it.
+
+    Events of a routing key are published one after the other in id order, the keys
+    concurrently; after a failure the rest of its key waits for the next batch instead
+    of overtaking it. An event failing OUTBOX_MAX_ATTEMPTS times is parked (date_echec)
+    so it no longer holds back the events behind it.
+    """
+
+    # Sent events are purged when idle, at most this often
+    purge_interval = 60
+
+    def __init__(
+        self,
+        producer: EventProducer,
+        session_factory: Callable[[], Session],
+        batch_size: int,
+        interval: float,
+    ):
+        self.producer = producer
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.interval = interval
+        self.relayed = 0
+        self.failed = 0
+        self.parked = 0
+        self.purged = 0
+        self._next_purge = 0.0
+
+    async def relay_batch(self) -> int:
+        """Publish one batch of pending events; returns how many were sent"""
+        db = self.session_factory()
+        try:
+            events = await anyio.to_thread.run_sync(OutboxRepository(db).claim_pending, self.batch_size)
+            if not events:
+                await anyio.to_thread.run_sync(db.rollback)
+                return 0
+
+            sent, errors = await self._publish_in_order(events)
+            # Read before the commit expires the events
+            parked = [
+                event.id
+                for event in events
+                if event.id in errors and event.tentatives + 1 >= settings.OUTBOX_MAX_ATTEMPTS
+            ]
+            await anyio.to_thread.run_sync(self._finish, db, sent, errors)
+        finally:
+            await anyio.to_thread.run_sync(db.close)
+
+        self.relayed += len(sent)
+        self.failed += len(errors)
+        self.parked += len(parked)
+        if errors:
+            logger.error(f"Failed to relay {len(errors)} outbox events: {next(iter(errors.values()))}")
+        if parked:
+            logger.error(f"Parked outbox events {parked} after {settings.OUTBOX_MAX_ATTEMPTS} failed attempts")
+        return len(sent)
+
+    async def purge(self) -> int:
+        """Delete one batch of events sent more than OUTBOX_RETENTION_HOURS ago"""
+        before = datetime.utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+        db = self.session_factory()
+        try:
+            purged = await anyio.to_thread.run_sync(self._purge, db, before)
+        finally:
+            await anyio.to_thread.run_sync(db.close)
+        self.purged += purged
+        return purged
+
+    async def run(self) -> None:
+        while True:
+            try:
+                # Full batches mean a backlog: go on without waiting
+                if await self.relay_batch() == self.batch_size:
+                    continue
+                if time.monotonic() >= self._next_purge:
+                    self._next_purge = time.monotonic() + self.purge_interval
+                    await self.purge()
+            except Exception as e:
+                logger.error(f"Outbox relay failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"relayed": self.relayed, "failed": self.failed, "parked": self.parked, "purged": self.purged}
+
+    async def _publish_in_order(self, events: List[OutboxEvent]) -> Tuple[List[int], Dict[int, str]]:
+        """Publish the claimed events; returns the ids sent and the errors of the failed ones"""
+        by_key: Dict[str, List[OutboxEvent]] = defaultdict(list)
+        for event in events:
+            by_key[event.routing_key].append(event)
+        sent: List[int] = []
+        errors: Dict[int, str] = {}
+
+        async def publish_key(key_events: List[OutboxEvent]) -> None:
+            for event in key_events:
+                try:
+                    await self._publish(event)
+                except Exception as e:
+                    errors[event.id] = str(e)
+                    return
+                sent.append(event.id)
+
+        await asyncio.gather(*(publish_key(key_events) for key_events in by_key.values()))
+        return sent, errors
+
+    async def _publish(self, event: OutboxEvent) -> None:
+        encoded = encode_event(EventType(event.event_type), event.payload, event.date_creation)
+        await self.producer.publish_message(event.routing_key, encoded, message_id=outbox_message_id(event.id))
+
+    def _finish(self, db: Session, sent: List[int], errors: Dict[int, str]) -> None:
+        repository = OutboxRepository(db)
+        repository.mark_sent(sent, datetime.utcnow())
+        repository.mark_failed(errors, settings.OUTBOX_MAX_ATTEMPTS, datetime.utcnow())
+        db.commit()
+
+    def _purge(self, db: Session, before: datetime) -> int:
+        purged = OutboxRepository(db).purge_sent(before, self.batch_size)
+        db.commit()
+        return purged
+
+
+# Global outbox relay instance
+outbox_relay = OutboxRelay(
+    event_producer, SessionLocal, settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_POLL_INTERVAL_SECONDS
+)
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    await event_producer.connect()
+    try:
+        await outbox_relay.run()
+    finally:
+        await event_producer.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
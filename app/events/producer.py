@@ -1,65 +1,206 @@
-import json
+import asyncio
 import logging
+import time
+from collections import deque
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, NamedTuple, Optional
+from uuid import uuid4
 
 import aio_pika
-from aio_pika import ExchangeType, Message
+from aio_pika import Message
 
 from app.config import settings
-from app.schemas.event import Event, EventType
+from app.events import codecs
+from app.events.connection import RabbitMQConnection, rabbitmq_connection
+from app.schemas.event import EventType
 
 logger = logging.getLogger(__name__)
 
 
+def encode_event(
+    event_type: EventType, data: Dict[str, Any], timestamp: Optional[datetime] = None
+) -> codecs.EncodedBody:
+    """Encode the fields of an Event, without building the model, with the configured codec"""
+    event = {
+        "event_type": event_type.value,
+        "timestamp": timestamp or datetime.utcnow(),
+        "data": data,
+        "metadata": None,
+    }
+    return codecs.encode(event)
+
+
+def build_message(encoded: codecs.EncodedBody, message_id: Optional[str] = None) -> Message:
+    """Persistent message; without a message_id, a new UUID that retries of the message keep"""
+    return Message(
+        body=encoded.body,
+        content_type=encoded.content_type,
+        content_encoding=encoded.content_encoding,
+        delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+        message_id=message_id or str(uuid4()),
+    )
+
+
+class QueuedMessage(NamedTuple):
+    routing_key: str
+    message: Message
+    enqueued_at: float
+
+
 class EventProducer:
-    def __init__(self):
-        self.connection = None
-        self.channel = None
-        self.exchange = None
+    """
+    Publishes events to the RabbitMQ exchange.
+
+    Once start() has run, publish_event only puts the message on a bounded in-memory
+    queue and returns; a background task drains it in batches over a channel in
+    publisher-confirm mode, retrying what the broker did not confirm. When the queue
+    is full, publishers wait up to EVENT_ENQUEUE_TIMEOUT_SECONDS for room, then get
+    asyncio.QueueFull. Without start() (tests, scripts), events are published inline.
+    Publishes go over the channel pool of the shared RabbitMQ connection.
+    """
+
+    def __init__(self, connection: RabbitMQConnection = rabbitmq_connection):
+        self.connection = connection
+        self.queue: Optional["asyncio.Queue[QueuedMessage]"] = None
+        self._drain_task: Optional[asyncio.Task] = None
+        self.published = 0
+        self.failed = 0
+        self.rejected = 0
+        # Enqueue to broker confirm, in seconds, for the most recent messages
+        self._latencies = deque(maxlen=1000)
 
     async def connect(self):
-        """Establish connection to RabbitMQ"""
-        try:
-            self.connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
-            self.channel = await self.connection.channel()
-            self.exchange = await self.channel.declare_exchange(
-                settings.RABBITMQ_EXCHANGE, ExchangeType.TOPIC, durable=True
-            )
-            logger.info("Connected to RabbitMQ")
-        except Exception as e:
-            logger.error(f"Failed to connect to RabbitMQ: {e}")
-            raise
+        """Establish connection to RabbitMQ and declare the events exchange"""
+        await self.connection.declare_exchange(settings.RABBITMQ_EXCHANGE)
 
     async def disconnect(self):
         """Close RabbitMQ connection"""
-        if self.connection and not self.connection.is_closed:
-            await self.connection.close()
-            logger.info("Disconnected from RabbitMQ")
+        await self.connection.close()
 
-    async def publish_event(self, event_type: EventType, data: Dict[str, Any], routing_key: str = "products"):
-        """Publish an event to RabbitMQ"""
-        if not self.exchange:
-            await self.connect()
+    @property
+    def running(self) -> bool:
+        return self._drain_task is not None and not self._drain_task.done()
+
+    def start(self):
+        """Queue events from now on and publish them from a background task"""
+        self.queue = asyncio.Queue(maxsize=settings.EVENT_QUEUE_SIZE)
+        self._drain_task = asyncio.create_task(self._drain())
+
+    async def stop(self, timeout: Optional[float] = None):
+        """Publish what is still queued (up to timeout seconds), then stop the background task"""
+        if not self._drain_task:
+            return
+        timeout = settings.EVENT_FLUSH_TIMEOUT_SECONDS if timeout is None else timeout
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.queue.qsize()} events not published before shutdown")
+        self._drain_task.cancel()
+        try:
+            await self._drain_task
+        except asyncio.CancelledError:
+            pass
+        self._drain_task = None
 
-        event = Event(event_type=event_type, timestamp=datetime.utcnow(), data=data)
+    async def publish_event(self, event_type: EventType, data: Dict[str, Any], routing_key: str = "products"):
+        """Publish an event to RabbitMQ, or queue it for the background task once started"""
+        message = build_message(encode_event(event_type, data))
+        routing_key = f"{routing_key}.{event_type.value}"
 
-        message_body = json.dumps(event.model_dump(), default=str)
+        if self.running:
+            await self._enqueue(QueuedMessage(routing_key, message, time.monotonic()))
+            return
 
         try:
-            await self.exchange.publish(
-                Message(
-                    body=message_body.encode(),
-                    content_type="application/json",
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
-                ),
-                routing_key=f"{routing_key}.{event_type.value}",
-            )
+            await self.connection.publish(message, routing_key)
             logger.info(f"Published event: {event_type.value}")
         except Exception as e:
             logger.error(f"Failed to publish event: {e}")
             raise
 
+    async def publish_message(self, routing_key: str, encoded: codecs.EncodedBody, message_id: Optional[str] = None):
+        """Publish an encoded event right away, returning once the broker has confirmed it"""
+        await self.connection.publish(build_message(encoded, message_id), routing_key)
+
+    async def publish_events(
+        self, event_type: EventType, items: List[Dict[str, Any]], routing_key: str = "products", batch_size: int = 100
+    ):
+        """Publish many events of one type, with up to batch_size publishes in flight at once"""
+        if not items:
+            return
+        if self.running:
+            for data in items:
+                await self.publish_event(event_type, data, routing_key)
+            return
+
+        for start in range(0, len(items), batch_size):
+            await asyncio.gather(
+                *(self.publish_event(event_type, data, routing_key) for data in items[start : start + batch_size])
+            )
+
+    async def _enqueue(self, queued: QueuedMessage):
+        try:
+            self.queue.put_nowait(queued)
+        except asyncio.QueueFull:
+            # Backpressure: the request waits for the drain task to make room
+            try:
+                await asyncio.wait_for(self.queue.put(queued), settings.EVENT_ENQUEUE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise asyncio.QueueFull(f"Event queue full ({self.queue.maxsize} events)")
+
+    async def _drain(self):
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < settings.EVENT_BATCH_SIZE and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            # Until confirmed, the batch is retried and the queue fills up behind it
+            while batch:
+                batch = await self._publish_batch(batch)
+                if batch:
+                    await asyncio.sleep(settings.EVENT_RETRY_DELAY_SECONDS)
+
+    async def _publish_batch(self, batch: List[QueuedMessage]) -> List[QueuedMessage]:
+        """Publish a batch with all confirms awaited together; returns the messages to retry"""
+        try:
+            await self.connect()
+        except Exception as e:
+            logger.error(f"Failed to publish {len(batch)} events: {e}")
+            self.failed += len(batch)
+            return batch
+        results = await asyncio.gather(
+            *(self.connection.publish(queued.message, queued.routing_key) for queued in batch),
+            return_exceptions=True,
+        )
+
+        retry = []
+        now = time.monotonic()
+        for queued, result in zip(batch, results):
+            if isinstance(result, Exception):
+                retry.append(queued)
+                continue
+            self._latencies.append(now - queued.enqueued_at)
+            self.queue.task_done()
+        self.published += len(batch) - len(retry)
+        if retry:
+            self.failed += len(retry)
+            error = next(result for result in results if isinstance(result, Exception))
+            logger.error(f"Failed to publish {len(retry)} of {len(batch)} events: {error}")
+        return retry
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        return {
+            "queued": self.queue.qsize() if self.queue else 0,
+            "capacity": settings.EVENT_QUEUE_SIZE,
+            "published": self.published,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+            "latency_p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2) if latencies else None,
+        }
+
 
 # Global event producer instance
 event_producer = EventProducer()
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, NamedTuple
+
+from app.config import settings
+from app.events.producer import EventProducer, event_producer
+from app.schemas.event import EventType
+from app.schemas.stock import StockResponse
+from app.services.stock_service import StockChange
+
+logger = logging.getLogger(__name__)
+
+
+class PendingAlert(NamedTuple):
+    alerte_initiale: bool
+    data: Dict[str, Any]
+
+
+def alert_data(stock: StockResponse) -> Dict[str, Any]:
+    return {
+        "product_id": str(stock.produit_id),
+        "quantite_disponible": stock.quantite_disponible,
+        "quantite_reservee": stock.quantite_reservee,
+        "quantite_minimum": stock.quantite_minimum,
+        "alerte_stock_bas": stock.alerte_stock_bas,
+    }
+
+
+class StockAlertPublisher:
+    """
+    Publishes low-stock alerts on edges of alerte_stock_bas only: STOCK_LOW_ALERT when
+    a stock falls under its minimum, STOCK_ALERT_RECOVERED when it gets back to it.
+    Writes that leave the flag unchanged publish nothing.
+
+    With a window (STOCK_ALERT_DIGEST_SECONDS > 0) edges are held and flushed by run()
+    as one STOCK_ALERT_DIGEST per window with the latest state of each product;
+    products back in their state from the start of the window are left out.
+    """
+
+    def __init__(self, producer: EventProducer, window: float):
+        self.producer = producer
+        self.window = window
+        self.published = 0
+        self.coalesced = 0
+        self._pending: Dict[str, PendingAlert] = {}
+
+    async def publish(self, changes: Iterable[StockChange]) -> None:
+        edges = [change for change in changes if change.alert_changed]
+        if self.window > 0:
+            for change in edges:
+                self._hold(change)
+            return
+
+        low = [alert_data(change.stock) for change in edges if change.stock.alerte_stock_bas]
+        recovered = [alert_data(change.stock) for change in edges if not change.stock.alerte_stock_bas]
+        await self.producer.publish_events(EventType.STOCK_LOW_ALERT, low)
+        await self.producer.publish_events(EventType.STOCK_ALERT_RECOVERED, recovered)
+        self.published += len(edges)
+
+    def _hold(self, change: StockChange) -> None:
+        product_id = str(change.stock.produit_id)
+        pending = self._pending.get(product_id)
+        if pending:
+            self.coalesced += 1
+        initial = pending.alerte_initiale if pending else change.alerte_precedente
+        self._pending[product_id] = PendingAlert(initial, alert_data(change.stock))
+
+    async def flush(self) -> None:
+        """Publish the held edges as one digest; they are held again if publishing fails"""
+        pending, self._pending = self._pending, {}
+        alerts = [entry.data for entry in pending.values() if entry.data["alerte_stock_bas"] != entry.alerte_initiale]
+        if not alerts:
+            return
+        try:
+            await self.producer.publish_event(
+                EventType.STOCK_ALERT_DIGEST,
+                {
+                    "alertes": [data for data in alerts if data["alerte_stock_bas"]],
+                    "retablis": [data for data in alerts if not data["alerte_stock_bas"]],
+                    "fenetre_secondes": self.window,
+                },
+            )
+        except Exception:
+            # Edges written meanwhile are newer, but the window started with the older state
+            for product_id, entry in pending.items():
+                newer = self._pending.get(product_id)
+                self._pending[product_id] = PendingAlert(entry.alerte_initiale, newer.data if newer else entry.data)
+            raise
+        self.published += len(alerts)
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to publish stock alert digest: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "digest_seconds": self.window,
+            "published": self.published,
+            "coalesced": self.coalesced,
+            "pending": len(self._pending),
+        }
+
+
+# Global stock alert publisher instance
+stock_alert_publisher = StockAlertPublisher(event_producer, settings.STOCK_ALERT_DIGEST_SECONDS)
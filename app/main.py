@@ -1,6 +1,9 @@
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+from typing import List, Tuple
 
+import anyio.to_thread
 from alembic import command
 from alembic.config import Config
 from fastapi import FastAPI
@@ -8,7 +11,19 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1 import api_router
 from app.config import settings
+from app.database import SessionLocal, async_engine
+from app.events.connection import rabbitmq_connection
+from app.events.dedup import dedup_store
+from app.events.order_consumer import order_stock_consumer
+from app.events.outbox import outbox_relay
 from app.events.producer import event_producer
+from app.events.stock_alerts import stock_alert_publisher
+from app.services.cache import read_cache
+from app.services.change_service import ChangeService
+from app.services.reservation_service import ReservationService
+from app.services.search_index import product_search_index
+from app.services.stock_service import StockChange
+from app.services.stock_stream import stock_stream_hub
 
 # ------------------------------------------------------------------------------
 # Logging
@@ -39,6 +54,135 @@ def run_migrations():
         raise
 
 
+# ------------------------------------------------------------------------------
+# Search index
+# ------------------------------------------------------------------------------
+def build_search_index():
+    """
+    Load the catalog into the in-memory search index.
+    On failure searches keep using the database.
+    """
+    db = SessionLocal()
+    try:
+        product_search_index.build(db)
+    except Exception as e:
+        logger.warning(f"Failed to build search index, using database search: {e}")
+    finally:
+        db.close()
+
+
+# ------------------------------------------------------------------------------
+# Reservation sweeper
+# ------------------------------------------------------------------------------
+def release_expired_reservations() -> Tuple[int, List[StockChange]]:
+    """
+    Release expired stock holds, one batch per transaction, until none is left.
+    Returns how many were released and the stocks they moved, for the alert edges.
+    """
+    released = 0
+    changes: List[StockChange] = []
+    db = SessionLocal()
+    try:
+        service = ReservationService(db)
+        while True:
+            expiry = service.release_expired(settings.RESERVATION_SWEEP_BATCH_SIZE)
+            released += expiry.released
+            changes.extend(expiry.changes)
+            if expiry.released < settings.RESERVATION_SWEEP_BATCH_SIZE:
+                return released, changes
+    finally:
+        db.close()
+
+
+async def reservation_sweeper():
+    while True:
+        await asyncio.sleep(settings.RESERVATION_SWEEP_INTERVAL_SECONDS)
+        try:
+            released, changes = await anyio.to_thread.run_sync(release_expired_reservations)
+        except Exception as e:
+            logger.error(f"Failed to release expired reservations: {e}")
+            continue
+        if released:
+            logger.info(f"Released {released} expired stock reservations")
+        # Stocks back above their minimum
+        try:
+            await stock_alert_publisher.publish(changes)
+        except Exception as e:
+            logger.error(f"Failed to publish event: {e}")
+
+
+# ------------------------------------------------------------------------------
+# Change log compaction
+# ------------------------------------------------------------------------------
+def compact_change_log(after: int) -> int:
+    """Compact the change log from seq `after` on; returns the seq to resume from"""
+    db = SessionLocal()
+    try:
+        result = ChangeService(db).compact(after, settings.CHANGE_LOG_COMPACT_BATCH_SIZE)
+    finally:
+        db.close()
+    if result.compacted or result.purged:
+        logger.info(f"Compacted {result.compacted} change log entries, purged {result.purged} tombstones")
+    return result.last_seq
+
+
+async def change_log_compactor():
+    # The first pass goes over the whole log, later ones only over the new entries
+    after = 0
+    while True:
+        await asyncio.sleep(settings.CHANGE_LOG_COMPACT_INTERVAL_SECONDS)
+        try:
+            after = await anyio.to_thread.run_sync(compact_change_log, after)
+        except Exception as e:
+            logger.error(f"Failed to compact the change log: {e}")
+
+
+# ------------------------------------------------------------------------------
+# Order consumer
+# ------------------------------------------------------------------------------
+async def start_order_consumer():
+    """Decrement stock for the order events of the commandes service (ORDER_CONSUMER_ENABLED)"""
+    if not settings.ORDER_CONSUMER_ENABLED:
+        return
+    try:
+        await order_stock_consumer.start()
+    except Exception as e:
+        logger.warning(f"Failed to start the order consumer: {e}")
+
+
+# ------------------------------------------------------------------------------
+# Background tasks
+# ------------------------------------------------------------------------------
+def start_background_tasks() -> List[asyncio.Task]:
+    """
+    Expired reservations sweeper, change log compaction, purge of the processed message ids
+    shared by the consumers, outbox relay (OUTBOX_RELAY_ENABLED) and, if
+    STOCK_ALERT_DIGEST_SECONDS > 0, the low-stock alert digest
+    """
+    tasks = [
+        asyncio.create_task(reservation_sweeper()),
+        asyncio.create_task(change_log_compactor()),
+        asyncio.create_task(dedup_store.run()),
+    ]
+    if settings.OUTBOX_RELAY_ENABLED:
+        tasks.append(asyncio.create_task(outbox_relay.run()))
+    if stock_alert_publisher.window > 0:
+        tasks.append(asyncio.create_task(stock_alert_publisher.run()))
+    return tasks
+
+
+async def stop_background_tasks(tasks: List[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    # Alert edges held since the last digest
+    try:
+        await stock_alert_publisher.flush()
+    except Exception as e:
+        logger.warning(f"Failed to publish the last stock alert digest: {e}")
+
+
 # ------------------------------------------------------------------------------
 # Lifespan
 # ------------------------------------------------------------------------------
@@ -48,25 +192,45 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting application...")
 
+    # Sync endpoints and the DB calls of async ones share this threadpool
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
     # 1️⃣ Migrations DB (skip during testing)
     if not settings.TESTING:
         run_migrations()
     else:
         logger.info("Skipping migrations in test mode")
 
-    # 2️⃣ RabbitMQ (skip during testing)
+    # 2️⃣ In-memory search index (SEARCH_BACKEND=memory)
+    if product_search_index.enabled and not settings.TESTING:
+        build_search_index()
+
+    # 3️⃣ RabbitMQ (skip during testing)
     if not settings.TESTING:
         try:
             await event_producer.connect()
             logger.info("RabbitMQ connection established")
         except Exception as e:
             logger.warning(f"Failed to connect to RabbitMQ: {e}")
+        # Requests only queue their events; a background task publishes them
+        event_producer.start()
+        await start_order_consumer()
+
+    # 4️⃣ Reservations sweeper, change log compaction, outbox relay and alert digest (skip during testing)
+    tasks = [] if settings.TESTING else start_background_tasks()
 
     yield
 
     # Shutdown
     logger.info("Shutting down application...")
+    await stop_background_tasks(tasks)
+    # Ends the open stock streams
+    await stock_stream_hub.stop()
+    await async_engine.dispose()
     if not settings.TESTING:
+        # Applies the orders it still buffers
+        await order_stock_consumer.stop()
+        await event_producer.stop()
         try:
             await event_producer.disconnect()
             logger.info("RabbitMQ connection closed")
@@ -94,6 +258,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 
@@ -120,6 +285,20 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "search_index": product_search_index.stats(),
+        "cache": read_cache.stats(),
+        "stock_alerts": stock_alert_publisher.stats(),
+        "events": event_producer.stats(),
+        "rabbitmq": rabbitmq_connection.stats(),
+        "outbox": outbox_relay.stats(),
+        "orders": order_stock_consumer.stats(),
+        "stock_stream": stock_stream_hub.stats(),
+    }
+
+
 # ------------------------------------------------------------------------------
 # Local dev entrypoint
 # ------------------------------------------------------------------------------
@@ -1,6 +1,25 @@
 from app.models.base import UUID, Base
 from app.models.category import Category
+from app.models.change_log import ChangeLogEntry
+from app.models.outbox import OutboxEvent
+from app.models.processed_message import ProcessedMessage
 from app.models.product import Product, ProductStatus
+from app.models.reservation import ReservationStatus, StockReservation
 from app.models.stock import Stock
 
-__all__ = ["Base", "UUID", "Category", "Product", "ProductStatus", "Stock"]
+# Registers the full-text search DDL on the products table
+from app.models import search  # isort: skip
+
+__all__ = [
+    "Base",
+    "UUID",
+    "Category",
+    "ChangeLogEntry",
+    "OutboxEvent",
+    "ProcessedMessage",
+    "Product",
+    "ProductStatus",
+    "Stock",
+    "StockReservation",
+    "ReservationStatus",
+]
@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, String, Text
+from sqlalchemy import Column, DateTime, Index, String, Text
 from sqlalchemy.orm import relationship
 
 from app.models.base import UUID, Base
@@ -9,6 +9,7 @@ from app.models.base import UUID, Base
 
 class Category(Base):
     __tablename__ = "categories"
+    __table_args__ = (Index("ix_categories_date_creation_id", "date_creation", "id"),)
 
     id = Column(UUID(), primary_key=True, default=uuid.uuid4)
     nom = Column(String(100), nullable=False, unique=True)
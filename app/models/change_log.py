@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, Column, DateTime, Index, Integer, String
+
+from app.models.base import UUID, Base
+
+
+class ChangeLogEntry(Base):
+    """
+    Change of a category, product or stock, in commit order, read by GET /changes.
+    Stocks are identified by their produit_id. Compaction keeps the latest entry of
+    each entity, so the log is also a snapshot of the catalog.
+    """
+
+    __tablename__ = "change_log"
+
+    # Increasing sequence, resumed from by the feed (SQLite only autoincrements INTEGER keys)
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    entite = Column(String(20), nullable=False)
+    entite_id = Column(UUID(), nullable=False)
+    # "upsert" or "delete" (tombstone)
+    operation = Column(String(10), nullable=False)
+    date_changement = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ChangeLogEntry(seq={self.seq}, entite='{self.entite}', operation='{self.operation}')>"
+
+
+# Compaction deletes the earlier entries of an entity
+Index("ix_change_log_entite", ChangeLogEntry.entite, ChangeLogEntry.entite_id, ChangeLogEntry.seq)
+# Tombstones expire by date
+Index(
+    "ix_change_log_tombstones",
+    ChangeLogEntry.date_changement,
+    postgresql_where=ChangeLogEntry.operation == "delete",
+    sqlite_where=ChangeLogEntry.operation == "delete",
+)
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, BigInteger, Column, DateTime, Index, Integer, String, Text, and_
+
+from app.models.base import Base
+
+
+class OutboxEvent(Base):
+    """Event written in the same transaction as the change it describes, published later by the relay"""
+
+    __tablename__ = "outbox"
+
+    # Increasing id: the relay publishes in write order (SQLite only autoincrements INTEGER keys)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    event_type = Column(String(100), nullable=False)
+    routing_key = Column(String(200), nullable=False)
+    payload = Column(JSON, nullable=False)
+
+    # Échecs de publication
+    tentatives = Column(Integer, nullable=False, default=0)
+    derniere_erreur = Column(Text)
+
+    date_creation = Column(DateTime, nullable=False, default=datetime.utcnow)
+    date_envoi = Column(DateTime)
+    # Set after OUTBOX_MAX_ATTEMPTS failures: parked for inspection, no longer relayed
+    date_echec = Column(DateTime)
+
+    def __repr__(self):
+        return f"<OutboxEvent(id={self.id}, event_type='{self.event_type}', envoye={self.date_envoi is not None})>"
+
+
+# Only pending events are indexed: the relay's scan stays small however many have been sent or parked
+Index(
+    "ix_outbox_pending",
+    OutboxEvent.id,
+    postgresql_where=and_(OutboxEvent.date_envoi.is_(None), OutboxEvent.date_echec.is_(None)),
+    sqlite_where=and_(OutboxEvent.date_envoi.is_(None), OutboxEvent.date_echec.is_(None)),
+)
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, String
+
+from app.models.base import Base
+
+
+class ProcessedMessage(Base):
+    """Message handled by the event consumer, kept DEDUP_RETENTION_HOURS to skip redeliveries"""
+
+    __tablename__ = "processed_messages"
+
+    message_id = Column(String(200), primary_key=True)
+    date_traitement = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f"<ProcessedMessage(message_id='{self.message_id}')>"
@@ -2,7 +2,7 @@ import uuid
 from datetime import datetime
 from enum import Enum as PyEnum
 
-from sqlalchemy import Column, DateTime, Enum, ForeignKey, Numeric, String, Text
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Numeric, String, Text
 from sqlalchemy.orm import relationship
 
 from app.models.base import UUID, Base
@@ -17,6 +17,7 @@ class ProductStatus(str, PyEnum):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (Index("ix_products_date_creation_id", "date_creation", "id"),)
 
     id = Column(UUID(), primary_key=True, default=uuid.uuid4)
     sku = Column(String(50), unique=True, nullable=False)
@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime
+from enum import Enum as PyEnum
+
+from sqlalchemy import Column, DateTime, Enum, ForeignKey, Index, Integer, String
+
+from app.models.base import UUID, Base
+
+
+class ReservationStatus(str, PyEnum):
+    ACTIVE = "active"
+    CONFIRMEE = "confirmee"
+    LIBEREE = "liberee"
+    EXPIREE = "expiree"
+
+
+class StockReservation(Base):
+    """Quantity held on a product's stock until it is confirmed, released or expires"""
+
+    __tablename__ = "stock_reservations"
+    # The sweeper scans active holds by expiry date
+    __table_args__ = (Index("ix_stock_reservations_statut_expiration", "statut", "date_expiration"),)
+
+    id = Column(UUID(), primary_key=True, default=uuid.uuid4)
+    produit_id = Column(UUID(), ForeignKey("products.id", ondelete="CASCADE"), nullable=False, index=True)
+    quantite = Column(Integer, nullable=False)
+    statut = Column(Enum(ReservationStatus), nullable=False, default=ReservationStatus.ACTIVE)
+
+    # Commande ou panier à l'origine de la réservation
+    reference = Column(String(100))
+
+    date_creation = Column(DateTime, default=datetime.utcnow)
+    date_expiration = Column(DateTime, nullable=False)
+    date_modification = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StockReservation(produit_id='{self.produit_id}', quantite={self.quantite}, statut='{self.statut}')>"
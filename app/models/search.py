@@ -0,0 +1,49 @@
+"""
+Full-text search structures for the products table.
+
+The search column is dialect specific, so it is not mapped on the Product
+model: PostgreSQL gets a generated `search_vector` tsvector column with a
+GIN index (see migration 003), SQLite gets an external-content FTS5 table
+kept in sync by triggers. Both are created alongside `products` by
+`Base.metadata.create_all`, which is what the test setup relies on.
+"""
+from sqlalchemy import DDL, event
+
+from app.models.product import Product
+
+# Columns indexed for search, with their ts_rank weight on PostgreSQL
+SEARCH_FIELDS = (("nom", "A"), ("origine", "B"), ("description", "C"), ("notes_qualite", "C"))
+
+POSTGRES_SEARCH_VECTOR = " || ".join(
+    f"setweight(to_tsvector('french', coalesce({field}, '')), '{weight}')" for field, weight in SEARCH_FIELDS
+)
+
+_columns = ", ".join(field for field, _ in SEARCH_FIELDS)
+_new_values = ", ".join(f"new.{field}" for field, _ in SEARCH_FIELDS)
+_old_values = ", ".join(f"old.{field}" for field, _ in SEARCH_FIELDS)
+
+POSTGRES_DDL = [
+    f"ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({POSTGRES_SEARCH_VECTOR}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING gin (search_vector)",
+]
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5({_columns}, content='products', "
+    f"content_rowid='rowid', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN "
+    f"INSERT INTO products_fts(rowid, {_columns}) VALUES (new.rowid, {_new_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN "
+    f"INSERT INTO products_fts(products_fts, rowid, {_columns}) VALUES ('delete', old.rowid, {_old_values}); END",
+    f"CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE ON products BEGIN "
+    f"INSERT INTO products_fts(products_fts, rowid, {_columns}) VALUES ('delete', old.rowid, {_old_values}); "
+    f"INSERT INTO products_fts(rowid, {_columns}) VALUES (new.rowid, {_new_values}); END",
+]
+
+for statement in POSTGRES_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+for statement in SQLITE_DDL:
+    event.listen(Product.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+event.listen(Product.__table__, "before_drop", DDL("DROP TABLE IF EXISTS products_fts").execute_if(dialect="sqlite"))
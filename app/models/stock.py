@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, cast, func, literal_column
 from sqlalchemy.orm import relationship
 
 from app.models.base import UUID, Base
@@ -32,3 +32,22 @@ class Stock(Base):
 
     def __repr__(self):
         return f"<Stock(produit_id='{self.produit_id}', disponible={self.quantite_disponible})>"
+
+
+# Gravité d'une alerte: part du seuil minimum encore disponible (0 = rupture, < 1 = sous le seuil)
+# Constants are inlined rather than bound so queries repeat the indexed expression verbatim;
+# the float numerator already makes the plain "/" a true division on every dialect
+ZERO = literal_column("0")
+alert_severity = cast(Stock.quantite_disponible - func.coalesce(Stock.quantite_reservee, ZERO), Float).op(
+    "/", return_type=Float
+)(func.nullif(Stock.quantite_minimum, ZERO))
+
+# Partial index holding only the stocks in alert, in severity order: GET /stock/alerts
+# reads one page of it however many stocks the catalog has
+Index(
+    "ix_stocks_alerte_severite",
+    alert_severity,
+    Stock.id,
+    postgresql_where=Stock.alerte_stock_bas.is_(True),
+    sqlite_where=Stock.alerte_stock_bas.is_(True),
+)
@@ -0,0 +1,71 @@
+import csv
+import io
+from typing import Any, Dict, List
+
+from sqlalchemy import Connection, Table, insert
+from sqlalchemy.orm import Session
+
+
+def bulk_insert(db: Session, table: Table, rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert many rows in the current transaction.
+    PostgreSQL gets a single COPY through psycopg2 (copy_expert) or asyncpg
+    (copy_records_to_table); other drivers and databases a multi-row INSERT.
+    Rows must all carry the same keys, including generated ids.
+    """
+    if not rows:
+        return
+    connection = db.connection()
+    driver = connection.dialect.driver
+    if connection.dialect.name == "postgresql" and driver == "psycopg2":
+        _copy_rows(connection, table, rows)
+    elif connection.dialect.name == "postgresql" and driver == "asyncpg" and _in_driver_transaction(connection):
+        _copy_records(connection, table, rows)
+    else:
+        db.execute(insert(table), rows)
+
+
+def _bound_values(connection: Connection, table: Table, rows: List[Dict[str, Any]]) -> List[List[Any]]:
+    """Column values of the rows, with the same conversions as a regular INSERT (UUID, JSON, Enum, ...)"""
+    columns = [table.c[name] for name in rows[0]]
+    processors = [column.type.bind_processor(connection.dialect) for column in columns]
+    return [
+        [
+            processor(row[column.key]) if processor is not None and row[column.key] is not None else row[column.key]
+            for column, processor in zip(columns, processors)
+        ]
+        for row in rows
+    ]
+
+
+def _copy_rows(connection: Connection, table: Table, rows: List[Dict[str, Any]]) -> None:
+    buffer = io.StringIO()
+    # Non-numeric values are quoted, so an unquoted empty field is NULL and "" an empty string
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for values in _bound_values(connection, table, rows):
+        writer.writerow([str(value) if value is not None else None for value in values])
+    buffer.seek(0)
+
+    column_list = ", ".join(f'"{table.c[name].name}"' for name in rows[0])
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{table.name}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+
+
+def _in_driver_transaction(connection: Connection) -> bool:
+    """
+    Whether the asyncpg connection has opened its transaction: the adapter only starts
+    it with the first statement, and a COPY sent before would commit on its own.
+    """
+    return connection.connection.driver_connection.is_in_transaction()
+
+
+def _copy_records(connection: Connection, table: Table, rows: List[Dict[str, Any]]) -> None:
+    records = [tuple(values) for values in _bound_values(connection, table, rows)]
+    columns = [table.c[name].name for name in rows[0]]
+    # Runs the coroutine on the session's async connection, from the greenlet of AsyncSession.run_sync
+    connection.connection.dbapi_connection.run_async(
+        lambda driver: driver.copy_records_to_table(table.name, records=records, columns=columns)
+    )
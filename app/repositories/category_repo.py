@@ -1,22 +1,41 @@
-from typing import List, Optional
+from typing import Iterable, List, Optional, Set
 from uuid import UUID
 
+from sqlalchemy import Row, select
 from sqlalchemy.orm import Session
 
 from app.models.category import Category
+from app.repositories.pagination import paginate
 from app.schemas.category import CategoryCreate, CategoryUpdate
 
 
 class CategoryRepository:
+    # Keyset pagination order, served by ix_categories_date_creation_id
+    cursor_columns = (Category.date_creation, Category.id)
+
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[Category]:
-        return self.db.query(Category).offset(skip).limit(limit).all()
+    def get_all(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Category]:
+        return paginate(self.db.query(Category), self.cursor_columns, skip, limit, cursor)
 
     def get_by_id(self, category_id: UUID) -> Optional[Category]:
         return self.db.query(Category).filter(Category.id == category_id).first()
 
+    def get_version(self, category_id: UUID) -> Optional[Row]:
+        """(id, date_modification) of a category, for conditional requests"""
+        return self.db.query(Category.id, Category.date_modification).filter(Category.id == category_id).first()
+
+    def existing_ids(self, category_ids: Iterable[UUID]) -> Set[UUID]:
+        """Category ids among the given ones that exist, in one query"""
+        category_ids = list(category_ids)
+        if not category_ids:
+            return set()
+        return set(self.db.scalars(select(Category.id).where(Category.id.in_(category_ids))))
+
+    def get_many(self, category_ids: Iterable[UUID]) -> List[Category]:
+        return list(self.db.scalars(select(Category).where(Category.id.in_(list(category_ids)))))
+
     def get_by_code(self, code: str) -> Optional[Category]:
         return self.db.query(Category).filter(Category.code == code).first()
 
@@ -0,0 +1,142 @@
+"""
+Change log of the catalog, written in the transaction of the changes it records.
+
+ORM writes of categories, products and stocks are picked up at flush; writes that go
+around the ORM (UPDATE ... RETURNING, bulk inserts) call record_changes. The entries of
+a transaction are inserted just before it commits, deduplicated per entity. On
+PostgreSQL they are inserted under a transaction-level advisory lock, so sequence
+numbers are handed out in commit order and a reader never sees a later seq commit
+before an earlier one: the lock is only held between that insert and the commit.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import bindparam, delete, event, func, select, text
+from sqlalchemy.orm import Session, SessionTransaction
+
+from app.models.category import Category
+from app.models.change_log import ChangeLogEntry
+from app.models.product import Product
+from app.models.stock import Stock
+from app.repositories.bulk import bulk_insert
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+# Changes of the current transaction, in Session.info: (entite, entite_id) -> operation
+PENDING_CHANGES = "change_log.pending"
+# Arbitrary key of the PostgreSQL advisory lock ordering the change log writers
+CHANGE_LOG_LOCK_ID = 7350211
+
+# Entity name and identifier of each tracked model
+TRACKED_MODELS = {
+    Category: ("category", lambda category: category.id),
+    Product: ("product", lambda product: product.id),
+    Stock: ("stock", lambda stock: stock.produit_id),
+}
+
+
+def record_changes(db: Session, entite: str, ids: Iterable[UUID], operation: str = UPSERT) -> None:
+    """Record changes made in the current transaction outside the ORM"""
+    pending: Dict[Tuple[str, UUID], str] = db.info.setdefault(PENDING_CHANGES, {})
+    for entite_id in ids:
+        pending[(entite, entite_id)] = operation
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flushed(session: Session, flush_context) -> None:
+    # Still the pre-flush state here, attribute history included
+    modified = [instance for instance in session.dirty if session.is_modified(instance)]
+    for instances, operation in ((session.new, UPSERT), (modified, UPSERT), (session.deleted, DELETE)):
+        for instance in instances:
+            tracked = TRACKED_MODELS.get(type(instance))
+            if tracked:
+                entite, identify = tracked
+                record_changes(session, entite, [identify(instance)], operation)
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending(session: Session) -> None:
+    # The commit flushes after this hook: flush first so its changes are recorded too
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.pop(PENDING_CHANGES, None)
+    if pending:
+        ChangeLogRepository(session).add_many(pending)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending(session: Session, transaction: SessionTransaction) -> None:
+    # Rolled back (or ended without commit): its changes never happened
+    if transaction.parent is None:
+        session.info.pop(PENDING_CHANGES, None)
+
+
+class ChangeLogRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add_many(self, changes: Dict[Tuple[str, UUID], str]) -> None:
+        """Insert change entries without committing; call last before the commit"""
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CHANGE_LOG_LOCK_ID})
+        now = datetime.utcnow()
+        rows = [
+            {"entite": entite, "entite_id": entite_id, "operation": operation, "date_changement": now}
+            for (entite, entite_id), operation in changes.items()
+        ]
+        bulk_insert(self.db, ChangeLogEntry.__table__, rows)
+
+    def get_since(self, seq: int, limit: int, entite: Optional[str] = None) -> List[ChangeLogEntry]:
+        """Entries after seq, of one entity type if given, in sequence order"""
+        query = select(ChangeLogEntry).where(ChangeLogEntry.seq > seq)
+        if entite:
+            query = query.where(ChangeLogEntry.entite == entite)
+        return list(self.db.scalars(query.order_by(ChangeLogEntry.seq).limit(limit)))
+
+    def last_seq(self) -> int:
+        return self.db.scalar(select(func.max(ChangeLogEntry.seq))) or 0
+
+    def compact(self, after: int, limit: int) -> Tuple[int, int]:
+        """
+        Delete the entries superseded by one of the next limit entries after seq `after`,
+        without committing. Returns the last seq examined and how many entries were deleted.
+        """
+        query = (
+            select(ChangeLogEntry.seq, ChangeLogEntry.entite, ChangeLogEntry.entite_id)
+            .where(ChangeLogEntry.seq > after)
+            .order_by(ChangeLogEntry.seq)
+            .limit(limit)
+        )
+        latest: Dict[Tuple[str, UUID], int] = {}
+        for seq, entite, entite_id in self.db.execute(query):
+            latest[(entite, entite_id)] = seq
+            after = seq
+        if not latest:
+            return after, 0
+
+        entries = ChangeLogEntry.__table__
+        statement = delete(entries).where(
+            entries.c.entite == bindparam("b_entite"),
+            entries.c.entite_id == bindparam("b_entite_id"),
+            entries.c.seq < bindparam("b_seq"),
+        )
+        result = self.db.execute(
+            statement,
+            [
+                {"b_entite": entite, "b_entite_id": entite_id, "b_seq": seq}
+                for (entite, entite_id), seq in latest.items()
+            ],
+        )
+        return after, max(result.rowcount, 0)
+
+    def purge_tombstones(self, before: datetime, limit: int) -> int:
+        """Delete up to limit tombstones written before the given date, without committing"""
+        expired = (
+            select(ChangeLogEntry.seq)
+            .where(ChangeLogEntry.operation == DELETE, ChangeLogEntry.date_changement < before)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        return self.db.execute(delete(ChangeLogEntry).where(ChangeLogEntry.seq.in_(expired))).rowcount
@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import case, delete, select, update
+from sqlalchemy.orm import Session
+
+from app.models.outbox import OutboxEvent
+from app.repositories.bulk import bulk_insert
+from app.schemas.event import EventType
+
+
+class OutboxRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def add(self, event_type: EventType, data: Dict[str, Any], routing_key: str = "products") -> None:
+        """Write an event in the current transaction, without committing"""
+        self.add_many(event_type, [data], routing_key)
+
+    def add_many(self, event_type: EventType, items: List[Dict[str, Any]], routing_key: str = "products") -> None:
+        now = datetime.utcnow()
+        rows = [
+            {
+                "event_type": event_type.value,
+                "routing_key": f"{routing_key}.{event_type.value}",
+                "payload": data,
+                "tentatives": 0,
+                "date_creation": now,
+            }
+            for data in items
+        ]
+        bulk_insert(self.db, OutboxEvent.__table__, rows)
+
+    def claim_pending(self, limit: int) -> List[OutboxEvent]:
+        """
+        Lock up to limit pending events, oldest first, until the transaction ends.
+        SKIP LOCKED lets concurrent relays take the next rows instead of waiting.
+        Parked events are left out.
+        """
+        return (
+            self.db.query(OutboxEvent)
+            .filter(OutboxEvent.date_envoi.is_(None), OutboxEvent.date_echec.is_(None))
+            .order_by(OutboxEvent.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+    def mark_sent(self, event_ids: List[int], sent_at: datetime) -> None:
+        if event_ids:
+            self.db.execute(update(OutboxEvent).where(OutboxEvent.id.in_(event_ids)).values(date_envoi=sent_at))
+
+    def mark_failed(self, errors: Dict[int, str], max_attempts: int, failed_at: datetime) -> None:
+        """Count a failed attempt; events reaching max_attempts are parked with date_echec"""
+        attempts = OutboxEvent.tentatives + 1
+        for event_id, error in errors.items():
+            self.db.execute(
+                update(OutboxEvent)
+                .where(OutboxEvent.id == event_id)
+                .values(
+                    tentatives=attempts,
+                    derniere_erreur=error[:1000],
+                    date_echec=case((attempts >= max_attempts, failed_at), else_=None),
+                )
+            )
+
+    def purge_sent(self, before: datetime, limit: int) -> int:
+        """Delete up to limit events sent before the given date, without committing"""
+        sent = select(OutboxEvent.id).where(OutboxEvent.date_envoi < before).limit(limit).scalar_subquery()
+        return self.db.execute(delete(OutboxEvent).where(OutboxEvent.id.in_(sent))).rowcount
@@ -0,0 +1,55 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page as an opaque cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else str(value) for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> tuple:
+    """Decode a cursor back into values typed after the given sort columns"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(payload, list) or len(payload) != len(columns):
+            raise ValueError
+        return tuple(_load_value(value, column) for value, column in zip(payload, columns))
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid pagination cursor")
+
+
+def _load_value(value: str, column: Any) -> Any:
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    return python_type(value)
+
+
+def paginate(query: Query, columns: Sequence[Any], skip: int, limit: int, cursor: Optional[str] = None) -> List[Any]:
+    """
+    Order a query on the (sort_key, id) columns and fetch one page.
+    With a cursor the page seeks past the last seen key, so every page
+    costs the same index range scan; without one it falls back to offset.
+    """
+    query = query.order_by(*columns)
+    if cursor:
+        query = query.filter(tuple_(*columns) > decode_cursor(cursor, columns))
+    elif skip:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+
+def next_cursor(items: Sequence[Any], limit: int, columns: Sequence[Any]) -> Optional[str]:
+    """Cursor pointing after the last item, or None when the page is the last one"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor([getattr(last, column.key) for column in columns])
@@ -0,0 +1,50 @@
+from datetime import datetime
+from typing import Iterable, Set
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.processed_message import ProcessedMessage
+
+
+class ProcessedMessageRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def exists(self, message_id: str) -> bool:
+        query = select(ProcessedMessage.message_id).where(ProcessedMessage.message_id == message_id)
+        return self.db.execute(query).first() is not None
+
+    def existing(self, message_ids: Iterable[str]) -> Set[str]:
+        """The given message ids already recorded, in one query"""
+        query = select(ProcessedMessage.message_id).where(ProcessedMessage.message_id.in_(list(message_ids)))
+        return set(self.db.scalars(query))
+
+    def add_many(self, message_ids: Iterable[str]) -> None:
+        """Record processed messages without committing, in the transaction of their effects"""
+        now = datetime.utcnow()
+        self.db.add_all([ProcessedMessage(message_id=message_id, date_traitement=now) for message_id in message_ids])
+        self.db.flush()
+
+    def add(self, message_id: str) -> bool:
+        """Record a processed message; False if it was already recorded"""
+        self.db.add(ProcessedMessage(message_id=message_id, date_traitement=datetime.utcnow()))
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            return False
+        return True
+
+    def purge(self, before: datetime, limit: int) -> int:
+        """Delete up to limit messages processed before the given date"""
+        expired = (
+            select(ProcessedMessage.message_id)
+            .where(ProcessedMessage.date_traitement < before)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        deleted = self.db.execute(delete(ProcessedMessage).where(ProcessedMessage.message_id.in_(expired))).rowcount
+        self.db.commit()
+        return deleted
@@ -1,46 +1,106 @@
+import re
 from decimal import Decimal
-from typing import List, Optional
+from typing import AbstractSet, Any, Dict, Iterable, Iterator, List, Optional, Set
 from uuid import UUID
 
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, cast, column, false, func, literal_column, select, table
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.orm import Query, Session, joinedload, selectinload
 
+from app.config import settings
 from app.models.product import Product, ProductStatus
+from app.models.stock import Stock
+from app.repositories.bulk import bulk_insert
+from app.repositories.change_log_repo import record_changes
+from app.repositories.pagination import paginate
 from app.schemas.product import ProductCreate, ProductUpdate
 
 
+def compute_prix_ttc(prix_ht, taux_tva) -> Decimal:
+    return Decimal(str(prix_ht)) * (1 + Decimal(str(taux_tva)) / 100)
+
+
 class ProductRepository:
+    # Keyset pagination order, served by ix_products_date_creation_id
+    cursor_columns = (Product.date_creation, Product.id)
+
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all(self, skip: int = 0, limit: int = 100, status: Optional[ProductStatus] = None) -> List[Product]:
-        query = self.db.query(Product)
+    def get_all(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[ProductStatus] = None,
+        cursor: Optional[str] = None,
+        include: AbstractSet[str] = frozenset(),
+    ) -> List[Product]:
+        query = self._with_relations(self.db.query(Product), include)
         if status:
             query = query.filter(Product.statut == status)
-        return query.offset(skip).limit(limit).all()
+        return paginate(query, self.cursor_columns, skip, limit, cursor)
+
+    def get_by_id(self, product_id: UUID, include: AbstractSet[str] = frozenset()) -> Optional[Product]:
+        return self._with_relations(self.db.query(Product), include).filter(Product.id == product_id).first()
 
-    def get_by_id(self, product_id: UUID) -> Optional[Product]:
-        return self.db.query(Product).filter(Product.id == product_id).first()
+    def get_version(self, product_id: UUID) -> Optional[Row]:
+        """(id, date_modification) of a product, for conditional requests"""
+        return self.db.query(Product.id, Product.date_modification).filter(Product.id == product_id).first()
+
+    def get_many(self, product_ids: Iterable[UUID]) -> List[Product]:
+        return list(self.db.scalars(select(Product).where(Product.id.in_(list(product_ids)))))
 
     def get_by_sku(self, sku: str) -> Optional[Product]:
         return self.db.query(Product).filter(Product.sku == sku).first()
 
-    def get_by_category(self, category_id: UUID, skip: int = 0, limit: int = 100) -> List[Product]:
-        return self.db.query(Product).filter(Product.categorie_id == category_id).offset(skip).limit(limit).all()
+    def existing_skus(self, skus: Iterable[str]) -> Set[str]:
+        """SKUs among the given ones that are already in the catalog, in one query"""
+        skus = list(skus)
+        if not skus:
+            return set()
+        return set(self.db.scalars(select(Product.sku).where(Product.sku.in_(skus))))
+
+    def get_by_category(
+        self,
+        category_id: UUID,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include: AbstractSet[str] = frozenset(),
+    ) -> List[Product]:
+        query = self._with_relations(self.db.query(Product), include).filter(Product.categorie_id == category_id)
+        return paginate(query, self.cursor_columns, skip, limit, cursor)
 
     def create(self, product: ProductCreate) -> Product:
-        # Calculate prix_ttc
-        prix_ttc = Decimal(str(product.prix_ht)) * (1 + Decimal(str(product.taux_tva)) / 100)
+        db_product = self.add(product)
+        self.db.commit()
+        self.db.refresh(db_product)
+        return db_product
 
+    def add(self, product: ProductCreate) -> Product:
+        """Same as create, without committing; flushed so the id is set"""
         product_dict = product.model_dump()
-        product_dict["prix_ttc"] = prix_ttc
+        product_dict["prix_ttc"] = compute_prix_ttc(product.prix_ht, product.taux_tva)
 
         db_product = Product(**product_dict)
         self.db.add(db_product)
-        self.db.commit()
-        self.db.refresh(db_product)
+        self.db.flush()
         return db_product
 
+    def bulk_create(self, products: List[Dict[str, Any]]) -> None:
+        """Insert prepared product rows without committing"""
+        bulk_insert(self.db, Product.__table__, products)
+        record_changes(self.db, "product", (product["id"] for product in products))
+
     def update(self, product_id: UUID, product_update: ProductUpdate) -> Optional[Product]:
+        db_product = self.apply_update(product_id, product_update)
+        if db_product:
+            self.db.commit()
+            self.db.refresh(db_product)
+        return db_product
+
+    def apply_update(self, product_id: UUID, product_update: ProductUpdate) -> Optional[Product]:
+        """Same as update, without committing"""
         db_product = self.get_by_id(product_id)
         if db_product:
             update_data = product_update.model_dump(exclude_unset=True)
@@ -49,13 +109,11 @@ class ProductRepository:
             if "prix_ht" in update_data or "taux_tva" in update_data:
                 prix_ht = update_data.get("prix_ht", db_product.prix_ht)
                 taux_tva = update_data.get("taux_tva", db_product.taux_tva)
-                update_data["prix_ttc"] = Decimal(prix_ht) * (1 + Decimal(taux_tva) / 100)
+                update_data["prix_ttc"] = compute_prix_ttc(prix_ht, taux_tva)
 
             for field, value in update_data.items():
                 setattr(db_product, field, value)
-
-            self.db.commit()
-            self.db.refresh(db_product)
+            self.db.flush()
         return db_product
 
     def delete(self, product_id: UUID) -> bool:
@@ -66,11 +124,88 @@ class ProductRepository:
             return True
         return False
 
-    def search(self, query: str, skip: int = 0, limit: int = 100) -> List[Product]:
+    def search(
+        self, query: str, skip: int = 0, limit: int = 100, include: AbstractSet[str] = frozenset()
+    ) -> List[Product]:
+        return self._with_relations(self._search_query(query), include).offset(skip).limit(limit).all()
+
+    def iter_export_rows(
+        self,
+        status: Optional[ProductStatus] = None,
+        category_id: Optional[UUID] = None,
+        search: Optional[str] = None,
+        include_stock: bool = False,
+        batch_size: int = 1000,
+    ) -> Iterator[Row]:
+        """
+        Stream plain product rows (optionally joined with their stock levels) without
+        building ORM objects. Rows are fetched batch_size at a time from a server-side
+        cursor where the driver supports it, so memory does not grow with the catalog.
+        """
+        if search:
+            query = self._search_query(search)
+        else:
+            query = self.db.query(Product).order_by(*self.cursor_columns)
+        if status:
+            query = query.filter(Product.statut == status)
+        if category_id:
+            query = query.filter(Product.categorie_id == category_id)
+
+        columns = list(Product.__table__.c)
+        if include_stock:
+            query = query.outerjoin(Stock, Stock.produit_id == Product.id)
+            columns += [
+                Stock.quantite_disponible,
+                Stock.quantite_reservee,
+                Stock.quantite_minimum,
+                Stock.alerte_stock_bas,
+            ]
+
+        yield from query.with_entities(*columns).execution_options(yield_per=batch_size)
+
+    def _with_relations(self, query: Query, include: AbstractSet[str]) -> Query:
+        # Relations are loaded for the whole page at once: one extra SELECT ... IN for
+        # the stocks and a JOIN for the categories, whatever the page size
+        if "stock" in include:
+            query = query.options(selectinload(Product.stock))
+        if "category" in include:
+            query = query.options(joinedload(Product.categorie))
+        return query
+
+    def _search_query(self, query: str) -> Query:
+        # The in-memory index falls back to the database full-text search
+        fulltext = settings.SEARCH_BACKEND in ("fulltext", "memory")
+        dialect = self.db.get_bind().dialect.name
+        if fulltext and dialect == "postgresql":
+            return self._search_tsvector(query)
+        if fulltext and dialect == "sqlite":
+            return self._search_fts5(query)
+        return self._search_ilike(query)
+
+    def _search_ilike(self, query: str) -> Query:
+        return self.db.query(Product).filter(Product.nom.ilike(f"%{query}%") | Product.description.ilike(f"%{query}%"))
+
+    def _search_tsvector(self, query: str) -> Query:
+        # Served by the GIN index on the generated products.search_vector column
+        search_vector = literal_column("products.search_vector")
+        ts_query = func.websearch_to_tsquery(cast("french", REGCONFIG), query)
+        return (
+            self.db.query(Product)
+            .filter(search_vector.op("@@")(ts_query))
+            .order_by(func.ts_rank(search_vector, ts_query).desc(), Product.id)
+        )
+
+    def _search_fts5(self, query: str) -> Query:
+        # Quote every term so user input cannot inject FTS5 syntax; terms match as prefixes
+        terms = re.findall(r"\w+", query)
+        if not terms:
+            return self.db.query(Product).filter(false())
+        match = " ".join(f'"{term}"*' for term in terms)
+
+        fts = table("products_fts", column("rowid"), column("rank"))
         return (
             self.db.query(Product)
-            .filter(Product.nom.ilike(f"%{query}%") | Product.description.ilike(f"%{query}%"))
-            .offset(skip)
-            .limit(limit)
-            .all()
+            .join(fts, fts.c.rowid == literal_column("products.rowid"))
+            .filter(literal_column("products_fts").op("MATCH")(match))
+            .order_by(fts.c.rank)
         )
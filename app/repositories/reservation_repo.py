@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import Row, select, update
+from sqlalchemy.orm import Session
+
+from app.models.reservation import ReservationStatus, StockReservation
+
+
+class ReservationRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_by_id(self, reservation_id: UUID) -> Optional[StockReservation]:
+        return self.db.query(StockReservation).filter(StockReservation.id == reservation_id).first()
+
+    def create(
+        self, product_id: UUID, quantity: int, expires_at: datetime, reference: Optional[str] = None
+    ) -> StockReservation:
+        """Add an active hold without committing"""
+        db_reservation = StockReservation(
+            produit_id=product_id,
+            quantite=quantity,
+            statut=ReservationStatus.ACTIVE,
+            reference=reference,
+            date_expiration=expires_at,
+        )
+        self.db.add(db_reservation)
+        self.db.flush()
+        return db_reservation
+
+    def close(
+        self, reservation_id: UUID, statut: ReservationStatus, unexpired_at: Optional[datetime] = None
+    ) -> Optional[Row]:
+        """
+        Move an active hold (not expired at unexpired_at, if given) to statut without
+        committing. The transition is a single conditional UPDATE, so a hold is closed
+        at most once even under concurrent calls. Returns the updated row, or None if
+        the hold was not active anymore.
+        """
+        reservations = StockReservation.__table__
+        conditions = [reservations.c.id == reservation_id, reservations.c.statut == ReservationStatus.ACTIVE]
+        if unexpired_at is not None:
+            conditions.append(reservations.c.date_expiration > unexpired_at)
+        statement = update(reservations).where(*conditions).values(statut=statut).returning(*reservations.c)
+        return self.db.execute(statement).first()
+
+    def release_for_product(self, product_id: UUID) -> int:
+        """Release the active holds of a product without committing, when its stock is deleted"""
+        reservations = StockReservation.__table__
+        statement = (
+            update(reservations)
+            .where(reservations.c.produit_id == product_id, reservations.c.statut == ReservationStatus.ACTIVE)
+            .values(statut=ReservationStatus.LIBEREE)
+        )
+        return self.db.execute(statement).rowcount
+
+    def expire_due(self, now: datetime, limit: int = 1000) -> List[Row]:
+        """
+        Mark up to limit expired holds as such without committing and return their
+        (produit_id, quantite). Holds locked by another sweeper are skipped.
+        """
+        reservations = StockReservation.__table__
+        due = (
+            select(reservations.c.id)
+            .where(reservations.c.statut == ReservationStatus.ACTIVE, reservations.c.date_expiration <= now)
+            .order_by(reservations.c.date_expiration)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(reservations)
+            .where(reservations.c.id.in_(due), reservations.c.statut == ReservationStatus.ACTIVE)
+            .values(statut=ReservationStatus.EXPIREE)
+            .returning(reservations.c.produit_id, reservations.c.quantite)
+        )
+        return self.db.execute(statement).all()
@@ -1,19 +1,34 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set
 from uuid import UUID
 
+from sqlalchemy import Row, bindparam, func, select, update
 from sqlalchemy.orm import Session
 
-from app.models.stock import Stock
+from app.models.product import Product
+from app.models.stock import Stock, alert_severity
+from app.repositories.bulk import bulk_insert
+from app.repositories.change_log_repo import record_changes
+from app.repositories.pagination import paginate
 from app.schemas.stock import StockCreate, StockUpdate
 
 
+def available_quantity(stock: Stock) -> int:
+    """Quantity that can still be sold or reserved"""
+    return stock.quantite_disponible - (stock.quantite_reservee or 0)
+
+
 class StockRepository:
+    # Keyset pagination order, served by the unique index on produit_id
+    cursor_columns = (Stock.produit_id, Stock.id)
+    # Alerts, most severe first, served by the partial index ix_stocks_alerte_severite
+    alert_cursor_columns = (alert_severity.label("severite"), Stock.id)
+
     def __init__(self, db: Session):
         self.db = db
 
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[Stock]:
-        return self.db.query(Stock).offset(skip).limit(limit).all()
+    def get_all(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[Stock]:
+        return paginate(self.db.query(Stock), self.cursor_columns, skip, limit, cursor)
 
     def get_by_id(self, stock_id: UUID) -> Optional[Stock]:
         return self.db.query(Stock).filter(Stock.id == stock_id).first()
@@ -21,54 +36,216 @@ class StockRepository:
     def get_by_product(self, product_id: UUID) -> Optional[Stock]:
         return self.db.query(Stock).filter(Stock.produit_id == product_id).first()
 
-    def get_low_stock(self) -> List[Stock]:
-        return self.db.query(Stock).filter(Stock.alerte_stock_bas.is_(True)).all()
+    def get_many_by_product(self, product_ids: Iterable[UUID]) -> List[Stock]:
+        return list(self.db.scalars(select(Stock).where(Stock.produit_id.in_(list(product_ids)))))
+
+    def get_alert_product_ids(self) -> Set[UUID]:
+        """Products whose stock is in alert: the rows of the partial index ix_stocks_alerte_severite"""
+        return set(self.db.scalars(select(Stock.produit_id).where(Stock.alerte_stock_bas.is_(True))))
+
+    def get_version(self, stock_id: UUID) -> Optional[Row]:
+        """(id, date_modification) of a stock, for conditional requests"""
+        return self.db.query(Stock.id, Stock.date_modification).filter(Stock.id == stock_id).first()
+
+    def get_version_by_product(self, product_id: UUID) -> Optional[Row]:
+        return self.db.query(Stock.id, Stock.date_modification).filter(Stock.produit_id == product_id).first()
+
+    def get_low_stock(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, include_product: bool = False
+    ) -> List[Row]:
+        """
+        One page of the stocks in alert with their severite, most severe first.
+        include_product adds the product sku and nom through a join.
+        """
+        query = self.db.query(*Stock.__table__.c, self.alert_cursor_columns[0])
+        if include_product:
+            query = query.join(Product, Product.id == Stock.produit_id).add_columns(Product.sku, Product.nom)
+        # Same predicate as the partial index, so the planner can use it
+        query = query.filter(Stock.alerte_stock_bas.is_(True))
+        return paginate(query, self.alert_cursor_columns, skip, limit, cursor)
 
     def create(self, stock: StockCreate) -> Stock:
+        db_stock = self.add(stock)
+        self.db.commit()
+        self.db.refresh(db_stock)
+        return db_stock
+
+    def add(self, stock: StockCreate) -> Stock:
+        """Same as create, without committing"""
         db_stock = Stock(**stock.model_dump())
         # Check if stock is low
-        db_stock.alerte_stock_bas = db_stock.quantite_disponible < db_stock.quantite_minimum
+        db_stock.alerte_stock_bas = available_quantity(db_stock) < db_stock.quantite_minimum
         self.db.add(db_stock)
-        self.db.commit()
-        self.db.refresh(db_stock)
+        self.db.flush()
         return db_stock
 
+    def bulk_create(self, stocks: List[Dict[str, Any]]) -> None:
+        """Insert prepared stock rows without committing"""
+        bulk_insert(self.db, Stock.__table__, stocks)
+        record_changes(self.db, "stock", (stock["produit_id"] for stock in stocks))
+
     def update(self, stock_id: UUID, stock_update: StockUpdate) -> Optional[Stock]:
-        db_stock = self.get_by_id(stock_id)
+        db_stock = self.apply_update(stock_id, stock_update)
+        if db_stock:
+            self.db.commit()
+            self.db.refresh(db_stock)
+        return db_stock
+
+    def apply_update(self, stock_id: UUID, stock_update: StockUpdate) -> Optional[Stock]:
+        """
+        Same as update, without committing. Raises ValueError if the stock would fall
+        below its reserved quantity; the row is locked so a hold cannot slip in between.
+        """
+        db_stock = self.db.query(Stock).filter(Stock.id == stock_id).with_for_update().populate_existing().first()
         if db_stock:
             update_data = stock_update.model_dump(exclude_unset=True)
+            reserved = db_stock.quantite_reservee or 0
+            if update_data.get("quantite_disponible", db_stock.quantite_disponible) < reserved:
+                raise ValueError(f"Stock quantity cannot be lower than the reserved quantity ({reserved})")
             for field, value in update_data.items():
                 setattr(db_stock, field, value)
 
             # Update alert status
-            db_stock.alerte_stock_bas = db_stock.quantite_disponible < db_stock.quantite_minimum
-
-            self.db.commit()
-            self.db.refresh(db_stock)
+            db_stock.alerte_stock_bas = available_quantity(db_stock) < db_stock.quantite_minimum
+            self.db.flush()
         return db_stock
 
-    def adjust_quantity(self, product_id: UUID, quantity_change: int) -> Optional[Stock]:
-        db_stock = self.get_by_product(product_id)
-        if db_stock:
-            # Validate that stock won't go negative
-            new_quantity = db_stock.quantite_disponible + quantity_change
-            if new_quantity < 0:
-                raise ValueError("Stock quantity cannot be negative")
+    def adjust_quantity(self, product_id: UUID, quantity_change: int) -> Optional[Row]:
+        """
+        Apply a stock movement in one conditional UPDATE ... RETURNING.
+        The database checks the new quantity and recomputes the alert flag from the row
+        it is updating, so concurrent adjustments can neither be lost nor go negative.
+        """
+        stock = self.apply_adjustment(product_id, quantity_change)
+        self.db.commit()
+        return stock
 
-            db_stock.quantite_disponible = new_quantity
+    def apply_adjustment(self, product_id: UUID, quantity_change: int) -> Optional[Row]:
+        """Same as adjust_quantity, without committing. Reserved units cannot be removed."""
+        return self._apply_movement(product_id, quantity_change, 0, "Stock quantity cannot be negative")
 
-            # Update timestamps based on operation type
-            if quantity_change > 0:
-                db_stock.date_derniere_entree = datetime.utcnow()
-            elif quantity_change < 0:
-                db_stock.date_derniere_sortie = datetime.utcnow()
+    def reserve_quantity(self, product_id: UUID, quantity: int) -> Optional[Row]:
+        """Hold quantity out of the available stock, without committing"""
+        return self._apply_movement(product_id, 0, quantity, "Insufficient stock available")
 
-            # Update alert status
-            db_stock.alerte_stock_bas = db_stock.quantite_disponible < db_stock.quantite_minimum
+    def confirm_quantity(self, product_id: UUID, quantity: int) -> Optional[Row]:
+        """Ship held quantity: it leaves both the stock and the reservations, without committing"""
+        return self._apply_movement(product_id, -quantity, -quantity, "Reserved quantity exceeds stock")
 
-            self.db.commit()
-            self.db.refresh(db_stock)
-        return db_stock
+    def release_quantity(self, product_id: UUID, quantity: int) -> Optional[Row]:
+        """Give held quantity back to the available stock, without committing"""
+        return self._apply_movement(product_id, 0, -quantity, "Reserved quantity cannot be negative")
+
+    def release_quantities(self, quantities: Dict[UUID, int]) -> List[Row]:
+        """
+        release_quantity for many products, without committing. Unlike release_quantity it
+        never raises: the sweeper gives back what it expired. Returns the rows with
+        alerte_precedente, like _apply_movement.
+        """
+        stocks = Stock.__table__
+        quantity = bindparam("b_quantite")
+        reservee = func.coalesce(stocks.c.quantite_reservee, 0) - quantity
+        # RETURNING sees the new reserved quantity: add the released one back
+        previous = stocks.c.quantite_disponible - func.coalesce(stocks.c.quantite_reservee, 0) - quantity
+        statement = (
+            update(stocks)
+            .where(stocks.c.produit_id == bindparam("b_produit_id"))
+            .values(
+                quantite_reservee=reservee,
+                alerte_stock_bas=stocks.c.quantite_disponible - reservee < stocks.c.quantite_minimum,
+            )
+            .returning(*stocks.c, (previous < stocks.c.quantite_minimum).label("alerte_precedente"))
+        )
+        # One statement per product (RETURNING rules out executemany), in the lock order of adjust_many
+        released = []
+        for product_id in sorted(quantities):
+            stock = self.db.execute(
+                statement, {"b_produit_id": product_id, "b_quantite": quantities[product_id]}
+            ).first()
+            if stock is not None:
+                released.append(stock)
+        record_changes(self.db, "stock", quantities)
+        return released
+
+    def _apply_movement(
+        self, product_id: UUID, disponible_change: int, reservee_change: int, error: str
+    ) -> Optional[Row]:
+        """
+        Move stock in one conditional UPDATE ... RETURNING. The row is only updated
+        if the available quantity (disponible - reservee) and the reserved quantity
+        stay non-negative; otherwise ValueError(error) is raised, or None returned
+        if the product has no stock. The returned row also has alerte_precedente,
+        the alert flag before the movement.
+        """
+        stocks = Stock.__table__
+        # SET expressions see the row before the update, so these are the new quantities
+        disponible = stocks.c.quantite_disponible + disponible_change
+        reservee = func.coalesce(stocks.c.quantite_reservee, 0) + reservee_change
+        values = {"alerte_stock_bas": disponible - reservee < stocks.c.quantite_minimum}
+        if disponible_change:
+            values["quantite_disponible"] = disponible
+        if reservee_change:
+            values["quantite_reservee"] = reservee
+        if disponible_change > 0:
+            values["date_derniere_entree"] = datetime.utcnow()
+        elif disponible_change < 0:
+            values["date_derniere_sortie"] = datetime.utcnow()
+
+        # RETURNING sees the new quantities: undo the movement to get the flag it replaced
+        previous = (
+            stocks.c.quantite_disponible
+            - func.coalesce(stocks.c.quantite_reservee, 0)
+            - (disponible_change - reservee_change)
+        )
+        statement = (
+            update(stocks)
+            .where(stocks.c.produit_id == product_id, disponible - reservee >= 0, reservee >= 0)
+            .values(**values)
+            .returning(*stocks.c, (previous < stocks.c.quantite_minimum).label("alerte_precedente"))
+        )
+        stock = self.db.execute(statement).first()
+        if stock is None and self.exists_for_product(product_id):
+            raise ValueError(error)
+        if stock is not None:
+            record_changes(self.db, "stock", [product_id])
+        return stock
+
+    def adjust_many(self, changes: Dict[UUID, int]) -> List[Row]:
+        """
+        Apply several movements in one transaction, all or nothing.
+        Rows are locked in produit_id order first, so concurrent batches touching
+        the same products queue up instead of deadlocking.
+        """
+        stocks = self.apply_many(changes)
+        self.db.commit()
+        return stocks
+
+    def apply_many(self, changes: Dict[UUID, int]) -> List[Row]:
+        """Same as adjust_many, without committing; rolls back before raising ValueError"""
+        product_ids = sorted(changes)
+        locked = (
+            self.db.query(Stock.produit_id)
+            .filter(Stock.produit_id.in_(product_ids))
+            .order_by(Stock.produit_id)
+            .with_for_update()
+            .all()
+        )
+        missing = set(product_ids) - {row.produit_id for row in locked}
+        if missing:
+            self.db.rollback()
+            raise ValueError(f"Stock not found for products {', '.join(sorted(map(str, missing)))}")
+
+        stocks = []
+        for product_id in product_ids:
+            try:
+                stocks.append(self.apply_adjustment(product_id, changes[product_id]))
+            except ValueError as e:
+                self.db.rollback()
+                raise ValueError(f"{e} (product {product_id})")
+        return stocks
+
+    def exists_for_product(self, product_id: UUID) -> bool:
+        return self.db.scalar(select(Stock.id).where(Stock.produit_id == product_id)) is not None
 
     def delete(self, stock_id: UUID) -> bool:
         db_stock = self.get_by_id(stock_id)
@@ -1,22 +1,51 @@
 from app.schemas.category import CategoryBase, CategoryCreate, CategoryResponse, CategoryUpdate
+from app.schemas.change import ChangeEntry, ChangeFeed
 from app.schemas.event import Event, EventType, ProductEvent, StockEvent
-from app.schemas.product import ProductBase, ProductCreate, ProductResponse, ProductUpdate
-from app.schemas.stock import StockAdjustment, StockBase, StockCreate, StockResponse, StockUpdate
+from app.schemas.product import (
+    ProductBase,
+    ProductBulkResponse,
+    ProductBulkResult,
+    ProductCreate,
+    ProductResponse,
+    ProductUpdate,
+)
+from app.schemas.reservation import ReservationCreate, ReservationResponse
+from app.schemas.stock import (
+    StockAdjustment,
+    StockAdjustmentLine,
+    StockAlertResponse,
+    StockAlertWithProduct,
+    StockBase,
+    StockBatchAdjustment,
+    StockCreate,
+    StockResponse,
+    StockUpdate,
+)
 
 __all__ = [
     "CategoryBase",
     "CategoryCreate",
     "CategoryUpdate",
     "CategoryResponse",
+    "ChangeEntry",
+    "ChangeFeed",
     "ProductBase",
     "ProductCreate",
     "ProductUpdate",
     "ProductResponse",
+    "ProductBulkResult",
+    "ProductBulkResponse",
     "StockBase",
     "StockCreate",
     "StockUpdate",
     "StockAdjustment",
+    "StockAdjustmentLine",
+    "StockBatchAdjustment",
     "StockResponse",
+    "StockAlertResponse",
+    "StockAlertWithProduct",
+    "ReservationCreate",
+    "ReservationResponse",
     "Event",
     "EventType",
     "ProductEvent",
@@ -0,0 +1,37 @@
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.schemas.category import CategoryResponse
+from app.schemas.change import ChangeFeed
+from app.schemas.event import OrderLine
+from app.schemas.product import ProductResponse, ProductWithCategory, ProductWithRelations, ProductWithStock
+from app.schemas.stock import StockAlertResponse, StockAlertWithProduct, StockResponse
+
+# Built once at import: each adapter holds compiled pydantic-core validators and
+# serializers, so a whole page is validated or dumped to JSON in a single call
+product_adapter = TypeAdapter(ProductResponse)
+product_list_adapter = TypeAdapter(List[ProductResponse])
+category_adapter = TypeAdapter(CategoryResponse)
+category_list_adapter = TypeAdapter(List[CategoryResponse])
+stock_adapter = TypeAdapter(StockResponse)
+stock_list_adapter = TypeAdapter(List[StockResponse])
+stock_alert_list_adapter = TypeAdapter(List[StockAlertResponse])
+stock_alert_with_product_list_adapter = TypeAdapter(List[StockAlertWithProduct])
+order_line_list_adapter = TypeAdapter(List[OrderLine])
+change_feed_adapter = TypeAdapter(ChangeFeed)
+
+# Product model for each set of relations a client can ask for with ?include=
+PRODUCT_INCLUDE_MODELS = {
+    frozenset(): ProductResponse,
+    frozenset({"stock"}): ProductWithStock,
+    frozenset({"category"}): ProductWithCategory,
+    frozenset({"stock", "category"}): ProductWithRelations,
+}
+product_include_adapters = {
+    include: product_adapter if not include else TypeAdapter(model) for include, model in PRODUCT_INCLUDE_MODELS.items()
+}
+product_list_include_adapters = {
+    include: product_list_adapter if not include else TypeAdapter(List[model])
+    for include, model in PRODUCT_INCLUDE_MODELS.items()
+}
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import List, Literal, Optional, Union
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from app.schemas.category import CategoryResponse
+from app.schemas.product import ProductResponse
+from app.schemas.stock import StockResponse
+
+
+class ChangeEntry(BaseModel):
+    seq: int
+    entite: Literal["category", "product", "stock"]
+    entite_id: UUID = Field(..., description="Identifiant de l'entité ; produit_id pour un stock")
+    operation: Literal["upsert", "delete"]
+    date_changement: datetime
+    donnees: Optional[Union[ProductResponse, StockResponse, CategoryResponse]] = Field(
+        None, description="État actuel de l'entité ; absent pour une suppression"
+    )
+
+
+class ChangeFeed(BaseModel):
+    changes: List[ChangeEntry]
+    next_token: str = Field(..., description="Valeur de since pour la page suivante")
+    has_more: bool
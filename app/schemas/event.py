@@ -3,7 +3,7 @@ from enum import Enum
 from typing import Any, Dict, Optional
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class EventType(str, Enum):
@@ -12,6 +12,8 @@ class EventType(str, Enum):
     PRODUCT_DELETED = "product.deleted"
     STOCK_UPDATED = "stock.updated"
     STOCK_LOW_ALERT = "stock.low_alert"
+    STOCK_ALERT_RECOVERED = "stock.alert_recovered"
+    STOCK_ALERT_DIGEST = "stock.alert_digest"
 
 
 class Event(BaseModel):
@@ -32,3 +34,10 @@ class StockEvent(BaseModel):
     product_id: UUID
     quantite_disponible: int
     alerte_stock_bas: bool
+
+
+class OrderLine(BaseModel):
+    """Line of an order event from the commandes service"""
+
+    produit_id: UUID
+    quantite: int = Field(..., gt=0)
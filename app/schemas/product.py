@@ -1,11 +1,13 @@
 from datetime import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field, field_validator
 
 from app.models.product import ProductStatus
+from app.schemas.category import CategoryResponse
+from app.schemas.stock import StockResponse
 
 
 class ProductBase(BaseModel):
@@ -53,3 +55,30 @@ class ProductResponse(ProductBase):
 
     class Config:
         from_attributes = True
+
+
+# Product responses with embedded relations, selected by ?include=
+class ProductWithStock(ProductResponse):
+    stock: Optional[StockResponse] = None
+
+
+class ProductWithCategory(ProductResponse):
+    categorie: Optional[CategoryResponse] = None
+
+
+class ProductWithRelations(ProductWithStock, ProductWithCategory):
+    pass
+
+
+class ProductBulkResult(BaseModel):
+    index: int
+    sku: Optional[str] = None
+    status: str  # "created" ou "error"
+    id: Optional[UUID] = None
+    error: Optional[str] = None
+
+
+class ProductBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[ProductBulkResult]
@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel, Field
+
+from app.models.reservation import ReservationStatus
+
+
+class ReservationCreate(BaseModel):
+    produit_id: UUID
+    quantite: int = Field(..., gt=0)
+    ttl_secondes: Optional[int] = Field(
+        None, gt=0, description="Durée de la réservation (défaut: RESERVATION_TTL_SECONDS)"
+    )
+    reference: Optional[str] = Field(
+        None, max_length=100, description="Commande ou panier à l'origine de la réservation"
+    )
+
+
+class ReservationResponse(BaseModel):
+    id: UUID
+    produit_id: UUID
+    quantite: int
+    statut: ReservationStatus
+    reference: Optional[str] = None
+    date_creation: datetime
+    date_expiration: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -8,18 +8,18 @@ from pydantic import BaseModel, Field
 class StockBase(BaseModel):
     produit_id: UUID
     quantite_disponible: int = Field(default=0, ge=0)
-    quantite_reservee: int = Field(default=0, ge=0)
     quantite_minimum: int = Field(default=10, ge=0)
     quantite_maximum: int = Field(default=1000, ge=0)
 
 
 class StockCreate(StockBase):
+    # quantite_reservee starts at 0 and only moves with the reservations
     pass
 
 
 class StockUpdate(BaseModel):
+    # quantite_reservee only moves with the reservations
     quantite_disponible: Optional[int] = Field(None, ge=0)
-    quantite_reservee: Optional[int] = Field(None, ge=0)
     quantite_minimum: Optional[int] = Field(None, ge=0)
     quantite_maximum: Optional[int] = Field(None, ge=0)
 
@@ -28,8 +28,17 @@ class StockAdjustment(BaseModel):
     quantite: int = Field(..., description="Quantité à ajouter (positif) ou retirer (négatif)")
 
 
+class StockAdjustmentLine(StockAdjustment):
+    produit_id: UUID
+
+
+class StockBatchAdjustment(BaseModel):
+    lignes: List[StockAdjustmentLine] = Field(..., min_length=1, description="Lignes appliquées en une transaction")
+
+
 class StockResponse(StockBase):
     id: UUID
+    quantite_reservee: int = 0
     alerte_stock_bas: bool
     date_derniere_entree: Optional[datetime] = None
     date_derniere_sortie: Optional[datetime] = None
@@ -37,3 +46,12 @@ class StockResponse(StockBase):
 
     class Config:
         from_attributes = True
+
+
+class StockAlertResponse(StockResponse):
+    severite: float = Field(..., description="Quantité disponible / quantité minimum, les plus faibles en premier")
+
+
+class StockAlertWithProduct(StockAlertResponse):
+    sku: Optional[str] = None
+    nom: Optional[str] = None
@@ -0,0 +1,41 @@
+from typing import Any, Callable, Generic, Type, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.services.cache import read_cache
+
+ServiceT = TypeVar("ServiceT")
+ResultT = TypeVar("ResultT")
+
+
+class AsyncService(Generic[ServiceT]):
+    """
+    Base of the async services used by the request handlers.
+
+    A call runs the sync service and its repositories through AsyncSession.run_sync: in a
+    greenlet on the session's async connection (asyncpg, aiosqlite), so every database
+    round trip awaits on the event loop instead of holding a threadpool worker. The
+    queries, and the change log and outbox writes of their transactions, stay those of
+    the sync repositories, which the background jobs and consumers keep using directly.
+
+    Cache round trips stay out of run_sync: reads go through read_cache.get_or_load_async
+    around an uncached loader, and the keys a write invalidates are deleted once it returns.
+    """
+
+    service_class: Type[ServiceT]
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def run(self, method: Callable[..., ResultT], *args: Any) -> ResultT:
+        """Call a method of the sync service on this session"""
+
+        def call(session: Session) -> ResultT:
+            return method(self.service_class(session), *args)
+
+        with read_cache.deferred_invalidations() as keys:
+            try:
+                return await self.db.run_sync(call)
+            finally:
+                await read_cache.invalidate_async(*keys)
@@ -0,0 +1,289 @@
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Type, TypeVar
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def product_key(product_id: UUID) -> str:
+    return f"product:{product_id}"
+
+
+def stock_key(product_id: UUID) -> str:
+    return f"stock:{product_id}"
+
+
+class MemoryCache:
+    """
+    In-process LRU of serialized values with a per-entry TTL.
+    Bounded by entry count and by the total size of keys and values; the least
+    recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                self._pop(key)
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._pop(key)
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def delete(self, *keys: str) -> None:
+        with self._lock:
+            for key in keys:
+                self._pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(key) + len(entry[1])
+
+
+class RedisCache:
+    """
+    Cache shared by every worker, on any client with the redis-py get/set(ex=)/delete
+    interface. Redis applies the TTL and its own maxmemory eviction policy.
+    """
+
+    def __init__(self, client, prefix: str = "produits:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: int) -> None:
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def delete(self, *keys: str) -> None:
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class AsyncRedisCache:
+    """RedisCache for the event loop, on a redis.asyncio client: round trips are awaited"""
+
+    def __init__(self, client, prefix: str = "produits:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+
+class ReadThroughCache:
+    """
+    Read-through cache of API models in front of service reads. Values are stored
+    as JSON so every backend holds the same bytes. Writers invalidate the keys they
+    touch after commit; the TTL bounds staleness for writes made by other processes.
+    Backend errors are logged and treated as misses, never raised.
+
+    The async handlers go through async_backend (get_or_load_async, invalidate_async)
+    so a network backend never blocks the event loop; the in-process MemoryCache
+    serves both sides.
+    """
+
+    def __init__(self, backend, ttl: int, async_backend=None):
+        self.backend = backend
+        self.async_backend = async_backend if async_backend is not None else backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        # Keys invalidated by sync code running for an async handler, see deferred_invalidations
+        self._deferred: ContextVar[Optional[List[str]]] = ContextVar("deferred_invalidations", default=None)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def get_or_load(self, key: str, model: Type[T], loader: Callable[[], Optional[T]]) -> Optional[T]:
+        """Cached value for key, or loader() stored for next time. None results are not cached."""
+        if not self.enabled:
+            return loader()
+
+        data = self._call("get", key)
+        if data is not None:
+            self.hits += 1
+            return model.model_validate_json(data)
+
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            self._call("set", key, value.model_dump_json().encode(), self.ttl)
+        return value
+
+    async def get_or_load_async(
+        self, key: str, model: Type[T], loader: Callable[[], Awaitable[Optional[T]]]
+    ) -> Optional[T]:
+        """get_or_load through the async backend, for an awaitable loader"""
+        if not self.enabled:
+            return await loader()
+
+        data = await self._call_async("get", key)
+        if data is not None:
+            self.hits += 1
+            return model.model_validate_json(data)
+
+        self.misses += 1
+        value = await loader()
+        if value is not None:
+            await self._call_async("set", key, value.model_dump_json().encode(), self.ttl)
+        return value
+
+    def invalidate(self, *keys: str) -> None:
+        deferred = self._deferred.get()
+        if deferred is not None:
+            deferred.extend(keys)
+        elif self.enabled and keys:
+            self.invalidations += len(keys)
+            self._call("delete", *keys)
+
+    async def invalidate_async(self, *keys: str) -> None:
+        if self.enabled and keys:
+            self.invalidations += len(keys)
+            await self._call_async("delete", *keys)
+
+    @contextmanager
+    def deferred_invalidations(self) -> Iterator[List[str]]:
+        """
+        Collect the keys that invalidate() is called with in this context instead of
+        deleting them, for the caller to pass to invalidate_async: the sync services
+        run on the event loop thread under AsyncSession.run_sync.
+        """
+        keys: List[str] = []
+        token = self._deferred.set(keys)
+        try:
+            yield keys
+        finally:
+            self._deferred.reset(token)
+
+    def clear(self) -> None:
+        if self.enabled:
+            self._call("clear")
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"backend": "none"}
+        stats = {
+            "backend": settings.CACHE_BACKEND,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+    def _call(self, method: str, *args):
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache {method} failed: {e}")
+            return None
+
+    async def _call_async(self, method: str, *args):
+        try:
+            result = getattr(self.async_backend, method)(*args)
+            return await result if inspect.isawaitable(result) else result
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Cache {method} failed: {e}")
+            return None
+
+
+def create_backend():
+    """Backend selected by CACHE_BACKEND: "memory", "redis" or "none"."""
+    if settings.CACHE_BACKEND == "none":
+        return None
+    if settings.CACHE_BACKEND == "redis":
+        try:
+            import redis
+
+            return RedisCache(redis.Redis.from_url(settings.CACHE_REDIS_URL))
+        except ImportError:
+            logger.warning("redis is not installed, using the in-process cache")
+    return MemoryCache(settings.CACHE_MAX_ENTRIES, settings.CACHE_MAX_BYTES)
+
+
+def create_async_backend(backend):
+    """Counterpart of a backend for the event loop: redis.asyncio for Redis, else the backend itself"""
+    if isinstance(backend, RedisCache):
+        import redis.asyncio
+
+        return AsyncRedisCache(redis.asyncio.Redis.from_url(settings.CACHE_REDIS_URL))
+    return backend
+
+
+# Global read cache instance
+_backend = create_backend()
+read_cache = ReadThroughCache(_backend, settings.CACHE_TTL_SECONDS, create_async_backend(_backend))
@@ -1,24 +1,34 @@
 from typing import List, Optional
 from uuid import UUID
 
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 
 from app.repositories.category_repo import CategoryRepository
+from app.repositories.pagination import next_cursor
+from app.schemas.adapters import category_list_adapter
 from app.schemas.category import CategoryCreate, CategoryResponse, CategoryUpdate
+from app.services.async_service import AsyncService
 
 
 class CategoryService:
     def __init__(self, db: Session):
         self.repository = CategoryRepository(db)
 
-    def get_categories(self, skip: int = 0, limit: int = 100) -> List[CategoryResponse]:
-        categories = self.repository.get_all(skip, limit)
-        return [CategoryResponse.model_validate(cat) for cat in categories]
+    def get_categories(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[CategoryResponse]:
+        categories = self.repository.get_all(skip, limit, cursor)
+        return category_list_adapter.validate_python(categories, from_attributes=True)
+
+    def next_cursor(self, categories: List[CategoryResponse], limit: int) -> Optional[str]:
+        return next_cursor(categories, limit, self.repository.cursor_columns)
 
     def get_category(self, category_id: UUID) -> Optional[CategoryResponse]:
         category = self.repository.get_by_id(category_id)
         return CategoryResponse.model_validate(category) if category else None
 
+    def get_category_version(self, category_id: UUID) -> Optional[Row]:
+        return self.repository.get_version(category_id)
+
     def create_category(self, category: CategoryCreate) -> CategoryResponse:
         # Check if category with same code exists
         existing = self.repository.get_by_code(category.code)
@@ -40,3 +50,30 @@ class CategoryService:
 
     def delete_category(self, category_id: UUID) -> bool:
         return self.repository.delete(category_id)
+
+
+class AsyncCategoryService(AsyncService[CategoryService]):
+    service_class = CategoryService
+
+    async def get_categories(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[CategoryResponse]:
+        return await self.run(CategoryService.get_categories, skip, limit, cursor)
+
+    def next_cursor(self, categories: List[CategoryResponse], limit: int) -> Optional[str]:
+        return next_cursor(categories, limit, CategoryRepository.cursor_columns)
+
+    async def get_category(self, category_id: UUID) -> Optional[CategoryResponse]:
+        return await self.run(CategoryService.get_category, category_id)
+
+    async def get_category_version(self, category_id: UUID) -> Optional[Row]:
+        return await self.run(CategoryService.get_category_version, category_id)
+
+    async def create_category(self, category: CategoryCreate) -> CategoryResponse:
+        return await self.run(CategoryService.create_category, category)
+
+    async def update_category(self, category_id: UUID, category_update: CategoryUpdate) -> Optional[CategoryResponse]:
+        return await self.run(CategoryService.update_category, category_id, category_update)
+
+    async def delete_category(self, category_id: UUID) -> bool:
+        return await self.run(CategoryService.delete_category, category_id)
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.change_log import ChangeLogEntry
+from app.repositories.category_repo import CategoryRepository
+from app.repositories.change_log_repo import UPSERT, ChangeLogRepository
+from app.repositories.pagination import decode_cursor, encode_cursor
+from app.repositories.product_repo import ProductRepository
+from app.repositories.stock_repo import StockRepository
+from app.schemas.category import CategoryResponse
+from app.schemas.change import ChangeEntry, ChangeFeed
+from app.schemas.product import ProductResponse
+from app.schemas.stock import StockResponse
+
+# A resume token carries the last seq read and when it was issued
+TOKEN_COLUMNS = (ChangeLogEntry.seq, ChangeLogEntry.date_changement)
+
+
+class ResyncRequired(Exception):
+    """The resume token predates tombstones compaction has since removed"""
+
+
+class Compaction(NamedTuple):
+    last_seq: int
+    compacted: int
+    purged: int
+
+
+class ChangeService:
+    def __init__(self, db: Session):
+        self.repository = ChangeLogRepository(db)
+        self.category_repository = CategoryRepository(db)
+        self.product_repository = ProductRepository(db)
+        self.stock_repository = StockRepository(db)
+        self.db = db
+
+    def get_changes(self, since: Optional[str], limit: int) -> ChangeFeed:
+        """
+        Changes after the since token, in commit order, with the current state of each
+        changed entity. Without a token the feed starts from the beginning of the log,
+        which compaction keeps at one entry per entity: a full snapshot of the catalog.
+        Raises ValueError for an invalid token and ResyncRequired for an expired one.
+        """
+        seq = self._resume_from(since) if since else 0
+        entries = self.repository.get_since(seq, limit)
+        states = self._load_states(entries)
+        changes = [
+            ChangeEntry(
+                seq=entry.seq,
+                entite=entry.entite,
+                entite_id=entry.entite_id,
+                operation=entry.operation,
+                date_changement=entry.date_changement,
+                donnees=states.get((entry.entite, entry.entite_id)) if entry.operation == UPSERT else None,
+            )
+            for entry in entries
+        ]
+        last = entries[-1].seq if entries else seq
+        return ChangeFeed(
+            changes=changes, next_token=encode_cursor([last, datetime.utcnow()]), has_more=len(entries) == limit
+        )
+
+    def compact(self, after: int, batch_size: int) -> Compaction:
+        """
+        Delete the entries superseded by a later one of the same entity, from seq `after`
+        on, then the tombstones older than CHANGE_LOG_TOMBSTONE_RETENTION_HOURS.
+        One transaction per batch. Returns the last seq compacted, to resume from.
+        """
+        compacted = 0
+        while True:
+            last, deleted = self.repository.compact(after, batch_size)
+            self.db.commit()
+            compacted += deleted
+            if last == after:
+                break
+            after = last
+
+        purged = 0
+        before = datetime.utcnow() - timedelta(hours=settings.CHANGE_LOG_TOMBSTONE_RETENTION_HOURS)
+        while True:
+            count = self.repository.purge_tombstones(before, batch_size)
+            self.db.commit()
+            purged += count
+            if count < batch_size:
+                break
+        return Compaction(after, compacted, purged)
+
+    def _resume_from(self, since: str) -> int:
+        try:
+            seq, issued = decode_cursor(since, TOKEN_COLUMNS)
+        except ValueError:
+            raise ValueError("Invalid since token")
+        # Tombstones after seq may have been purged since: the client cannot tell what was deleted
+        if seq and issued < datetime.utcnow() - timedelta(hours=settings.CHANGE_LOG_TOMBSTONE_RETENTION_HOURS):
+            raise ResyncRequired("The since token has expired, sync again from the beginning")
+        return seq
+
+    def _load_states(self, entries: List[ChangeLogEntry]) -> Dict[Tuple[str, UUID], Any]:
+        """Current state of the upserted entities, one query per entity type"""
+        ids: Dict[str, set] = {"category": set(), "product": set(), "stock": set()}
+        for entry in entries:
+            if entry.operation == UPSERT:
+                ids[entry.entite].add(entry.entite_id)
+
+        states: Dict[Tuple[str, UUID], Any] = {}
+        if ids["category"]:
+            for category in self.category_repository.get_many(ids["category"]):
+                states[("category", category.id)] = CategoryResponse.model_validate(category)
+        if ids["product"]:
+            for product in self.product_repository.get_many(ids["product"]):
+                states[("product", product.id)] = ProductResponse.model_validate(product)
+        if ids["stock"]:
+            for stock in self.stock_repository.get_many_by_product(ids["stock"]):
+                states[("stock", stock.produit_id)] = StockResponse.model_validate(stock)
+        return states
@@ -1,34 +1,88 @@
-from typing import List, Optional
-from uuid import UUID
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterator, List, Mapping, Optional, Set, Tuple, Union
+from uuid import UUID, uuid4
 
+from pydantic import ValidationError
+from sqlalchemy import Row
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 
 from app.models.product import ProductStatus
-from app.repositories.product_repo import ProductRepository
+from app.repositories.category_repo import CategoryRepository
+from app.repositories.outbox_repo import OutboxRepository
+from app.repositories.pagination import next_cursor
+from app.repositories.product_repo import ProductRepository, compute_prix_ttc
 from app.repositories.stock_repo import StockRepository
-from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate
+from app.schemas.adapters import product_include_adapters, product_list_include_adapters
+from app.schemas.event import EventType
+from app.schemas.product import ProductBulkResult, ProductCreate, ProductResponse, ProductUpdate
 from app.schemas.stock import StockCreate
+from app.services.async_service import AsyncService
+from app.services.cache import product_key, read_cache, stock_key
+from app.services.search_index import product_search_index
 
 
 class ProductService:
     def __init__(self, db: Session):
         self.repository = ProductRepository(db)
         self.stock_repository = StockRepository(db)
+        self.category_repository = CategoryRepository(db)
+        self.outbox = OutboxRepository(db)
         self.db = db
 
     def get_products(
-        self, skip: int = 0, limit: int = 100, status: Optional[ProductStatus] = None
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[ProductStatus] = None,
+        cursor: Optional[str] = None,
+        include: FrozenSet[str] = frozenset(),
     ) -> List[ProductResponse]:
-        products = self.repository.get_all(skip, limit, status)
-        return [ProductResponse.model_validate(prod) for prod in products]
+        products = self.repository.get_all(skip, limit, status, cursor, include)
+        return product_list_include_adapters[include].validate_python(products, from_attributes=True)
 
-    def get_product(self, product_id: UUID) -> Optional[ProductResponse]:
-        product = self.repository.get_by_id(product_id)
-        return ProductResponse.model_validate(product) if product else None
+    def get_product(self, product_id: UUID, include: FrozenSet[str] = frozenset()) -> Optional[ProductResponse]:
+        if include:
+            # Embedded rows change without touching the product: served uncached
+            return self.load_product(product_id, include)
+        return read_cache.get_or_load(product_key(product_id), ProductResponse, lambda: self.load_product(product_id))
+
+    def load_product(self, product_id: UUID, include: FrozenSet[str] = frozenset()) -> Optional[ProductResponse]:
+        """get_product from the database, bypassing the cache"""
+        product = self.repository.get_by_id(product_id, include)
+        if not product:
+            return None
+        if include:
+            return product_include_adapters[include].validate_python(product, from_attributes=True)
+        return ProductResponse.model_validate(product)
+
+    def get_product_version(self, product_id: UUID) -> Optional[Row]:
+        return self.repository.get_version(product_id)
+
+    def get_products_by_category(
+        self,
+        category_id: UUID,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include: FrozenSet[str] = frozenset(),
+    ) -> List[ProductResponse]:
+        products = self.repository.get_by_category(category_id, skip, limit, cursor, include)
+        return product_list_include_adapters[include].validate_python(products, from_attributes=True)
 
-    def get_products_by_category(self, category_id: UUID, skip: int = 0, limit: int = 100) -> List[ProductResponse]:
-        products = self.repository.get_by_category(category_id, skip, limit)
-        return [ProductResponse.model_validate(prod) for prod in products]
+    def next_cursor(self, products: List[ProductResponse], limit: int) -> Optional[str]:
+        return next_cursor(products, limit, self.repository.cursor_columns)
+
+    def export_products(
+        self,
+        status: Optional[ProductStatus] = None,
+        category_id: Optional[UUID] = None,
+        search: Optional[str] = None,
+        include_stock: bool = False,
+    ) -> Iterator[Mapping[str, Any]]:
+        """Stream the filtered catalog as plain column mappings"""
+        for row in self.repository.iter_export_rows(status, category_id, search, include_stock):
+            yield row._mapping
 
     def create_product(self, product: ProductCreate) -> ProductResponse:
         # Check if product with same SKU exists
@@ -36,14 +90,122 @@ class ProductService:
         if existing:
             raise ValueError(f"Product with SKU '{product.sku}' already exists")
 
-        # Create product
-        db_product = self.repository.create(product)
+        # Product, initial stock entry and event in one transaction
+        db_product = self.repository.add(product)
+        stock = StockCreate(produit_id=db_product.id, quantite_disponible=0)
+        self.stock_repository.add(stock)
+        self.outbox.add(EventType.PRODUCT_CREATED, _product_event(db_product))
+        self.db.commit()
+
+        created_product = ProductResponse.model_validate(db_product)
+        if product_search_index.enabled:
+            product_search_index.add(created_product)
+        return created_product
+
+    def bulk_create_products(
+        self, rows: List[Union[Dict[str, Any], str, bytes]], offset: int = 0, seen_skus: Optional[Set[str]] = None
+    ) -> Tuple[List[ProductBulkResult], List[Dict[str, Any]]]:
+        """
+        Import one batch of products with their initial stock in a single transaction.
+        Rows are dicts or raw JSON documents; SKUs and categories are checked with one
+        query each and all rows are inserted at once. Invalid rows are reported, not raised.
+        Returns the per-row results and the inserted product rows.
+        """
+        seen_skus = set() if seen_skus is None else seen_skus
+        results: List[Optional[ProductBulkResult]] = [None] * len(rows)
+
+        valid = self._validate_bulk_rows(rows, offset, seen_skus, results)
+        products, stocks = self._prepare_bulk_rows(valid, offset, results)
+        if not products:
+            return results, []
+
+        try:
+            self.repository.bulk_create(products)
+            self.stock_repository.bulk_create(stocks)
+            self.outbox.add_many(
+                EventType.PRODUCT_CREATED,
+                [
+                    {"product_id": str(row["id"]), "sku": row["sku"], "nom": row["nom"], "statut": row["statut"].value}
+                    for row in products
+                ],
+            )
+            self.db.commit()
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            error = f"Batch insert failed: {getattr(e, 'orig', None) or e}"
+            for result in results:
+                if result.status == "created":
+                    result.status, result.id, result.error = "error", None, error
+            return results, []
 
-        # Create initial stock entry
-        stock = StockCreate(produit_id=db_product.id, quantite_disponible=0, quantite_reservee=0)
-        self.stock_repository.create(stock)
+        if product_search_index.enabled:
+            product_search_index.add_many(ProductResponse.model_validate(row) for row in products)
+        return results, products
 
-        return ProductResponse.model_validate(db_product)
+    def _validate_bulk_rows(
+        self, rows: List[Any], offset: int, seen_skus: Set[str], results: List[Optional[ProductBulkResult]]
+    ) -> List[Tuple[int, ProductCreate]]:
+        valid = []
+        for position, row in enumerate(rows):
+            try:
+                if isinstance(row, (str, bytes)):
+                    product = ProductCreate.model_validate_json(row)
+                else:
+                    product = ProductCreate.model_validate(row)
+            except ValidationError as e:
+                sku = row.get("sku") if isinstance(row, dict) else None
+                results[position] = _bulk_error(offset + position, sku, _format_validation_error(e))
+                continue
+
+            if product.sku in seen_skus:
+                results[position] = _bulk_error(offset + position, product.sku, "Duplicate SKU in payload")
+                continue
+            seen_skus.add(product.sku)
+            valid.append((position, product))
+        return valid
+
+    def _prepare_bulk_rows(
+        self, valid: List[Tuple[int, ProductCreate]], offset: int, results: List[Optional[ProductBulkResult]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        existing_skus = self.repository.existing_skus(product.sku for _, product in valid)
+        categories = self.category_repository.existing_ids({product.categorie_id for _, product in valid})
+
+        now = datetime.utcnow()
+        stock_defaults = StockCreate(produit_id=uuid4()).model_dump(exclude={"produit_id"})
+        products: List[Dict[str, Any]] = []
+        stocks: List[Dict[str, Any]] = []
+        for position, product in valid:
+            if product.sku in existing_skus:
+                error = f"Product with SKU '{product.sku}' already exists"
+                results[position] = _bulk_error(offset + position, product.sku, error)
+                continue
+            if product.categorie_id not in categories:
+                error = f"Category with id {product.categorie_id} not found"
+                results[position] = _bulk_error(offset + position, product.sku, error)
+                continue
+
+            product_row = product.model_dump()
+            product_row.update(
+                id=uuid4(),
+                prix_ttc=compute_prix_ttc(product.prix_ht, product.taux_tva),
+                statut=ProductStatus.ACTIF,
+                date_creation=now,
+                date_modification=now,
+            )
+            products.append(product_row)
+            stocks.append(
+                dict(
+                    stock_defaults,
+                    id=uuid4(),
+                    produit_id=product_row["id"],
+                    alerte_stock_bas=stock_defaults["quantite_disponible"] < stock_defaults["quantite_minimum"],
+                    date_modification=now,
+                )
+            )
+            results[position] = ProductBulkResult(
+                index=offset + position, sku=product.sku, status="created", id=product_row["id"]
+            )
+        return products, stocks
 
     def update_product(self, product_id: UUID, product_update: ProductUpdate) -> Optional[ProductResponse]:
         # If SKU is being updated, check it doesn't conflict
@@ -52,12 +214,109 @@ class ProductService:
             if existing and existing.id != product_id:
                 raise ValueError(f"Product with SKU '{product_update.sku}' already exists")
 
-        updated_product = self.repository.update(product_id, product_update)
-        return ProductResponse.model_validate(updated_product) if updated_product else None
+        updated_product = self.repository.apply_update(product_id, product_update)
+        if not updated_product:
+            return None
+        self.outbox.add(EventType.PRODUCT_UPDATED, _product_event(updated_product))
+        self.db.commit()
+        read_cache.invalidate(product_key(product_id))
+
+        updated_product = ProductResponse.model_validate(updated_product)
+        if product_search_index.enabled:
+            product_search_index.add(updated_product)
+        return updated_product
 
     def delete_product(self, product_id: UUID) -> bool:
-        return self.repository.delete(product_id)
+        product = self.repository.get_by_id(product_id)
+        if not product:
+            return False
+        # Committed by the delete
+        self.outbox.add(EventType.PRODUCT_DELETED, {"product_id": str(product_id), "sku": product.sku})
+        deleted = self.repository.delete(product_id)
+        if deleted:
+            read_cache.invalidate(product_key(product_id), stock_key(product_id))
+        if deleted and product_search_index.enabled:
+            product_search_index.remove(product_id)
+        return deleted
+
+    def search_products(
+        self, query: str, skip: int = 0, limit: int = 100, include: FrozenSet[str] = frozenset()
+    ) -> List[ProductResponse]:
+        # The in-memory index only holds the products themselves
+        if product_search_index.enabled and not include:
+            results = product_search_index.search(query, skip, limit)
+            if results is not None:
+                return results
+
+        products = self.repository.search(query, skip, limit, include)
+        return product_list_include_adapters[include].validate_python(products, from_attributes=True)
+
+
+class AsyncProductService(AsyncService[ProductService]):
+    service_class = ProductService
+
+    async def get_products(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        status: Optional[ProductStatus] = None,
+        cursor: Optional[str] = None,
+        include: FrozenSet[str] = frozenset(),
+    ) -> List[ProductResponse]:
+        return await self.run(ProductService.get_products, skip, limit, status, cursor, include)
+
+    async def get_product(self, product_id: UUID, include: FrozenSet[str] = frozenset()) -> Optional[ProductResponse]:
+        if include:
+            return await self.run(ProductService.load_product, product_id, include)
+        return await read_cache.get_or_load_async(
+            product_key(product_id), ProductResponse, lambda: self.run(ProductService.load_product, product_id)
+        )
+
+    async def get_product_version(self, product_id: UUID) -> Optional[Row]:
+        return await self.run(ProductService.get_product_version, product_id)
+
+    async def get_products_by_category(
+        self,
+        category_id: UUID,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        include: FrozenSet[str] = frozenset(),
+    ) -> List[ProductResponse]:
+        return await self.run(ProductService.get_products_by_category, category_id, skip, limit, cursor, include)
+
+    def next_cursor(self, products: List[ProductResponse], limit: int) -> Optional[str]:
+        return next_cursor(products, limit, ProductRepository.cursor_columns)
+
+    async def create_product(self, product: ProductCreate) -> ProductResponse:
+        return await self.run(ProductService.create_product, product)
+
+    async def update_product(self, product_id: UUID, product_update: ProductUpdate) -> Optional[ProductResponse]:
+        return await self.run(ProductService.update_product, product_id, product_update)
+
+    async def delete_product(self, product_id: UUID) -> bool:
+        return await self.run(ProductService.delete_product, product_id)
+
+    async def search_products(
+        self, query: str, skip: int = 0, limit: int = 100, include: FrozenSet[str] = frozenset()
+    ) -> List[ProductResponse]:
+        return await self.run(ProductService.search_products, query, skip, limit, include)
+
+
+def _product_event(product: Any) -> Dict[str, Any]:
+    return {
+        "product_id": str(product.id),
+        "sku": product.sku,
+        "nom": product.nom,
+        "statut": product.statut.value,
+    }
+
+
+def _bulk_error(index: int, sku: Optional[str], error: str) -> ProductBulkResult:
+    return ProductBulkResult(index=index, sku=sku, status="error", error=error)
+
 
-    def search_products(self, query: str, skip: int = 0, limit: int = 100) -> List[ProductResponse]:
-        products = self.repository.search(query, skip, limit)
-        return [ProductResponse.model_validate(prod) for prod in products]
+def _format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in detail['loc']) or 'body'}: {detail['msg']}" for detail in error.errors()
+    )
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy import Row
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.reservation import ReservationStatus
+from app.repositories.outbox_repo import OutboxRepository
+from app.repositories.reservation_repo import ReservationRepository
+from app.repositories.stock_repo import StockRepository
+from app.schemas.event import EventType
+from app.schemas.reservation import ReservationCreate, ReservationResponse
+from app.schemas.stock import StockResponse
+from app.services.async_service import AsyncService
+from app.services.cache import read_cache, stock_key
+from app.services.stock_service import StockChange, stock_event
+
+
+class ReservationChange(NamedTuple):
+    """A reservation written and the stock it moved"""
+
+    reservation: ReservationResponse
+    stock: StockChange
+
+
+class Expiry(NamedTuple):
+    released: int
+    changes: List[StockChange]
+
+
+class ReservationService:
+    def __init__(self, db: Session):
+        self.repository = ReservationRepository(db)
+        self.stock_repository = StockRepository(db)
+        self.outbox = OutboxRepository(db)
+        self.db = db
+
+    def get_reservation(self, reservation_id: UUID) -> Optional[ReservationResponse]:
+        reservation = self.repository.get_by_id(reservation_id)
+        return ReservationResponse.model_validate(reservation) if reservation else None
+
+    def reserve(self, reservation: ReservationCreate) -> Optional[ReservationChange]:
+        """
+        Hold stock until the reservation is confirmed, released or expires.
+        Returns None if the product has no stock; raises ValueError if not enough
+        is available (disponible - reservee).
+        """
+        ttl = reservation.ttl_secondes or settings.RESERVATION_TTL_SECONDS
+        if ttl > settings.RESERVATION_MAX_TTL_SECONDS:
+            raise ValueError(f"Reservation TTL cannot exceed {settings.RESERVATION_MAX_TTL_SECONDS} seconds")
+
+        stock = self.stock_repository.reserve_quantity(reservation.produit_id, reservation.quantite)
+        if stock is None:
+            return None
+
+        db_reservation = self.repository.create(
+            reservation.produit_id,
+            reservation.quantite,
+            datetime.utcnow() + timedelta(seconds=ttl),
+            reservation.reference,
+        )
+        # Built before commit, which would expire the instance
+        created = ReservationResponse.model_validate(db_reservation)
+        self.outbox.add(EventType.STOCK_UPDATED, _reservation_event(stock, created.id))
+        self.db.commit()
+        read_cache.invalidate(stock_key(reservation.produit_id))
+        return ReservationChange(created, _stock_change(stock))
+
+    def confirm(self, reservation_id: UUID) -> Optional[ReservationChange]:
+        """Turn an active hold into a stock exit"""
+        reservation = self.repository.close(reservation_id, ReservationStatus.CONFIRMEE, datetime.utcnow())
+        if reservation is None:
+            return self._not_active(reservation_id)
+        stock = self._held_stock(self.stock_repository.confirm_quantity, reservation)
+        self.outbox.add(EventType.STOCK_UPDATED, _reservation_event(stock, reservation.id))
+        self.db.commit()
+        read_cache.invalidate(stock_key(reservation.produit_id))
+        return ReservationChange(ReservationResponse.model_validate(reservation), _stock_change(stock))
+
+    def release(self, reservation_id: UUID) -> Optional[ReservationChange]:
+        """Give an active hold back to the available stock, even if it has already expired"""
+        reservation = self.repository.close(reservation_id, ReservationStatus.LIBEREE)
+        if reservation is None:
+            return self._not_active(reservation_id)
+        stock = self._held_stock(self.stock_repository.release_quantity, reservation)
+        self.outbox.add(EventType.STOCK_UPDATED, _reservation_event(stock, reservation.id))
+        self.db.commit()
+        read_cache.invalidate(stock_key(reservation.produit_id))
+        return ReservationChange(ReservationResponse.model_validate(reservation), _stock_change(stock))
+
+    def release_expired(self, limit: int = 1000) -> Expiry:
+        """Expire up to limit overdue holds in one transaction; returns how many were released and the stocks moved"""
+        expired = self.repository.expire_due(datetime.utcnow(), limit)
+        quantities: Dict[UUID, int] = defaultdict(int)
+        for reservation in expired:
+            quantities[reservation.produit_id] += reservation.quantite
+        stocks = self.stock_repository.release_quantities(quantities)
+        if stocks:
+            # One event for the whole batch
+            self.outbox.add(
+                EventType.STOCK_UPDATED,
+                {"items": [stock_event(stock) for stock in stocks], "reservations_expirees": len(expired)},
+            )
+        self.db.commit()
+        read_cache.invalidate(*(stock_key(product_id) for product_id in quantities))
+        return Expiry(len(expired), [_stock_change(stock) for stock in stocks])
+
+    def _held_stock(self, move: Callable[[UUID, int], Optional[Row]], reservation: Row) -> Row:
+        """
+        Move the stock of a closed hold. Deleting a stock releases its holds, so it can only
+        be missing if the delete committed in between: roll back and raise ValueError.
+        """
+        stock = move(reservation.produit_id, reservation.quantite)
+        if stock is None:
+            self.db.rollback()
+            raise ValueError(f"Stock for product {reservation.produit_id} not found")
+        return stock
+
+    def _not_active(self, reservation_id: UUID) -> None:
+        """Explain why a hold could not be closed: None if it does not exist, ValueError otherwise"""
+        reservation = self.repository.get_by_id(reservation_id)
+        if reservation is None:
+            return None
+        if reservation.statut == ReservationStatus.ACTIVE:
+            raise ValueError(f"Reservation {reservation_id} has expired")
+        raise ValueError(f"Reservation {reservation_id} is already {reservation.statut.value}")
+
+
+class AsyncReservationService(AsyncService[ReservationService]):
+    service_class = ReservationService
+
+    async def get_reservation(self, reservation_id: UUID) -> Optional[ReservationResponse]:
+        return await self.run(ReservationService.get_reservation, reservation_id)
+
+    async def reserve(self, reservation: ReservationCreate) -> Optional[ReservationChange]:
+        return await self.run(ReservationService.reserve, reservation)
+
+    async def confirm(self, reservation_id: UUID) -> Optional[ReservationChange]:
+        return await self.run(ReservationService.confirm, reservation_id)
+
+    async def release(self, reservation_id: UUID) -> Optional[ReservationChange]:
+        return await self.run(ReservationService.release, reservation_id)
+
+
+def _reservation_event(stock: Row, reservation_id: UUID) -> Dict[str, Any]:
+    return dict(stock_event(stock), reservation_id=str(reservation_id))
+
+
+def _stock_change(stock: Row) -> StockChange:
+    """StockChange of a row returned by a stock movement"""
+    return StockChange(StockResponse.model_validate(stock), bool(stock.alerte_precedente))
@@ -0,0 +1,240 @@
+import heapq
+import logging
+import math
+import re
+import sys
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from operator import itemgetter
+from typing import Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models.product import Product
+from app.schemas.product import ProductResponse
+
+logger = logging.getLogger(__name__)
+
+# Indexed fields and their weight in the term frequency
+INDEXED_FIELDS = {"nom": 3.0, "sku": 3.0, "origine": 2.0, "fournisseur": 1.5, "description": 1.0}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercase, accent-free word tokens"""
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in normalized if not unicodedata.combining(char))
+    return _TOKEN_RE.findall(stripped)
+
+
+class ProductSearchIndex:
+    """
+    In-process inverted index of the catalog with BM25 ranking.
+
+    The index keeps the serialized products next to the postings so a search
+    is answered without touching the database. It holds at most
+    `max_documents` products; past that it marks itself incomplete and
+    searches go back to the database. Each worker process owns its own copy,
+    kept current by the ProductService writes that go through that process.
+    """
+
+    def __init__(self, max_documents: int):
+        self.max_documents = max_documents
+        self.ready = False
+        self.complete = True
+        self._lock = threading.RLock()
+        self._documents: Dict[UUID, ProductResponse] = {}
+        self._lengths: Dict[UUID, float] = {}
+        self._postings: Dict[str, Dict[UUID, float]] = defaultdict(dict)
+        self._total_length = 0.0
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SEARCH_BACKEND == "memory"
+
+    def build(self, db: Session, batch_size: int = 1000) -> None:
+        """(Re)build the index from the products table"""
+        with self._lock:
+            self._clear()
+            self.complete = True
+            for product in db.query(Product).yield_per(batch_size):
+                if not self._index(ProductResponse.model_validate(product)):
+                    break
+            self.ready = True
+        stats = self.stats()
+        logger.info(
+            f"Search index built: {stats['documents']} products, {stats['terms']} terms, "
+            f"~{stats['memory_bytes'] // 1024} KiB, complete={stats['complete']}"
+        )
+
+    def add(self, product: ProductResponse) -> None:
+        """Index a product, replacing any previous version of it"""
+        with self._lock:
+            self._unindex(product.id)
+            self._index(product)
+
+    def add_many(self, products: Iterable[ProductResponse]) -> None:
+        with self._lock:
+            for product in products:
+                self._unindex(product.id)
+                self._index(product)
+
+    def remove(self, product_id: UUID) -> None:
+        with self._lock:
+            self._unindex(product_id)
+
+    def search(self, query: str, skip: int = 0, limit: int = 100) -> Optional[List[ProductResponse]]:
+        """
+        Rank products matching every query term (terms match as prefixes).
+        Returns None when the index cannot answer and the database must be used.
+        """
+        if not (self.ready and self.complete):
+            return None
+
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            if not self._documents:
+                return []
+
+            # Score the most selective term first so the others only probe its matches
+            expanded = [[self._postings[indexed] for indexed in self._expand(term)] for term in terms]
+            expanded.sort(key=lambda term_postings: sum(len(postings) for postings in term_postings))
+
+            scores: Optional[Dict[UUID, float]] = None
+            for term_postings in expanded:
+                scores = self._score_term(term_postings, scores)
+                if not scores:
+                    return []
+
+            ranked = heapq.nlargest(skip + limit, scores.items(), key=itemgetter(1))
+            return [self._documents[doc_id] for doc_id, _ in ranked[skip:]]
+
+    def _score_term(
+        self, term_postings: List[Dict[UUID, float]], scores: Optional[Dict[UUID, float]]
+    ) -> Dict[UUID, float]:
+        """Add one query term's BM25 score to the documents matched so far"""
+        doc_count = len(self._documents)
+        lengths = self._lengths
+        # BM25 length normalisation, folded into tf / (tf + c1 + c2 * length)
+        avg_length = self._total_length / doc_count or 1.0
+        c1 = K1 * (1 - B)
+        c2 = K1 * B / avg_length
+
+        term_scores: Dict[UUID, float] = {}
+        for postings in term_postings:
+            idf = (K1 + 1) * math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            if scores is None:
+                matches = postings.items()
+            elif len(scores) < len(postings):
+                matches = ((doc_id, postings[doc_id]) for doc_id in scores if doc_id in postings)
+            else:
+                matches = ((doc_id, tf) for doc_id, tf in postings.items() if doc_id in scores)
+            for doc_id, tf in matches:
+                term_scores[doc_id] = term_scores.get(doc_id, 0.0) + idf * tf / (tf + c1 + c2 * lengths[doc_id])
+
+        if scores is not None:
+            for doc_id in term_scores:
+                term_scores[doc_id] += scores[doc_id]
+        return term_scores
+
+    def stats(self) -> dict:
+        with self._lock:
+            postings = sum(len(docs) for docs in self._postings.values())
+            return {
+                "enabled": self.enabled,
+                "ready": self.ready,
+                "complete": self.complete,
+                "documents": len(self._documents),
+                "max_documents": self.max_documents,
+                "terms": len(self._postings),
+                "postings": postings,
+                "memory_bytes": self._estimate_memory(),
+            }
+
+    def _index(self, product: ProductResponse) -> bool:
+        if len(self._documents) >= self.max_documents:
+            if self.complete:
+                logger.warning(f"Search index full ({self.max_documents} products), falling back to database search")
+            self.complete = False
+            return False
+
+        frequencies: Dict[str, float] = defaultdict(float)
+        for field, weight in INDEXED_FIELDS.items():
+            for token in tokenize(getattr(product, field)):
+                frequencies[token] += weight
+
+        for token, frequency in frequencies.items():
+            if token not in self._postings:
+                self._vocabulary_dirty = True
+            self._postings[token][product.id] = frequency
+
+        length = sum(frequencies.values())
+        self._documents[product.id] = product
+        self._lengths[product.id] = length
+        self._total_length += length
+        return True
+
+    def _unindex(self, product_id: UUID) -> None:
+        product = self._documents.pop(product_id, None)
+        if product is None:
+            return
+        self._total_length -= self._lengths.pop(product_id)
+
+        tokens: Set[str] = set()
+        for field in INDEXED_FIELDS:
+            tokens.update(tokenize(getattr(product, field)))
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(product_id, None)
+                if not postings:
+                    del self._postings[token]
+                    self._vocabulary_dirty = True
+
+    def _expand(self, prefix: str) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        terms = []
+        position = bisect_left(self._vocabulary, prefix)
+        while position < len(self._vocabulary) and self._vocabulary[position].startswith(prefix):
+            terms.append(self._vocabulary[position])
+            position += 1
+        return terms
+
+    def _clear(self) -> None:
+        self._documents.clear()
+        self._lengths.clear()
+        self._postings.clear()
+        self._total_length = 0.0
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+        self.ready = False
+
+    def _estimate_memory(self) -> int:
+        size = sys.getsizeof(self._documents) + sys.getsizeof(self._lengths) + sys.getsizeof(self._postings)
+        size += sum(sys.getsizeof(term) + sys.getsizeof(docs) for term, docs in self._postings.items())
+        for product in self._documents.values():
+            size += sys.getsizeof(product.__dict__) + sum(sys.getsizeof(value) for value in product.__dict__.values())
+        size += sys.getsizeof(self._vocabulary)
+        return size
+
+
+# Global search index instance
+product_search_index = ProductSearchIndex(max_documents=settings.SEARCH_INDEX_MAX_DOCUMENTS)
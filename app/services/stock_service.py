@@ -1,31 +1,73 @@
-from typing import List, Optional
+from collections import defaultdict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 from uuid import UUID
 
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 
+from app.repositories.outbox_repo import OutboxRepository
+from app.repositories.pagination import next_cursor
+from app.repositories.processed_message_repo import ProcessedMessageRepository
+from app.repositories.reservation_repo import ReservationRepository
 from app.repositories.stock_repo import StockRepository
-from app.schemas.stock import StockCreate, StockResponse, StockUpdate
+from app.schemas.adapters import stock_alert_list_adapter, stock_alert_with_product_list_adapter, stock_list_adapter
+from app.schemas.event import EventType
+from app.schemas.stock import StockAdjustmentLine, StockAlertResponse, StockCreate, StockResponse, StockUpdate
+from app.services.async_service import AsyncService
+from app.services.cache import read_cache, stock_key
+
+
+class StockChange(NamedTuple):
+    """A written stock and its alert flag before the write"""
+
+    stock: StockResponse
+    alerte_precedente: bool
+
+    @property
+    def alert_changed(self) -> bool:
+        return self.alerte_precedente != self.stock.alerte_stock_bas
 
 
 class StockService:
     def __init__(self, db: Session):
         self.repository = StockRepository(db)
+        self.outbox = OutboxRepository(db)
+        self.db = db
+
+    def get_all_stocks(self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None) -> List[StockResponse]:
+        stocks = self.repository.get_all(skip, limit, cursor)
+        return stock_list_adapter.validate_python(stocks, from_attributes=True)
 
-    def get_all_stocks(self, skip: int = 0, limit: int = 100) -> List[StockResponse]:
-        stocks = self.repository.get_all(skip, limit)
-        return [StockResponse.model_validate(stock) for stock in stocks]
+    def next_cursor(self, stocks: List[StockResponse], limit: int) -> Optional[str]:
+        return next_cursor(stocks, limit, self.repository.cursor_columns)
 
     def get_stock(self, stock_id: UUID) -> Optional[StockResponse]:
         stock = self.repository.get_by_id(stock_id)
         return StockResponse.model_validate(stock) if stock else None
 
     def get_stock_by_product(self, product_id: UUID) -> Optional[StockResponse]:
+        return read_cache.get_or_load(stock_key(product_id), StockResponse, lambda: self.load_stock(product_id))
+
+    def load_stock(self, product_id: UUID) -> Optional[StockResponse]:
+        """get_stock_by_product from the database, bypassing the cache"""
         stock = self.repository.get_by_product(product_id)
         return StockResponse.model_validate(stock) if stock else None
 
-    def get_low_stock_alerts(self) -> List[StockResponse]:
-        stocks = self.repository.get_low_stock()
-        return [StockResponse.model_validate(stock) for stock in stocks]
+    def get_stock_version(self, stock_id: UUID) -> Optional[Row]:
+        return self.repository.get_version(stock_id)
+
+    def get_stock_version_by_product(self, product_id: UUID) -> Optional[Row]:
+        return self.repository.get_version_by_product(product_id)
+
+    def get_low_stock_alerts(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, include_product: bool = False
+    ) -> List[StockAlertResponse]:
+        stocks = self.repository.get_low_stock(skip, limit, cursor, include_product)
+        adapter = stock_alert_with_product_list_adapter if include_product else stock_alert_list_adapter
+        return adapter.validate_python(stocks, from_attributes=True)
+
+    def next_alert_cursor(self, alerts: List[StockAlertResponse], limit: int) -> Optional[str]:
+        return next_cursor(alerts, limit, self.repository.alert_cursor_columns)
 
     def create_stock(self, stock: StockCreate) -> StockResponse:
         # Check if stock already exists for this product
@@ -36,18 +78,144 @@ class StockService:
         db_stock = self.repository.create(stock)
         return StockResponse.model_validate(db_stock)
 
-    def update_stock(self, stock_id: UUID, stock_update: StockUpdate) -> Optional[StockResponse]:
-        updated_stock = self.repository.update(stock_id, stock_update)
-        return StockResponse.model_validate(updated_stock) if updated_stock else None
+    def update_stock(self, stock_id: UUID, stock_update: StockUpdate) -> Optional[StockChange]:
+        stock = self.repository.get_by_id(stock_id)
+        if not stock:
+            return None
+        previous_alert = bool(stock.alerte_stock_bas)
+        updated_stock = self.repository.apply_update(stock_id, stock_update)
+        self.outbox.add(EventType.STOCK_UPDATED, stock_event(updated_stock))
+        self.db.commit()
+        read_cache.invalidate(stock_key(updated_stock.produit_id))
+        return StockChange(StockResponse.model_validate(updated_stock), previous_alert)
 
-    def adjust_stock(self, product_id: UUID, quantity_change: int) -> Optional[StockResponse]:
+    def adjust_stock(self, product_id: UUID, quantity_change: int) -> Optional[StockChange]:
         """
         Adjust stock quantity by adding or removing items
         Positive quantity_change = stock entry
         Negative quantity_change = stock exit
         """
-        stock = self.repository.adjust_quantity(product_id, quantity_change)
-        return StockResponse.model_validate(stock) if stock else None
+        stock = self.repository.apply_adjustment(product_id, quantity_change)
+        if not stock:
+            return None
+        self.outbox.add(EventType.STOCK_UPDATED, dict(stock_event(stock), adjustment=quantity_change))
+        self.db.commit()
+        read_cache.invalidate(stock_key(product_id))
+        return StockChange(StockResponse.model_validate(stock), bool(stock.alerte_precedente))
+
+    def adjust_stock_batch(self, lines: List[StockAdjustmentLine]) -> List[StockChange]:
+        """
+        Apply all lines in one transaction; lines for the same product are merged.
+        Raises ValueError, leaving every stock untouched, if any product is unknown
+        or would go negative.
+        """
+        changes = self._apply_lines(lines)
+        self.db.commit()
+        read_cache.invalidate(*(stock_key(change.stock.produit_id) for change in changes))
+        return changes
+
+    def apply_orders(self, orders: List[Tuple[Optional[str], List[StockAdjustmentLine]]]) -> List[StockChange]:
+        """
+        Apply the lines of several orders, given as (message id, lines), in one transaction
+        that also records their message ids as processed; orders already recorded are
+        skipped. Raises ValueError, leaving every stock untouched, like adjust_stock_batch.
+        """
+        processed = ProcessedMessageRepository(self.db)
+        seen = processed.existing(message_id for message_id, _ in orders if message_id)
+        new: List[str] = []
+        lines: List[StockAdjustmentLine] = []
+        for message_id, order_lines in orders:
+            if message_id in seen:
+                continue
+            if message_id:
+                seen.add(message_id)
+                new.append(message_id)
+            lines.extend(order_lines)
+        changes = self._apply_lines(lines) if lines else []
+        processed.add_many(new)
+        self.db.commit()
+        read_cache.invalidate(*(stock_key(change.stock.produit_id) for change in changes))
+        return changes
+
+    def _apply_lines(self, lines: List[StockAdjustmentLine]) -> List[StockChange]:
+        """Merge the lines per product and apply them, without committing"""
+        changes: Dict[UUID, int] = defaultdict(int)
+        for line in lines:
+            changes[line.produit_id] += line.quantite
+        stocks = self.repository.apply_many(changes)
+        # One event for the whole batch
+        self.outbox.add(
+            EventType.STOCK_UPDATED, {"items": [stock_event(stock) for stock in stocks], "lignes": len(lines)}
+        )
+        return [StockChange(StockResponse.model_validate(stock), bool(stock.alerte_precedente)) for stock in stocks]
 
     def delete_stock(self, stock_id: UUID) -> bool:
-        return self.repository.delete(stock_id)
+        stock = self.repository.get_by_id(stock_id)
+        if not stock:
+            return False
+        product_id = stock.produit_id
+        # Its holds go with it, in the same transaction: none is left to confirm or release
+        ReservationRepository(self.db).release_for_product(product_id)
+        deleted = self.repository.delete(stock_id)
+        if deleted:
+            read_cache.invalidate(stock_key(product_id))
+        return deleted
+
+
+class AsyncStockService(AsyncService[StockService]):
+    service_class = StockService
+
+    async def get_all_stocks(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None
+    ) -> List[StockResponse]:
+        return await self.run(StockService.get_all_stocks, skip, limit, cursor)
+
+    def next_cursor(self, stocks: List[StockResponse], limit: int) -> Optional[str]:
+        return next_cursor(stocks, limit, StockRepository.cursor_columns)
+
+    async def get_stock(self, stock_id: UUID) -> Optional[StockResponse]:
+        return await self.run(StockService.get_stock, stock_id)
+
+    async def get_stock_by_product(self, product_id: UUID) -> Optional[StockResponse]:
+        return await read_cache.get_or_load_async(
+            stock_key(product_id), StockResponse, lambda: self.run(StockService.load_stock, product_id)
+        )
+
+    async def get_stock_version(self, stock_id: UUID) -> Optional[Row]:
+        return await self.run(StockService.get_stock_version, stock_id)
+
+    async def get_stock_version_by_product(self, product_id: UUID) -> Optional[Row]:
+        return await self.run(StockService.get_stock_version_by_product, product_id)
+
+    async def get_low_stock_alerts(
+        self, skip: int = 0, limit: int = 100, cursor: Optional[str] = None, include_product: bool = False
+    ) -> List[StockAlertResponse]:
+        return await self.run(StockService.get_low_stock_alerts, skip, limit, cursor, include_product)
+
+    def next_alert_cursor(self, alerts: List[StockAlertResponse], limit: int) -> Optional[str]:
+        return next_cursor(alerts, limit, StockRepository.alert_cursor_columns)
+
+    async def create_stock(self, stock: StockCreate) -> StockResponse:
+        return await self.run(StockService.create_stock, stock)
+
+    async def update_stock(self, stock_id: UUID, stock_update: StockUpdate) -> Optional[StockChange]:
+        return await self.run(StockService.update_stock, stock_id, stock_update)
+
+    async def adjust_stock(self, product_id: UUID, quantity_change: int) -> Optional[StockChange]:
+        return await self.run(StockService.adjust_stock, product_id, quantity_change)
+
+    async def adjust_stock_batch(self, lines: List[StockAdjustmentLine]) -> List[StockChange]:
+        return await self.run(StockService.adjust_stock_batch, lines)
+
+    async def delete_stock(self, stock_id: UUID) -> bool:
+        return await self.run(StockService.delete_stock, stock_id)
+
+
+def stock_event(stock: Any) -> Dict[str, Any]:
+    """Payload of STOCK_UPDATED for a written stock (model or RETURNING row)"""
+    return {
+        "product_id": str(stock.produit_id),
+        "quantite_disponible": stock.quantite_disponible,
+        "quantite_reservee": stock.quantite_reservee or 0,
+        "alerte_stock_bas": bool(stock.alerte_stock_bas),
+    }
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import AsyncIterator, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+from uuid import UUID
+
+import anyio.to_thread
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.repositories.change_log_repo import ChangeLogRepository
+from app.repositories.stock_repo import StockRepository
+from app.schemas.adapters import stock_adapter
+from app.schemas.event import EventType
+from app.schemas.stock import StockResponse
+
+logger = logging.getLogger(__name__)
+
+# Change log entries read per poll
+POLL_BATCH_SIZE = 1000
+
+
+def sse_frame(event: str, data: bytes, event_id: Optional[int] = None) -> bytes:
+    """One Server-Sent Events message"""
+    head = f"id: {event_id}\nevent: {event}\n" if event_id is not None else f"event: {event}\n"
+    return head.encode() + b"data: " + data + b"\n\n"
+
+
+class Subscriber:
+    """One SSE client: the products it follows, whether it wants alert edges, and its buffer"""
+
+    def __init__(self, product_ids: FrozenSet[UUID], alerts: bool, buffer_size: int):
+        self.product_ids = product_ids
+        self.alerts = alerts
+        self.active = True
+        # Encoded frames; None ends the stream
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(buffer_size)
+
+    def push(self, frame: bytes) -> bool:
+        """Buffer a frame; False if the buffer is full"""
+        try:
+            self.queue.put_nowait(frame)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self, discard: bool = False) -> None:
+        """End the stream, after the frames buffered unless discarded (or the buffer is full)"""
+        while (discard or self.queue.full()) and not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class StockStreamHub:
+    """
+    Pushes live stock levels to Server-Sent Events subscribers.
+
+    One task per process follows the change log, so writes from every API instance are
+    seen, in commit order, for one indexed query per poll whatever the number of
+    subscribers. Changes of a product within a poll are coalesced to its current state,
+    which is encoded once and fanned out to the subscribers of that product; edges of
+    alerte_stock_bas go to the alert subscribers. Idle subscribers cost an index entry
+    and an empty queue. A subscriber whose buffer fills up is disconnected rather than
+    slowing the others down; it reconnects and gets a fresh snapshot.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], interval: float, buffer_size: int):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.buffer_size = buffer_size
+        self._by_product: Dict[UUID, Set[Subscriber]] = defaultdict(set)
+        self._alert_subscribers: Set[Subscriber] = set()
+        self._in_alert: Set[UUID] = set()
+        self._last_seq = 0
+        self._task: Optional[asyncio.Task] = None
+        # Polls and snapshots do not interleave: a new subscriber misses no change
+        self._lock = asyncio.Lock()
+        self.subscribers = 0
+        self.polls = 0
+        self.sent = 0
+        self.dropped = 0
+
+    async def subscribe(self, product_ids: FrozenSet[UUID], alerts: bool) -> Subscriber:
+        """Register a subscriber, with the current stock of its products already buffered"""
+        async with self._lock:
+            if self._task is None:
+                self._last_seq, self._in_alert = await anyio.to_thread.run_sync(self._load_start)
+                self._task = asyncio.create_task(self._run())
+            subscriber = Subscriber(product_ids, alerts, self.buffer_size + len(product_ids))
+            if product_ids:
+                stocks = await anyio.to_thread.run_sync(self._load_stocks, product_ids)
+                for stock in stocks.values():
+                    subscriber.push(sse_frame(EventType.STOCK_UPDATED.value, stock_adapter.dump_json(stock)))
+            for product_id in product_ids:
+                self._by_product[product_id].add(subscriber)
+            if alerts:
+                self._alert_subscribers.add(subscriber)
+            self.subscribers += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        if not subscriber.active:
+            return
+        subscriber.active = False
+        for product_id in subscriber.product_ids:
+            followers = self._by_product.get(product_id)
+            if followers is not None:
+                followers.discard(subscriber)
+                if not followers:
+                    del self._by_product[product_id]
+        self._alert_subscribers.discard(subscriber)
+        self.subscribers -= 1
+
+    async def stream(self, subscriber: Subscriber, heartbeat: float) -> AsyncIterator[bytes]:
+        """The subscriber's SSE body, with a comment line when idle for heartbeat seconds"""
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                if frame is None:
+                    return
+                yield frame
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def poll(self) -> int:
+        """Fan out the stock changes committed since the last poll; returns how many products changed"""
+        async with self._lock:
+            last_seq, stocks = await anyio.to_thread.run_sync(self._load_changes, self._last_seq)
+            self._last_seq = last_seq
+            self.polls += 1
+            for product_id, stock in stocks.items():
+                self._publish(product_id, stock, last_seq)
+        return len(stocks)
+
+    async def stop(self) -> None:
+        """Stop polling and end every stream"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for subscriber in {subscriber for followers in self._by_product.values() for subscriber in followers}:
+            subscriber.close()
+        for subscriber in self._alert_subscribers:
+            subscriber.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": self.subscribers,
+            "products_followed": len(self._by_product),
+            "polls": self.polls,
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+    def _publish(self, product_id: UUID, stock: Optional[StockResponse], seq: int) -> None:
+        followers = self._by_product.get(product_id, ())
+        if followers:
+            if stock is None:
+                frame = sse_frame("stock.deleted", b'{"produit_id":"%s"}' % str(product_id).encode(), seq)
+            else:
+                frame = sse_frame(EventType.STOCK_UPDATED.value, stock_adapter.dump_json(stock), seq)
+            self._fan_out(followers, frame)
+
+        alert = stock is not None and bool(stock.alerte_stock_bas)
+        if alert == (product_id in self._in_alert):
+            return
+        if alert:
+            self._in_alert.add(product_id)
+            frame = sse_frame(EventType.STOCK_LOW_ALERT.value, stock_adapter.dump_json(stock), seq)
+        else:
+            self._in_alert.discard(product_id)
+            if stock is None:
+                return
+            frame = sse_frame(EventType.STOCK_ALERT_RECOVERED.value, stock_adapter.dump_json(stock), seq)
+        self._fan_out(self._alert_subscribers, frame)
+
+    def _fan_out(self, subscribers: Set[Subscriber], frame: bytes) -> None:
+        for subscriber in list(subscribers):
+            if subscriber.push(frame):
+                self.sent += 1
+                continue
+            # Slow consumer: its stale frames are dropped and its stream ends, it resyncs on reconnect
+            self.dropped += 1
+            self.unsubscribe(subscriber)
+            subscriber.close(discard=True)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Failed to poll stock changes: {e}")
+
+    def _load_start(self) -> Tuple[int, Set[UUID]]:
+        with self.session_factory() as db:
+            return ChangeLogRepository(db).last_seq(), StockRepository(db).get_alert_product_ids()
+
+    def _load_stocks(self, product_ids: FrozenSet[UUID]) -> Dict[UUID, StockResponse]:
+        with self.session_factory() as db:
+            stocks = StockRepository(db).get_many_by_product(product_ids)
+            return {stock.produit_id: StockResponse.model_validate(stock) for stock in stocks}
+
+    def _load_changes(self, after: int) -> Tuple[int, Dict[UUID, Optional[StockResponse]]]:
+        """Last seq read and the current stock of each product changed after seq `after` (None: deleted)"""
+        with self.session_factory() as db:
+            entries = ChangeLogRepository(db).get_since(after, POLL_BATCH_SIZE, entite="stock")
+            if not entries:
+                return after, {}
+            changed: List[UUID] = list(dict.fromkeys(entry.entite_id for entry in entries))
+            stocks = StockRepository(db).get_many_by_product(changed)
+            current = {stock.produit_id: StockResponse.model_validate(stock) for stock in stocks}
+            return entries[-1].seq, {product_id: current.get(product_id) for product_id in changed}
+
+
+# Global stock stream hub instance
+stock_stream_hub = StockStreamHub(
+    SessionLocal, settings.STOCK_STREAM_POLL_INTERVAL_SECONDS, settings.STOCK_STREAM_BUFFER_SIZE
+)
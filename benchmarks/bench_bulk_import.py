@@ -0,0 +1,110 @@
+"""
+Benchmark POST /api/v1/products/bulk against one-by-one POST /api/v1/products/.
+
+Runs the app in-process on a temporary SQLite file (or DATABASE_URL with --database-url).
+
+Usage:
+    python -m benchmarks.bench_bulk_import --rows 20000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import async_database_url, get_async_db, get_db
+from app.main import app
+from app.models import Base
+
+settings.TESTING = True
+
+
+def make_rows(count: int, category_id: str, prefix: str):
+    return [
+        {
+            "sku": f"{prefix}-{i:07d}",
+            "nom": f"Café {i}",
+            "description": "Grains torréfiés",
+            "categorie_id": category_id,
+            "prix_ht": "12.50",
+            "origine": "Colombie",
+        }
+        for i in range(count)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--single", type=int, default=500, help="rows sent one request at a time, for comparison")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    # The sync sessions (bulk endpoint) and the async ones (single POSTs) share one database:
+    # a temporary SQLite file unless a URL is given
+    path = None
+    database_url = args.database_url
+    if not database_url:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        database_url = f"sqlite:///{path}"
+    engine = create_engine(database_url)
+    # The TestClient runs its own event loop: no connection is kept past it
+    async_engine = create_async_engine(async_database_url(database_url), poolclass=NullPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(app) as client:
+        category_id = client.post("/api/v1/categories/", json={"nom": "Bench", "code": "BENCH"}).json()["id"]
+
+        rows = make_rows(args.rows, category_id, "BULK")
+        start = time.perf_counter()
+        report = client.post("/api/v1/products/bulk", json=rows).json()
+        elapsed = time.perf_counter() - start
+        print(f"bulk JSON    {report['created']:>7} rows {elapsed:>7.2f}s {report['created'] / elapsed:>10.0f} rows/s")
+
+        rows = make_rows(args.rows, category_id, "NDJSON")
+        body = "\n".join(json.dumps(row) for row in rows)
+        start = time.perf_counter()
+        report = client.post(
+            "/api/v1/products/bulk", content=body, headers={"Content-Type": "application/x-ndjson"}
+        ).json()
+        elapsed = time.perf_counter() - start
+        print(f"bulk NDJSON  {report['created']:>7} rows {elapsed:>7.2f}s {report['created'] / elapsed:>10.0f} rows/s")
+
+        rows = make_rows(args.single, category_id, "SINGLE")
+        start = time.perf_counter()
+        for row in rows:
+            client.post("/api/v1/products/", json=row)
+        elapsed = time.perf_counter() - start
+        print(f"single POST  {len(rows):>7} rows {elapsed:>7.2f}s {len(rows) / elapsed:>10.0f} rows/s")
+
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    if path:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark event encoding: the former Event model_dump + json.dumps(default=str) path
+against app.events.codecs with JSON, msgpack (when installed) and gzip, on a small
+stock.updated event and on a batch adjustment event with many lines.
+
+Usage:
+    python -m benchmarks.bench_codecs --events 20000 --lines 200
+"""
+import argparse
+import json
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict
+from uuid import uuid4
+
+from app.config import settings
+from app.events import codecs
+from app.events.producer import encode_event
+from app.schemas.event import Event, EventType
+
+
+def previous_encode(event_type: EventType, data: Dict[str, Any]) -> bytes:
+    event = Event(event_type=event_type, timestamp=datetime.utcnow(), data=data)
+    return json.dumps(event.model_dump(), default=str).encode()
+
+
+def stock_event() -> Dict[str, Any]:
+    return {"product_id": uuid4(), "quantite_disponible": 42, "alerte_stock_bas": False, "adjustment": -3}
+
+
+def batch_event(lines: int) -> Dict[str, Any]:
+    items = [stock_event() for _ in range(lines)]
+    return {"items": items, "lignes": [{"produit_id": item["product_id"], "quantite": -1} for item in items]}
+
+
+def run(label: str, encode: Callable[[], bytes], events: int) -> None:
+    size = len(encode())
+    start = time.perf_counter()
+    for _ in range(events):
+        encode()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed / events * 1e6:>8.1f} us/event {size:>8} bytes")
+
+
+def bench(name: str, data: Dict[str, Any], events: int) -> None:
+    print(f"-- {name}")
+    run("model_dump + json.dumps", lambda: previous_encode(EventType.STOCK_UPDATED, data), events)
+    available = ["json"] + (["msgpack"] if codecs.MSGPACK in codecs.codecs else [])
+    for codec in available:
+        settings.EVENT_CODEC = codec
+        settings.EVENT_COMPRESSION_THRESHOLD_BYTES = 0
+        run(codec, lambda: encode_event(EventType.STOCK_UPDATED, data).body, events)
+        settings.EVENT_COMPRESSION_THRESHOLD_BYTES = 1024
+        run(f"{codec} + gzip above 1 KiB", lambda: encode_event(EventType.STOCK_UPDATED, data).body, events)
+    settings.EVENT_CODEC = "json"
+    settings.EVENT_COMPRESSION_THRESHOLD_BYTES = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--lines", type=int, default=200, help="lines of the batch adjustment event")
+    args = parser.parse_args()
+
+    if codecs.MSGPACK not in codecs.codecs:
+        print("msgpack is not installed: JSON only")
+    bench("stock.updated", stock_event(), args.events)
+    bench(f"batch adjustment, {args.lines} lines", batch_event(args.lines), max(args.events // args.lines, 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark event messaging end to end on the in-memory broker (RABBITMQ_URL=memory://):
+EventProducer with its background queue -> topic exchange -> EventConsumer workers.
+
+Reports messages/s and p50/p99 publish-to-handle latency for each combination of
+producer batch size (EVENT_BATCH_SIZE), consumer concurrency (ordered by product_id)
+and codec, with the ack frames sent and the products whose events ran out of order.
+Events are published in one burst, so latency includes the wait behind it. The broker
+stand-in costs no network round trip: absolute numbers are upper bounds, the
+comparison between settings is what carries over.
+
+Usage:
+    python -m benchmarks.bench_messaging --messages 5000 --batch-sizes 1,10,100 --concurrency 1,8,32
+"""
+import argparse
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from app.config import settings
+from app.events import codecs, memory_broker
+from app.events.connection import RabbitMQConnection
+from app.events.consumer import EventConsumer
+from app.events.producer import EventProducer
+from app.schemas.event import EventType
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+async def run(messages: int, products: int, batch_size: int, concurrency: int, codec: str, handler_ms: float) -> None:
+    settings.EVENT_BATCH_SIZE = batch_size
+    settings.EVENT_CODEC = codec
+    broker = memory_broker.memory_broker = memory_broker.InMemoryBroker()
+    connection = RabbitMQConnection("memory://", settings.RABBITMQ_PUBLISH_CHANNELS)
+    producer = EventProducer(connection)
+    consumer = EventConsumer(connection, concurrency=concurrency, ordering_key="product_id")
+
+    latencies: List[float] = []
+    sequences: Dict[str, List[int]] = defaultdict(list)
+    done = asyncio.Event()
+
+    async def handler(body):
+        if handler_ms:
+            await asyncio.sleep(handler_ms / 1000)
+        data = body["data"]
+        latencies.append(time.perf_counter() - data["sent"])
+        sequences[data["product_id"]].append(data["seq"])
+        if len(latencies) == messages:
+            done.set()
+
+    await consumer.connect()
+    await consumer.bind_queue("products.#")
+    await consumer.start_consuming(handler)
+    producer.start()
+
+    start = time.perf_counter()
+    for seq in range(messages):
+        data = {"product_id": f"p{seq % products}", "seq": seq, "sent": time.perf_counter()}
+        await producer.publish_event(EventType.STOCK_UPDATED, data)
+    await done.wait()
+    elapsed = time.perf_counter() - start
+
+    await producer.stop()
+    await consumer.stop_consuming()
+    await connection.close()
+
+    latencies.sort()
+    out_of_order = sum(seqs != sorted(seqs) for seqs in sequences.values())
+    print(
+        f"{batch_size:>5} {concurrency:>11} {codec:<8} {messages / elapsed:>9.0f} "
+        f"{percentile(latencies, 0.5) * 1000:>8.2f} {percentile(latencies, 0.99) * 1000:>8.2f} "
+        f"{broker.ack_frames:>10} {out_of_order:>12}"
+    )
+
+
+async def bench(args) -> None:
+    available = [codec for codec in args.codecs.split(",") if codec == "json" or codecs.MSGPACK in codecs.codecs]
+    print(f"{args.messages} messages over {args.products} products, handler {args.handler_ms} ms")
+    print(f"{'batch':>5} {'concurrency':>11} {'codec':<8} {'msg/s':>9} {'p50 ms':>8} {'p99 ms':>8}", end=" ")
+    print(f"{'ack frames':>10} {'out of order':>12}")
+    for batch_size in (int(value) for value in args.batch_sizes.split(",")):
+        for concurrency in (int(value) for value in args.concurrency.split(",")):
+            for codec in available:
+                await run(args.messages, args.products, batch_size, concurrency, codec, args.handler_ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--batch-sizes", default="1,10,100")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--codecs", default="json,msgpack", help="msgpack runs only when the package is installed")
+    parser.add_argument("--handler-ms", type=float, default=0.0, help="simulated handler I/O")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark stock reservations under flash-sale contention: many threads try to hold
+units of one hot product whose stock is smaller than the demand. Every successful
+hold must be backed by stock, so holds == stock and nothing is oversold.
+Then all holds expire and the sweeper releases them in bulk.
+
+Runs on a temporary SQLite file by default, or DATABASE_URL with --database-url.
+
+Usage:
+    python -m benchmarks.bench_reservations --threads 16 --attempts 200 --stock 2000
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Stock, StockReservation
+from app.schemas.reservation import ReservationCreate
+from app.services.reservation_service import ReservationService
+from benchmarks.bench_stock_adjust import seed
+
+
+def run_holds(Session, product_id, threads: int, attempts: int, stock: int) -> None:
+    held, refused, errors = [], [], []
+
+    def worker():
+        with Session() as session:
+            service = ReservationService(session)
+            for _ in range(attempts):
+                try:
+                    service.reserve(ReservationCreate(produit_id=product_id, quantite=1))
+                    held.append(1)
+                except ValueError:
+                    refused.append(1)
+                except Exception as e:  # lock timeouts on SQLite, serialization errors...
+                    session.rollback()
+                    errors.append(e)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with Session() as session:
+        reserved = session.query(Stock.quantite_reservee).filter(Stock.produit_id == product_id).scalar()
+    print(
+        f"reserve   {threads * attempts / elapsed:>9.0f} attempts/s {elapsed:>7.2f}s held={len(held)} "
+        f"refused={len(refused)} errors={len(errors)} quantite_reservee={reserved} oversold={max(reserved - stock, 0)}"
+    )
+
+
+def run_sweep(Session, product_id, batch_size: int) -> None:
+    with Session() as session:
+        session.execute(update(StockReservation).values(date_expiration=datetime.utcnow() - timedelta(seconds=1)))
+        session.commit()
+
+        service = ReservationService(session)
+        start = time.perf_counter()
+        released = 0
+        while True:
+            count = service.release_expired(batch_size).released
+            released += count
+            if count < batch_size:
+                break
+        elapsed = time.perf_counter() - start
+        reserved = session.query(Stock.quantite_reservee).filter(Stock.produit_id == product_id).scalar()
+    print(f"sweep     {released / elapsed:>9.0f} holds/s    {elapsed:>7.2f}s released={released} left={reserved}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--attempts", type=int, default=200, help="holds attempted per thread")
+    parser.add_argument("--stock", type=int, default=2000)
+    parser.add_argument("--sweep-batch", type=int, default=1000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = None
+    if args.database_url:
+        engine = create_engine(args.database_url, pool_size=args.threads + 1)
+    else:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"{args.threads} threads x {args.attempts} holds on one product with {args.stock} units")
+    try:
+        product_id = seed(Session, args.stock)
+        run_holds(Session, product_id, args.threads, args.attempts, args.stock)
+        run_sweep(Session, product_id, args.sweep_batch)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if path:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark product search: ILIKE scan vs FTS5 vs the in-memory index.
+
+Usage:
+    python -m benchmarks.bench_search --products 20000 --queries 200
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.config import settings
+from app.models import Base, Category, Product, ProductStatus
+from app.repositories.product_repo import ProductRepository
+from app.services.search_index import ProductSearchIndex
+
+WORDS = [
+    "arabica",
+    "robusta",
+    "moka",
+    "santos",
+    "bourbon",
+    "geisha",
+    "typica",
+    "catuai",
+    "maragogype",
+    "liberica",
+    "doux",
+    "corse",
+    "fruite",
+    "floral",
+    "chocolat",
+    "caramel",
+    "noisette",
+    "epice",
+    "agrume",
+    "vanille",
+]
+ORIGINS = ["Éthiopie", "Colombie", "Brésil", "Kenya", "Guatemala", "Vietnam", "Inde", "Pérou", "Honduras", "Java"]
+SUPPLIERS = ["Torréfacteur Lyon", "Café Import", "Green Beans SA", "Terres de Café"]
+
+
+def seed(session, count: int) -> None:
+    category_id = uuid.uuid4()
+    session.add(Category(id=category_id, nom="Bench", code="BENCH"))
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    rows = [
+        {
+            "id": uuid.uuid4(),
+            "sku": f"BENCH-{i:07d}",
+            "nom": " ".join(rng.sample(WORDS[:10], 2)).title(),
+            "description": " ".join(rng.choices(WORDS, k=12)),
+            "categorie_id": category_id,
+            "prix_ht": Decimal("10.00"),
+            "taux_tva": Decimal("20.00"),
+            "prix_ttc": Decimal("12.00"),
+            "fournisseur": rng.choice(SUPPLIERS),
+            "origine": rng.choice(ORIGINS),
+            "statut": ProductStatus.ACTIF,
+            "date_creation": now,
+            "date_modification": now,
+        }
+        for i in range(count)
+    ]
+    session.execute(insert(Product), rows)
+    session.commit()
+
+
+def run(label: str, search, queries) -> None:
+    start = time.perf_counter()
+    hits = 0
+    for query in queries:
+        hits += len(search(query))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {len(queries) / elapsed:>10.1f} q/s {elapsed / len(queries) * 1000:>9.3f} ms/q {hits:>8} hits")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, args.products)
+
+    rng = random.Random(7)
+    query_sets = {
+        "one term": [rng.choice(WORDS) for _ in range(args.queries)],
+        "term + origin": [f"{rng.choice(WORDS)} {rng.choice(ORIGINS)}" for _ in range(args.queries)],
+        "no match": [f"introuvable{i}" for i in range(args.queries)],
+    }
+    repository = ProductRepository(session)
+
+    index = ProductSearchIndex(max_documents=args.products)
+    start = time.perf_counter()
+    index.build(session)
+    build_time = time.perf_counter() - start
+    stats = index.stats()
+
+    print(f"{args.products} products, {args.queries} queries, limit={args.limit}")
+    print(
+        f"index build {build_time:.2f}s, {stats['terms']} terms, {stats['postings']} postings, "
+        f"~{stats['memory_bytes'] / 1024 / 1024:.1f} MiB\n"
+    )
+
+    for name, queries in query_sets.items():
+        for backend in ("ilike", "fulltext"):
+            settings.SEARCH_BACKEND = backend
+            run(f"{name} / {backend}", lambda q: repository.search(q, 0, args.limit), queries)
+            session.expunge_all()
+        run(f"{name} / memory", lambda q: index.search(q, 0, args.limit), queries)
+
+
+if __name__ == "__main__":
+    main()
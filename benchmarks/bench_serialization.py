@@ -0,0 +1,109 @@
+"""
+Benchmark GET /api/v1/products/ with the single-pass serialization (FAST_SERIALIZATION)
+against FastAPI's response_model path, end to end and for the serialization step alone.
+
+Usage:
+    python -m benchmarks.bench_serialization --requests 50
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import get_async_db, get_db
+from app.main import app
+from app.models import Base
+from app.schemas.adapters import product_list_adapter
+from benchmarks.bench_search import seed
+
+settings.TESTING = True
+
+
+def timed(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def median_request_times(client, url: str, repeat: int):
+    """Median latency with FAST_SERIALIZATION off and on, alternating so both see the same noise"""
+    durations = {False: [], True: []}
+    for _ in range(repeat):
+        for fast in (False, True):
+            settings.FAST_SERIALIZATION = fast
+            start = time.perf_counter()
+            client.get(url)
+            durations[fast].append(time.perf_counter() - start)
+    return statistics.median(durations[False]), statistics.median(durations[True])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    # A SQLite file, shared by the sync sessions and the async ones of the product listing
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    # The TestClient runs its own event loop: no connection is kept past it
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    AsyncSession = async_sessionmaker(async_engine, autoflush=False)
+    with Session() as session:
+        seed(session, 1000)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(app) as client:
+        for limit in (100, 1000):
+            url = f"/api/v1/products/?limit={limit}"
+            products = product_list_adapter.validate_python(client.get(url).json())
+            slow, fast = median_request_times(client, url, args.requests)
+            print(
+                f"limit={limit:<5} response_model {slow * 1000:>8.2f} ms/req   "
+                f"single pass {fast * 1000:>8.2f} ms/req   x{slow / fast:.2f}"
+            )
+
+            # Serialization step alone: what FastAPI does after the endpoint returns, and the fast path
+            def fastapi_path():
+                validated = product_list_adapter.validate_python(products)
+                content = product_list_adapter.dump_python(validated, mode="json")
+                json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+            slow = timed(fastapi_path, args.requests)
+            fast = timed(lambda: product_list_adapter.dump_json(products), args.requests)
+            print(
+                f"{'':<11} serialize only {slow * 1000:>8.2f} ms      single pass {fast * 1000:>8.2f} ms      "
+                f"x{slow / fast:.2f}"
+            )
+
+    Base.metadata.drop_all(bind=engine)
+    engine.dispose()
+    os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
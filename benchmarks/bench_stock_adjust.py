@@ -0,0 +1,136 @@
+"""
+Benchmark concurrent stock adjustments: the former read-modify-write path against
+the single conditional UPDATE ... RETURNING of StockRepository.adjust_quantity.
+
+Every thread applies the same number of +1/-1 movements on one hot product, so the
+final quantity is known in advance; any difference is a lost update.
+
+Runs on a temporary SQLite file by default, or DATABASE_URL with --database-url.
+
+Usage:
+    python -m benchmarks.bench_stock_adjust --threads 8 --adjustments 500
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Base, Category, Product, Stock
+from app.repositories.stock_repo import StockRepository
+
+INITIAL_QUANTITY = 100000
+
+
+def read_modify_write(db, product_id, quantity_change):
+    """The previous implementation: SELECT, check in Python, UPDATE, COMMIT, refresh"""
+    stock = db.query(Stock).filter(Stock.produit_id == product_id).first()
+    new_quantity = stock.quantite_disponible + quantity_change
+    if new_quantity < 0:
+        raise ValueError("Stock quantity cannot be negative")
+    stock.quantite_disponible = new_quantity
+    if quantity_change > 0:
+        stock.date_derniere_entree = datetime.utcnow()
+    else:
+        stock.date_derniere_sortie = datetime.utcnow()
+    stock.alerte_stock_bas = stock.quantite_disponible < stock.quantite_minimum
+    db.commit()
+    db.refresh(stock)
+    return stock
+
+
+def atomic_update(db, product_id, quantity_change):
+    return StockRepository(db).adjust_quantity(product_id, quantity_change)
+
+
+def seed(Session, quantity: int = INITIAL_QUANTITY) -> uuid.UUID:
+    with Session() as session:
+        category_id, product_id = uuid.uuid4(), uuid.uuid4()
+        session.add(Category(id=category_id, nom=f"Bench {category_id.hex[:8]}", code=f"BENCH-{category_id.hex[:8]}"))
+        session.add(
+            Product(
+                id=product_id,
+                sku=f"BENCH-{product_id.hex[:8]}",
+                nom="Bench",
+                categorie_id=category_id,
+                prix_ht=Decimal("10.00"),
+                prix_ttc=Decimal("12.00"),
+            )
+        )
+        session.flush()
+        session.add(Stock(produit_id=product_id, quantite_disponible=quantity))
+        session.commit()
+    return product_id
+
+
+def run(label: str, adjust, Session, threads: int, adjustments: int) -> None:
+    product_id = seed(Session)
+    errors = []
+
+    def worker(index: int):
+        # Half of the threads add stock, the other half remove it, with a small net result
+        change = 1 if index % 2 == 0 else -1
+        with Session() as session:
+            for _ in range(adjustments):
+                try:
+                    adjust(session, product_id, change)
+                except Exception as e:  # lock timeouts on SQLite, serialization errors...
+                    session.rollback()
+                    errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    expected = INITIAL_QUANTITY + sum(1 if i % 2 == 0 else -1 for i in range(threads)) * adjustments
+    with Session() as session:
+        final = session.query(Stock.quantite_disponible).filter(Stock.produit_id == product_id).scalar()
+    # Failed calls changed nothing, but they were counted in the expected total
+    lost = abs(expected - final) - len(errors)
+    total = threads * adjustments
+    print(
+        f"{label:<20} {total / elapsed:>9.0f} adj/s {elapsed:>7.2f}s "
+        f"expected={expected} final={final} errors={len(errors)} lost~{max(lost, 0)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--adjustments", type=int, default=500, help="adjustments per thread")
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    path = None
+    if args.database_url:
+        engine = create_engine(args.database_url, pool_size=args.threads + 1)
+    else:
+        fd, path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    print(f"{args.threads} threads x {args.adjustments} adjustments on one product ({engine.dialect.name})")
+    try:
+        run("read-modify-write", read_modify_write, Session, args.threads, args.adjustments)
+        run("atomic UPDATE", atomic_update, Session, args.threads, args.adjustments)
+    finally:
+        Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        if path:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
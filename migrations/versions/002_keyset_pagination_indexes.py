@@ -0,0 +1,25 @@
+"""Add (date_creation, id) indexes for keyset pagination
+
+Revision ID: 002_keyset_pagination_indexes
+Revises: 001_initial
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '002_keyset_pagination_indexes'
+down_revision = '001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Listings seek on (date_creation, id) instead of OFFSET, so each page is one index range scan
+    op.create_index('ix_products_date_creation_id', 'products', ['date_creation', 'id'], unique=False)
+    op.create_index('ix_categories_date_creation_id', 'categories', ['date_creation', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_categories_date_creation_id', table_name='categories')
+    op.drop_index('ix_products_date_creation_id', table_name='products')
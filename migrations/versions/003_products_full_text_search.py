@@ -0,0 +1,34 @@
+"""Add full-text search vector on products
+
+Revision ID: 003_products_full_text_search
+Revises: 002_keyset_pagination_indexes
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '003_products_full_text_search'
+down_revision = '002_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Generated tsvector with French stemming; weights drive ts_rank ordering (nom > origine > texts)
+    op.execute(
+        """
+        ALTER TABLE products ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('french', coalesce(nom, '')), 'A') ||
+            setweight(to_tsvector('french', coalesce(origine, '')), 'B') ||
+            setweight(to_tsvector('french', coalesce(description, '')), 'C') ||
+            setweight(to_tsvector('french', coalesce(notes_qualite, '')), 'C')
+        ) STORED
+        """
+    )
+    op.execute("CREATE INDEX ix_products_search_vector ON products USING gin (search_vector)")
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_products_search_vector")
+    op.drop_column('products', 'search_vector')
@@ -0,0 +1,44 @@
+"""Add stock_reservations table for expiring stock holds
+
+Revision ID: 004_stock_reservations
+Revises: 003_products_full_text_search
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '004_stock_reservations'
+down_revision = '003_products_full_text_search'
+branch_labels = None
+depends_on = None
+
+reservation_status = sa.Enum('ACTIVE', 'CONFIRMEE', 'LIBEREE', 'EXPIREE', name='reservationstatus')
+
+
+def upgrade():
+    op.create_table(
+        'stock_reservations',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('produit_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('products.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('quantite', sa.Integer(), nullable=False),
+        sa.Column('statut', reservation_status, nullable=False, server_default='ACTIVE'),
+        sa.Column('reference', sa.String(100), nullable=True),
+        sa.Column('date_creation', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('date_expiration', sa.DateTime(), nullable=False),
+        sa.Column('date_modification', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+    )
+    op.create_index('ix_stock_reservations_produit_id', 'stock_reservations', ['produit_id'], unique=False)
+    # The sweeper scans active holds by expiry date
+    op.create_index(
+        'ix_stock_reservations_statut_expiration', 'stock_reservations', ['statut', 'date_expiration'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_stock_reservations_statut_expiration', table_name='stock_reservations')
+    op.drop_index('ix_stock_reservations_produit_id', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
+    reservation_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,31 @@
+"""Add partial severity index on stocks in alert
+
+Revision ID: 005_stock_alert_severity_index
+Revises: 004_stock_reservations
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '005_stock_alert_severity_index'
+down_revision = '004_stock_reservations'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Only stocks in alert are indexed, ordered by available / minimum; the expression must
+    # stay identical to app.models.stock.alert_severity for the planner to use it
+    op.execute(
+        """
+        CREATE INDEX ix_stocks_alerte_severite ON stocks (
+            (CAST(quantite_disponible - coalesce(quantite_reservee, 0) AS FLOAT) / nullif(quantite_minimum, 0)),
+            id
+        ) WHERE alerte_stock_bas IS true
+        """
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_stocks_alerte_severite")
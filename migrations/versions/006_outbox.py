@@ -0,0 +1,39 @@
+"""Add outbox table for transactional event publishing
+
+Revision ID: 006_outbox
+Revises: 005_stock_alert_severity_index
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006_outbox'
+down_revision = '005_stock_alert_severity_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'outbox',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('routing_key', sa.String(length=200), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=False),
+        sa.Column('tentatives', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('derniere_erreur', sa.Text(), nullable=True),
+        sa.Column('date_creation', sa.DateTime(), nullable=False),
+        sa.Column('date_envoi', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    # The relay only scans pending events
+    op.create_index(
+        'ix_outbox_pending', 'outbox', ['id'], unique=False, postgresql_where=sa.text('date_envoi IS NULL')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_outbox_pending', table_name='outbox')
+    op.drop_table('outbox')
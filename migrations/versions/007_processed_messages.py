@@ -0,0 +1,33 @@
+"""Add processed_messages table for consumer deduplication
+
+Revision ID: 007_processed_messages
+Revises: 006_outbox
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '007_processed_messages'
+down_revision = '006_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'processed_messages',
+        sa.Column('message_id', sa.String(length=200), nullable=False),
+        sa.Column('date_traitement', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('message_id'),
+    )
+    # TTL cleanup deletes by processing date
+    op.create_index(
+        'ix_processed_messages_date_traitement', 'processed_messages', ['date_traitement'], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index('ix_processed_messages_date_traitement', table_name='processed_messages')
+    op.drop_table('processed_messages')
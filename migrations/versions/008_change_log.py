@@ -0,0 +1,55 @@
+"""Add change_log table for the incremental sync feed
+
+Revision ID: 008_change_log
+Revises: 007_processed_messages
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '008_change_log'
+down_revision = '007_processed_messages'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'change_log',
+        sa.Column('seq', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('entite', sa.String(length=20), nullable=False),
+        sa.Column('entite_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('operation', sa.String(length=10), nullable=False),
+        sa.Column('date_changement', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('seq'),
+    )
+    # Compaction looks up the earlier entries of an entity
+    op.create_index('ix_change_log_entite', 'change_log', ['entite', 'entite_id', 'seq'], unique=False)
+    # Tombstone expiry scans deletions only
+    op.create_index(
+        'ix_change_log_tombstones',
+        'change_log',
+        ['date_changement'],
+        unique=False,
+        postgresql_where=sa.text("operation = 'delete'"),
+    )
+
+    # Start the log with the current catalog, so a sync from the beginning sees every entity
+    for entite, table, column in (
+        ('category', 'categories', 'id'),
+        ('product', 'products', 'id'),
+        ('stock', 'stocks', 'produit_id'),
+    ):
+        op.execute(
+            f"INSERT INTO change_log (entite, entite_id, operation, date_changement) "
+            f"SELECT '{entite}', {column}, 'upsert', CURRENT_TIMESTAMP FROM {table}"
+        )
+
+
+def downgrade():
+    op.drop_index('ix_change_log_tombstones', table_name='change_log')
+    op.drop_index('ix_change_log_entite', table_name='change_log')
+    op.drop_table('change_log')
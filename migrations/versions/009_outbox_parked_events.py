@@ -0,0 +1,36 @@
+"""Park outbox events that keep failing
+
+Revision ID: 009_outbox_parked_events
+Revises: 008_change_log
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009_outbox_parked_events'
+down_revision = '008_change_log'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('outbox', sa.Column('date_echec', sa.DateTime(), nullable=True))
+    # Parked events leave the relay's scan
+    op.drop_index('ix_outbox_pending', table_name='outbox')
+    op.create_index(
+        'ix_outbox_pending',
+        'outbox',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('date_envoi IS NULL AND date_echec IS NULL'),
+    )
+
+
+def downgrade():
+    op.drop_index('ix_outbox_pending', table_name='outbox')
+    op.create_index(
+        'ix_outbox_pending', 'outbox', ['id'], unique=False, postgresql_where=sa.text('date_envoi IS NULL')
+    )
+    op.drop_column('outbox', 'date_echec')
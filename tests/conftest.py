@@ -1,16 +1,19 @@
 import os
 import sys
+import tempfile
 
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
 
 from app.config import settings
-from app.database import get_db
+from app.database import get_async_db, get_db
 from app.main import app
 from app.models.base import Base
+from app.services.cache import read_cache
 
 # Set testing mode to skip migrations and RabbitMQ
 settings.TESTING = True
@@ -22,18 +25,24 @@ def pytest_sessionfinish(session, exitstatus):
     """Clean up resources when test session finishes"""
     try:
         Base.metadata.drop_all(bind=engine)
+        engine.dispose()
+        os.remove(DATABASE_FILE)
     except Exception:
         pass
 
 
-# Use in-memory SQLite for testing
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# SQLite file for testing, shared by the sync sessions and the async ones of the request handlers
+DATABASE_FILE = os.path.join(tempfile.mkdtemp(), "test.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_FILE}"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=NullPool)
+# Each TestClient runs its own event loop: no connection is kept across them
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_FILE}", poolclass=NullPool)
 
 
 # Enable foreign keys for SQLite
 @event.listens_for(engine, "connect")
+@event.listens_for(async_engine.sync_engine, "connect")
 def set_sqlite_pragma(dbapi_conn, connection_record):
     cursor = dbapi_conn.cursor()
     cursor.execute("PRAGMA foreign_keys=ON")
@@ -41,6 +50,7 @@ def set_sqlite_pragma(dbapi_conn, connection_record):
 
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False)
 
 
 @pytest.fixture(scope="function")
@@ -53,6 +63,7 @@ def db_session():
     finally:
         session.close()
         Base.metadata.drop_all(bind=engine)
+        read_cache.clear()
 
 
 @pytest.fixture(scope="function")
@@ -63,9 +74,15 @@ def client(db_session):
         try:
             yield db_session
         finally:
-            pass
+            # Like closing the session: a request never leaves a transaction (and its locks) open
+            db_session.rollback()
+
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as db:
+            yield db
 
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -75,3 +92,9 @@ def client(db_session):
 def sample_category():
     """Sample category data"""
     return {"nom": "Arabica", "description": "Café Arabica de qualité supérieure", "code": "ARAB"}
+
+
+def create_product(client, category_id, sku="CAFE-001"):
+    """Create a product in a category through the API and return its id"""
+    product_data = {"sku": sku, "nom": f"Café {sku}", "categorie_id": category_id, "prix_ht": "10.00"}
+    return client.post("/api/v1/products/", json=product_data).json()["id"]
@@ -0,0 +1,137 @@
+from app.schemas.category import CategoryCreate
+from app.services.cache import AsyncRedisCache, MemoryCache, ReadThroughCache, RedisCache, read_cache
+from tests.conftest import create_product
+
+
+class FakeRedis:
+    """Stand-in for redis.Redis: get/set(ex=)/delete/scan_iter on a dict, TTLs ignored"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match.rstrip("*"))]
+
+
+class FakeAsyncRedis(FakeRedis):
+    """Stand-in for redis.asyncio.Redis"""
+
+    async def get(self, key):
+        return super().get(key)
+
+    async def set(self, key, value, ex=None):
+        super().set(key, value, ex)
+
+    async def delete(self, *keys):
+        super().delete(*keys)
+
+
+def test_memory_cache_lru_and_ttl():
+    """Test LRU eviction by entry count and by size, and TTL expiry"""
+    cache = MemoryCache(max_entries=2, max_bytes=1024)
+    cache.set("a", b"1", ttl=60)
+    cache.set("b", b"2", ttl=60)
+    cache.get("a")
+    cache.set("c", b"3", ttl=60)
+    # "b" was the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+
+    cache.set("big", b"x" * 1020, ttl=60)
+    assert cache.get("big") is not None
+    assert cache.stats()["bytes"] <= 1024
+    assert cache.stats()["evictions"] == 3
+
+    cache.set("short", b"1", ttl=0)
+    assert cache.get("short") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_read_through_cache_on_redis_backend():
+    """Test hits, misses and invalidation through a Redis-compatible client"""
+    redis = FakeRedis()
+    cache = ReadThroughCache(RedisCache(redis), ttl=60)
+    loads = []
+
+    def load():
+        loads.append(1)
+        return CategoryCreate(nom="Arabica", code="ARAB")
+
+    assert cache.get_or_load("category:1", CategoryCreate, load).nom == "Arabica"
+    assert cache.get_or_load("category:1", CategoryCreate, load).code == "ARAB"
+    assert len(loads) == 1
+    assert list(redis.data) == ["produits:category:1"]
+
+    cache.invalidate("category:1")
+    cache.get_or_load("category:1", CategoryCreate, load)
+    assert len(loads) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # Missing rows are not cached
+    assert cache.get_or_load("category:2", CategoryCreate, lambda: None) is None
+    assert "produits:category:2" not in redis.data
+
+
+def test_product_and_stock_reads_are_invalidated_by_writes(client, sample_category):
+    """Test that cached product and stock reads see updates, adjustments and deletes"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    product_data = {"sku": "CAFE-001", "nom": "Café Arabica Premium", "categorie_id": category_id, "prix_ht": "15.99"}
+    product_id = client.post("/api/v1/products/", json=product_data).json()["id"]
+
+    hits = read_cache.hits
+    client.get(f"/api/v1/products/{product_id}")
+    client.get(f"/api/v1/products/{product_id}")
+    assert read_cache.hits == hits + 1
+
+    client.put(f"/api/v1/products/{product_id}", json={"nom": "Café Moka"})
+    assert client.get(f"/api/v1/products/{product_id}").json()["nom"] == "Café Moka"
+
+    assert client.get(f"/api/v1/stock/product/{product_id}").json()["quantite_disponible"] == 0
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 5})
+    assert client.get(f"/api/v1/stock/product/{product_id}").json()["quantite_disponible"] == 5
+    client.post("/api/v1/stock/adjust-batch", json={"lignes": [{"produit_id": product_id, "quantite": 2}]})
+    stock = client.get(f"/api/v1/stock/product/{product_id}").json()
+    assert stock["quantite_disponible"] == 7
+    client.delete(f"/api/v1/stock/{stock['id']}")
+    assert client.get(f"/api/v1/stock/product/{product_id}").status_code == 404
+
+    client.delete(f"/api/v1/products/{product_id}")
+    assert client.get(f"/api/v1/products/{product_id}").status_code == 404
+    assert client.get(f"/api/v1/stock/product/{product_id}").status_code == 404
+
+    assert client.get("/metrics").json()["cache"]["backend"] == "memory"
+
+
+def test_async_handlers_use_the_async_backend(client, sample_category, monkeypatch):
+    """Test that the async handlers read, fill and invalidate the cache through the async client only"""
+    sync_redis, async_redis = FakeRedis(), FakeAsyncRedis()
+    monkeypatch.setattr(read_cache, "backend", RedisCache(sync_redis))
+    monkeypatch.setattr(read_cache, "async_backend", AsyncRedisCache(async_redis))
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id)
+
+    hits = read_cache.hits
+    client.get(f"/api/v1/products/{product_id}")
+    client.get(f"/api/v1/stock/product/{product_id}")
+    assert client.get(f"/api/v1/products/{product_id}").json()["nom"] == "Café CAFE-001"
+    assert read_cache.hits == hits + 1
+    assert set(async_redis.data) == {f"produits:product:{product_id}", f"produits:stock:{product_id}"}
+
+    client.put(f"/api/v1/products/{product_id}", json={"nom": "Café Moka"})
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 5})
+    assert async_redis.data == {}
+    assert client.get(f"/api/v1/products/{product_id}").json()["nom"] == "Café Moka"
+    assert client.get(f"/api/v1/stock/product/{product_id}").json()["quantite_disponible"] == 5
+    assert sync_redis.data == {}
@@ -26,6 +26,21 @@ def test_get_categories(client, sample_category):
     assert data[0]["nom"] == sample_category["nom"]
 
 
+def test_get_categories_cursor(client, sample_category):
+    """Test paginating categories with a cursor"""
+    client.post("/api/v1/categories/", json=sample_category)
+    client.post("/api/v1/categories/", json={"nom": "Robusta", "code": "ROB"})
+
+    response = client.get("/api/v1/categories/?limit=1")
+    first = response.json()
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f"/api/v1/categories/?limit=1&cursor={cursor}")
+    second = response.json()
+    assert len(second) == 1
+    assert second[0]["id"] != first[0]["id"]
+
+
 def test_get_category_by_id(client, sample_category):
     """Test getting a specific category"""
     # Create a category
@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.models.change_log import ChangeLogEntry
+from app.repositories.pagination import encode_cursor
+from app.services.change_service import ChangeService
+from tests.conftest import create_product
+
+
+def read_all(client, since=None):
+    """Follow the feed to its end; returns the changes and the token to resume from"""
+    changes = []
+    while True:
+        params = {"limit": 3} if since is None else {"limit": 3, "since": since}
+        feed = client.get("/api/v1/changes", params=params).json()
+        changes += feed["changes"]
+        since = feed["next_token"]
+        if not feed["has_more"]:
+            return changes, since
+
+
+def backdate_entries(db_session, hours):
+    db_session.query(ChangeLogEntry).update({"date_changement": datetime.utcnow() - timedelta(hours=hours)})
+    db_session.commit()
+
+
+def summary(changes):
+    return [(change["entite"], change["entite_id"], change["operation"]) for change in changes]
+
+
+def test_feed_follows_writes_in_commit_order(client, sample_category):
+    """Test that every write path logs its changes in order, with the current state and tombstones"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id, "CAFE-001")
+    changes, token = read_all(client)
+    assert summary(changes) == [
+        ("category", category_id, "upsert"),
+        ("product", product_id, "upsert"),
+        ("stock", product_id, "upsert"),
+    ]
+    assert changes[1]["donnees"]["sku"] == "CAFE-001"
+    assert [change["seq"] for change in changes] == sorted(change["seq"] for change in changes)
+
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 10})
+    client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 4})
+    client.post(
+        "/api/v1/products/bulk",
+        json=[{"sku": "CAFE-002", "nom": "Café 2", "categorie_id": category_id, "prix_ht": "10.00"}],
+    )
+    # Rolled back: logs nothing
+    client.post("/api/v1/stock/adjust-batch", json={"lignes": [{"produit_id": product_id, "quantite": -100}]})
+    changes, token = read_all(client, token)
+    bulk_id = changes[2]["entite_id"]
+    assert summary(changes) == [
+        ("stock", product_id, "upsert"),
+        ("stock", product_id, "upsert"),
+        ("product", bulk_id, "upsert"),
+        ("stock", bulk_id, "upsert"),
+    ]
+    # Current state, not the state at the time of the change
+    assert [change["donnees"]["quantite_reservee"] for change in changes[:2]] == [4, 4]
+
+    client.delete(f"/api/v1/categories/{category_id}")
+    changes, token = read_all(client, token)
+    assert sorted(summary(changes)) == sorted(
+        [
+            ("category", category_id, "delete"),
+            ("product", product_id, "delete"),
+            ("stock", product_id, "delete"),
+            ("product", bulk_id, "delete"),
+            ("stock", bulk_id, "delete"),
+        ]
+    )
+    assert all(change["donnees"] is None for change in changes)
+    assert read_all(client, token)[0] == []
+
+
+def test_compaction_and_expired_tokens(client, sample_category, db_session, monkeypatch):
+    """Test that compaction keeps one entry per entity and that old tokens must resync"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    kept = create_product(client, category_id, "CAFE-001")
+    deleted = create_product(client, category_id, "CAFE-002")
+    for quantity in (5, -2, 3):
+        client.post(f"/api/v1/stock/product/{kept}/adjust", json={"quantite": quantity})
+    client.delete(f"/api/v1/products/{deleted}")
+
+    service = ChangeService(db_session)
+    result = service.compact(0, batch_size=2)
+    assert (result.compacted, result.purged) == (5, 0)
+    changes, _ = read_all(client)
+    assert sorted(summary(changes)) == sorted(
+        [
+            ("category", category_id, "upsert"),
+            ("product", kept, "upsert"),
+            ("stock", kept, "upsert"),
+            ("product", deleted, "delete"),
+            ("stock", deleted, "delete"),
+        ]
+    )
+    assert next(change for change in changes if change["entite"] == "stock")["donnees"]["quantite_disponible"] == 6
+
+    # Nothing new: resumes from where it stopped
+    assert service.compact(result.last_seq, batch_size=2).compacted == 0
+
+    monkeypatch.setattr(settings, "CHANGE_LOG_TOMBSTONE_RETENTION_HOURS", 1)
+    before_purge = encode_cursor([result.last_seq, datetime.utcnow() - timedelta(hours=2)])
+    backdate_entries(db_session, hours=2)
+    assert service.compact(result.last_seq, batch_size=2).purged == 2
+    assert len(read_all(client)[0]) == 3
+    assert client.get("/api/v1/changes", params={"since": before_purge}).status_code == 410
+    assert client.get("/api/v1/changes", params={"since": "garbage"}).status_code == 400
@@ -0,0 +1,75 @@
+import gzip
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from app.config import settings
+from app.events import codecs
+from app.events.consumer import EventConsumer
+from app.events.producer import build_message, encode_event
+from app.schemas.event import EventType
+from tests.test_event_consumer import FakeMessage, FakeQueue
+
+
+def test_json_event_keeps_its_format(monkeypatch):
+    """Test that JSON events keep the Event fields and string dates, and gzip only above the threshold"""
+    product_id = uuid4()
+    encoded = encode_event(EventType.STOCK_UPDATED, {"product_id": product_id}, datetime(2026, 10, 16, 12, 0))
+    assert encoded.content_encoding is None
+    assert codecs.decode(encoded.body, encoded.content_type) == {
+        "event_type": "stock.updated",
+        "timestamp": "2026-10-16 12:00:00",
+        "data": {"product_id": str(product_id)},
+        "metadata": None,
+    }
+
+    monkeypatch.setattr(settings, "EVENT_COMPRESSION_THRESHOLD_BYTES", 100)
+    encoded = codecs.encode({"lignes": ["Café moulu"] * 50})
+    assert encoded.content_encoding == "gzip" and len(encoded.body) < 100
+    message = build_message(encoded)
+    assert codecs.decode(message.body, message.content_type, message.content_encoding)["lignes"][0] == "Café moulu"
+
+
+def test_msgpack_roundtrip(monkeypatch):
+    """Test that EVENT_CODEC=msgpack encodes events as msgpack, smaller than JSON"""
+    pytest.importorskip("msgpack")
+    data = {"product_id": uuid4(), "quantite_disponible": 12, "alerte_stock_bas": False}
+    json_body = encode_event(EventType.STOCK_UPDATED, data).body
+    monkeypatch.setattr(settings, "EVENT_CODEC", "msgpack")
+    encoded = encode_event(EventType.STOCK_UPDATED, data)
+    assert encoded.content_type == codecs.MSGPACK
+    assert len(encoded.body) < len(json_body)
+    assert codecs.decode(encoded.body, encoded.content_type)["data"]["product_id"] == str(data["product_id"])
+
+
+def test_unreadable_bodies_raise_value_error():
+    """Test that unknown content types or encodings and corrupt bodies raise ValueError"""
+    with pytest.raises(ValueError):
+        codecs.decode(b"{}", "application/xml")
+    with pytest.raises(ValueError):
+        codecs.decode(b"{}", codecs.JSON, "br")
+    with pytest.raises(ValueError):
+        codecs.decode(b"not gzip", codecs.JSON, codecs.GZIP)
+
+
+async def test_consumer_decodes_from_properties(monkeypatch):
+    """Test that the consumer reads plain and gzipped messages side by side and nacks unreadable ones"""
+    monkeypatch.setattr(settings, "CONSUMER_ACK_INTERVAL_SECONDS", 0.01)
+    consumer = EventConsumer(concurrency=1, ordering_key="")
+    consumer.queue = FakeQueue()
+    handled = []
+
+    async def handler(body):
+        handled.append(body["data"]["seq"])
+
+    await consumer.start_consuming(handler)
+    log = []
+    plain, zipped, unknown = (FakeMessage(tag, {"seq": tag}, log) for tag in (1, 2, 3))
+    zipped.body, zipped.content_encoding = gzip.compress(zipped.body), "gzip"
+    unknown.content_type = "application/xml"
+    for message in (plain, zipped, unknown):
+        await consumer.queue.callback(message)
+    await consumer.stop_consuming()
+    assert handled == [1, 2]
+    assert ("nack", 3, True) in log
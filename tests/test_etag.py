@@ -0,0 +1,73 @@
+from tests.conftest import create_product
+
+
+def test_product_conditional_get(client, sample_category):
+    """Test that an unchanged product answers 304 and a modified one a new ETag"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id)
+
+    response = client.get(f"/api/v1/products/{product_id}")
+    etag = response.headers["ETag"]
+
+    response = client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    # Weak comparison and lists of tags
+    response = client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+    client.put(f"/api/v1/products/{product_id}", json={"nom": "Café Moka"})
+    response = client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["nom"] == "Café Moka"
+    assert response.headers["ETag"] != etag
+
+    client.delete(f"/api/v1/products/{product_id}")
+    response = client.get(f"/api/v1/products/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 404
+
+
+def test_stock_and_category_conditional_get(client, sample_category):
+    """Test ETags on stock and category reads"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id)
+
+    for url in (f"/api/v1/categories/{category_id}", f"/api/v1/stock/product/{product_id}"):
+        etag = client.get(url).headers["ETag"]
+        assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+
+    stock = client.get(f"/api/v1/stock/product/{product_id}")
+    etag = stock.headers["ETag"]
+    assert client.get(f"/api/v1/stock/{stock.json()['id']}").headers["ETag"] == etag
+
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 5})
+    response = client.get(f"/api/v1/stock/product/{product_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["quantite_disponible"] == 5
+
+
+def test_list_conditional_get(client, sample_category):
+    """Test collection ETags on list endpoints"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id)
+
+    for url in ("/api/v1/products/?limit=1", "/api/v1/categories/", "/api/v1/stock/", "/api/v1/stock/alerts"):
+        response = client.get(url)
+        etag = response.headers["ETag"]
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+    # The 304 of a page keeps the pagination header
+    first_page = client.get("/api/v1/products/?limit=1")
+    response = client.get("/api/v1/products/?limit=1", headers={"If-None-Match": first_page.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.headers["X-Next-Cursor"] == first_page.headers["X-Next-Cursor"]
+
+    etag = client.get("/api/v1/products/").headers["ETag"]
+    client.put(f"/api/v1/products/{product_id}", json={"prix_ht": "16.99"})
+    assert client.get("/api/v1/products/", headers={"If-None-Match": etag}).status_code == 200
+
+    etag = client.get("/api/v1/products/").headers["ETag"]
+    product_data = {"sku": "CAFE-002", "nom": "Café Moka", "categorie_id": category_id, "prix_ht": "15.99"}
+    client.post("/api/v1/products/", json=product_data)
+    assert client.get("/api/v1/products/", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+from app.config import settings
+from app.events.consumer import AckBatcher, EventConsumer
+from app.events.dedup import DedupStore
+from tests.conftest import TestingSessionLocal
+
+
+class FakeMessage:
+    """Stand-in for an aio_pika incoming message recording its acks and nacks"""
+
+    def __init__(self, delivery_tag, data=None, log=None, message_id=None):
+        self.delivery_tag = delivery_tag
+        self.body = json.dumps({"event_type": "stock.updated", "data": data or {}}).encode()
+        self.content_type = "application/json"
+        self.content_encoding = None
+        self.message_id = message_id
+        self.redelivered = False
+        self.log = [] if log is None else log
+
+    async def ack(self, multiple=False):
+        self.log.append(("ack", self.delivery_tag, multiple))
+
+    async def nack(self, requeue=True):
+        self.log.append(("nack", self.delivery_tag, requeue))
+
+
+class FakeQueue:
+    def __init__(self):
+        self.callback = None
+
+    async def consume(self, callback):
+        self.callback = callback
+        return "ctag"
+
+    async def cancel(self, consumer_tag):
+        self.callback = None
+
+
+async def test_acks_cover_settled_prefix():
+    """Test that one multiple ack covers the settled head of the delivery order, and failures are nacked"""
+    log = []
+    messages = [FakeMessage(tag, log=log) for tag in range(1, 6)]
+    acks = AckBatcher(batch_size=100)
+    for message in messages:
+        acks.received(message)
+
+    await acks.done(messages[1])
+    await acks.failed(messages[0])
+    await acks.done(messages[3])
+    await acks.flush()
+    assert log == [("nack", 1, True), ("ack", 2, True)]
+
+    await acks.done(messages[2])
+    await acks.done(messages[4])
+    await acks.flush()
+    assert log[-1] == ("ack", 5, True)
+    assert (acks.acks, acks.acked, acks.nacked) == (2, 4, 1)
+
+
+async def test_ordered_by_key_and_concurrent_across_keys(monkeypatch):
+    """Test that events of one product run in order while other products proceed"""
+    monkeypatch.setattr(settings, "CONSUMER_ACK_INTERVAL_SECONDS", 0.01)
+    consumer = EventConsumer(concurrency=4, ordering_key="product_id")
+    consumer.queue = FakeQueue()
+    release = asyncio.Event()
+    handled = []
+
+    async def handler(body):
+        data = body["data"]
+        if data["product_id"] == "slow" and data["seq"] == 0:
+            await release.wait()
+        if data["seq"] == 3:
+            raise ValueError("bad event")
+        handled.append((data["product_id"], data["seq"]))
+
+    await consumer.start_consuming(handler)
+    log = []
+    events = [("slow", 0), ("slow", 1), ("fast", 2), ("fast", 3), ("fast", 4)]
+    for tag, (product_id, seq) in enumerate(events, start=1):
+        await consumer.queue.callback(FakeMessage(tag, {"product_id": product_id, "seq": seq}, log))
+    await asyncio.sleep(0.05)
+    # Blocked behind slow 0: slow 1 waits, fast events do not; nothing acked past tag 1
+    assert handled == [("fast", 2), ("fast", 4)]
+    assert log == [("nack", 4, True)]
+
+    release.set()
+    await consumer.stop_consuming()
+    assert handled[2:] == [("slow", 0), ("slow", 1)]
+    assert log[-1] == ("ack", 5, True)
+    assert consumer.stats()["failed"] == 1 and consumer.stats()["acked"] == 4
+
+
+async def test_duplicates_skipped(db_session, monkeypatch):
+    """Test that redelivered message ids skip the handler, from memory or from the table after a restart"""
+    monkeypatch.setattr(settings, "CONSUMER_ACK_INTERVAL_SECONDS", 0.01)
+    handled = []
+
+    async def handler(body):
+        await asyncio.sleep(0.01)
+        handled.append(body["data"]["seq"])
+
+    async def consume(dedup, message_ids):
+        consumer = EventConsumer(concurrency=2, ordering_key="", dedup=dedup)
+        consumer.queue = FakeQueue()
+        await consumer.start_consuming(handler)
+        for tag, message_id in enumerate(message_ids, start=1):
+            await consumer.queue.callback(FakeMessage(tag, {"seq": tag}, message_id=message_id))
+        await consumer.stop_consuming()
+        return consumer
+
+    # The second copy arrives while the first is being handled
+    consumer = await consume(DedupStore(TestingSessionLocal, 10, 1), ["a", "a", "b", None])
+    assert sorted(handled) == [1, 3, 4]
+    assert consumer.stats()["duplicates"] == 1 and consumer.stats()["acked"] == 4
+    consumer = await consume(consumer.dedup, ["b"])
+    assert consumer.dedup.stats()["hits"] == 1
+
+    # Restarted: empty LRU, the table still knows
+    dedup = DedupStore(TestingSessionLocal, 10, 0)
+    await consume(dedup, ["a", "c"])
+    assert sorted(handled) == [1, 2, 3, 4]
+    assert dedup.stats()["db_hits"] == 1 and dedup.stats()["misses"] == 1
+    assert await dedup.purge() == 3
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app.config import settings
+from app.events.producer import EventProducer
+from app.schemas.event import EventType
+
+
+class FakeConnection:
+    """Stand-in for RabbitMQConnection: publish waits for the broker confirm until released"""
+
+    def __init__(self):
+        self.published = []
+        self.confirm = asyncio.Event()
+        self.confirm.set()
+        self.failures = 0
+
+    async def declare_exchange(self, name=None):
+        pass
+
+    async def publish(self, message, routing_key, exchange_name=None):
+        await self.confirm.wait()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("channel closed")
+        self.published.append(routing_key)
+
+
+@pytest.fixture
+def producer():
+    return EventProducer(FakeConnection())
+
+
+async def test_publish_returns_before_confirm(producer, monkeypatch):
+    """Test that events are queued, then published in batches by the background task"""
+    monkeypatch.setattr(settings, "EVENT_BATCH_SIZE", 3)
+    producer.start()
+    producer.connection.confirm.clear()
+
+    for _ in range(5):
+        await asyncio.wait_for(producer.publish_event(EventType.STOCK_UPDATED, {"quantite": 1}), 0.1)
+    assert producer.connection.published == []
+
+    producer.connection.confirm.set()
+    await producer.stop()
+    assert producer.connection.published == ["products.stock.updated"] * 5
+    stats = producer.stats()
+    assert stats["published"] == 5 and stats["queued"] == 0
+    assert stats["latency_p50_ms"] is not None
+
+
+async def test_unconfirmed_events_are_retried(producer, monkeypatch):
+    """Test that failed publishes are retried until confirmed and flushed on stop"""
+    monkeypatch.setattr(settings, "EVENT_RETRY_DELAY_SECONDS", 0)
+    producer.start()
+    producer.connection.failures = 2
+
+    await producer.publish_events(EventType.PRODUCT_CREATED, [{"sku": "CAFE-001"}, {"sku": "CAFE-002"}])
+    await producer.stop()
+    assert len(producer.connection.published) == 2
+    assert producer.stats()["failed"] == 2
+
+
+async def test_backpressure_when_queue_full(producer, monkeypatch):
+    """Test that publishers wait for room, then get QueueFull"""
+    monkeypatch.setattr(settings, "EVENT_QUEUE_SIZE", 2)
+    monkeypatch.setattr(settings, "EVENT_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "EVENT_ENQUEUE_TIMEOUT_SECONDS", 0.05)
+    producer.start()
+    producer.connection.confirm.clear()
+
+    # One in flight, two queued
+    for _ in range(3):
+        await producer.publish_event(EventType.STOCK_UPDATED, {})
+        await asyncio.sleep(0)
+    with pytest.raises(asyncio.QueueFull):
+        await producer.publish_event(EventType.STOCK_UPDATED, {})
+    assert producer.stats()["rejected"] == 1
+
+    # Room made while waiting: accepted
+    waiting = asyncio.create_task(producer.publish_event(EventType.STOCK_UPDATED, {}))
+    producer.connection.confirm.set()
+    await waiting
+    await producer.stop()
+    assert len(producer.connection.published) == 4
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from aio_pika import ExchangeType, Message
+from aio_pika.exceptions import ChannelNotFoundEntity, ChannelPreconditionFailed
+
+from app.config import settings
+from app.core.railway_rabbitmq import RailwayRabbitMQ
+from app.events import memory_broker
+from app.events.connection import RabbitMQConnection
+from app.events.consumer import EventConsumer
+from app.events.memory_broker import InMemoryBroker
+from app.events.producer import EventProducer
+from app.schemas.event import EventType
+
+
+@pytest.fixture
+def broker(monkeypatch):
+    broker = InMemoryBroker()
+    monkeypatch.setattr(memory_broker, "memory_broker", broker)
+    return broker
+
+
+async def test_producer_to_consumer(broker, monkeypatch):
+    """Test that producer, Railway client and consumer exchange events over memory://"""
+    monkeypatch.setattr(settings, "CONSUMER_ACK_INTERVAL_SECONDS", 0.01)
+    connection = RabbitMQConnection("memory://", publish_channels=2)
+    producer = EventProducer(connection)
+    consumer = EventConsumer(connection, concurrency=4, ordering_key="product_id")
+    railway = RailwayRabbitMQ(connection)
+    handled = []
+    received = asyncio.Event()
+
+    async def handler(body):
+        handled.append(body)
+        if len(handled) == 21:
+            received.set()
+
+    assert await railway.connect() and await railway.setup()
+    await consumer.connect()
+    await consumer.bind_queue("products.#")
+    await consumer.start_consuming(handler)
+    producer.start()
+    for seq in range(20):
+        await producer.publish_event(EventType.STOCK_UPDATED, {"product_id": f"p{seq % 3}", "seq": seq})
+    assert await railway.publish("stock.updated", {"data": {"seq": 20}})
+    # Bound to nothing
+    assert await railway.publish("stock.updated", {}, target_service="factures")
+    await asyncio.wait_for(received.wait(), 1)
+    await producer.stop()
+    await consumer.stop_consuming()
+
+    for product_id in ("p0", "p1", "p2"):
+        seqs = [body["data"]["seq"] for body in handled if body["data"].get("product_id") == product_id]
+        assert seqs == sorted(seqs)
+    stats = broker.stats()
+    assert stats["published"] == 22 and stats["unroutable"] == 1
+    assert stats["acked"] == 21 and stats["queued"] == {"produits.queue": 0}
+    assert (await railway.health_check())["status"] == "healthy"
+
+
+async def test_prefetch_acks_and_requeue(broker):
+    """Test topic routing, prefetch, multiple acks, requeue on nack and broker-side errors"""
+    connection = await broker.connect()
+    channel = await connection.channel()
+    exchange = await channel.declare_exchange("events", ExchangeType.TOPIC, durable=True)
+    queue = await channel.declare_queue("stock", durable=True)
+    await queue.bind(exchange, routing_key="*.stock.#")
+    await channel.set_qos(prefetch_count=2)
+    delivered = []
+
+    async def hold(message):
+        delivered.append(message)
+
+    await queue.consume(hold)
+    for routing_key in ("products.stock.updated", "products.stock", "products.created", "a.b.stock"):
+        await exchange.publish(Message(routing_key.encode()), routing_key=routing_key)
+    await asyncio.sleep(0)
+    assert [message.body for message in delivered] == [b"products.stock.updated", b"products.stock"]
+    assert broker.stats()["unroutable"] == 2
+
+    await delivered[1].ack(multiple=True)
+    await asyncio.sleep(0)
+    assert len(delivered) == 2
+    with pytest.raises(ChannelPreconditionFailed):
+        await delivered[0].ack()
+
+    await exchange.publish(Message(b"again"), routing_key="products.stock.updated")
+    await asyncio.sleep(0)
+    await delivered[2].nack(requeue=True)
+    await asyncio.sleep(0)
+    assert delivered[3].body == b"again" and delivered[3].redelivered
+
+    with pytest.raises(ChannelNotFoundEntity):
+        await (await channel.get_exchange("missing", ensure=False)).publish(Message(b""), routing_key="x")
+    with pytest.raises(ChannelNotFoundEntity):
+        await channel.get_queue("missing")
@@ -0,0 +1,138 @@
+import asyncio
+import json
+
+import pytest
+from aio_pika import Message
+
+from app.events import memory_broker
+from app.events.connection import RabbitMQConnection
+from app.events.consumer import EventConsumer
+from app.events.memory_broker import InMemoryBroker
+from app.events.order_consumer import OrderStockConsumer
+from app.models.outbox import OutboxEvent
+from tests.conftest import TestingSessionLocal
+
+
+class FakeOrderMessage:
+    """Stand-in for an aio_pika incoming order message recording how it was settled"""
+
+    def __init__(self, delivery_tag, log, lines=None, event_type="order.created", message_id=None, body=None):
+        self.delivery_tag = delivery_tag
+        self.body = body or json.dumps({"event_type": event_type, "data": {"lignes": lines or []}}).encode()
+        self.content_type = "application/json"
+        self.content_encoding = None
+        self.headers = {}
+        self.routing_key = f"commandes.{event_type}"
+        self.message_id = message_id
+        self.log = log
+
+    async def ack(self, multiple=False):
+        self.log.append(("ack", self.delivery_tag, multiple))
+
+    async def nack(self, requeue=True):
+        self.log.append(("nack", self.delivery_tag, requeue))
+
+    async def reject(self, requeue=False):
+        self.log.append(("reject", self.delivery_tag, requeue))
+
+
+class FakeAlerts:
+    def __init__(self):
+        self.changes = []
+
+    async def publish(self, changes):
+        self.changes.extend(changes)
+
+
+@pytest.fixture
+def products(client, sample_category):
+    """Two products with 10 units in stock each"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_ids = []
+    for sku in ("CAFE-001", "CAFE-002"):
+        product = {"sku": sku, "nom": f"Café {sku}", "categorie_id": category_id, "prix_ht": "10.00"}
+        product_id = client.post("/api/v1/products/", json=product).json()["id"]
+        client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 10})
+        product_ids.append(product_id)
+    return product_ids
+
+
+def quantity(client, product_id):
+    return client.get(f"/api/v1/stock/product/{product_id}").json()["quantite_disponible"]
+
+
+def consumer(batch_size=100):
+    return OrderStockConsumer(None, TestingSessionLocal, FakeAlerts(), batch_size, 0.01, ["order.created"])
+
+
+async def test_orders_merged_per_product(client, db_session, products):
+    """Test that a batch of orders updates each product once, in one transaction acked after commit"""
+    hot, cold = products
+    orders = consumer(batch_size=4)
+    log = []
+    outbox_before = db_session.query(OutboxEvent).count()
+    messages = [
+        FakeOrderMessage(1, log, [{"produit_id": hot, "quantite": 2}], message_id="o1"),
+        FakeOrderMessage(2, log, [{"produit_id": hot, "quantite": 1}, {"produit_id": cold, "quantite": 4}]),
+        FakeOrderMessage(3, log, event_type="order.shipped"),
+        FakeOrderMessage(4, log, [{"produit_id": hot, "quantite": 3}], message_id="o4"),
+    ]
+    for message in messages:
+        await orders._receive(message)
+    assert orders._full.is_set()
+    await orders.flush()
+
+    assert (quantity(client, hot), quantity(client, cold)) == (4, 6)
+    assert log == [("ack", 4, True)]
+    assert orders.stats()["rows_updated"] == 2 and orders.stats()["lines"] == 4
+    assert db_session.query(OutboxEvent).count() == outbox_before + 1
+    assert len(orders.alerts.changes) == 2
+
+    # Redelivered: acked without decrementing again
+    await orders._receive(FakeOrderMessage(5, log, [{"produit_id": hot, "quantite": 2}], message_id="o1"))
+    await orders.flush()
+    assert quantity(client, hot) == 4
+    assert log[-1] == ("ack", 5, True)
+
+
+async def test_failing_order_rejected_alone(client, products):
+    """Test that a batch failing on one order applies the others one by one and rejects only that one"""
+    first, second = products
+    orders = consumer()
+    log = []
+    await orders._receive(FakeOrderMessage(1, log, body=b"not json"))
+    await orders._receive(FakeOrderMessage(2, log, [{"produit_id": first, "quantite": 0}]))
+    await orders._receive(FakeOrderMessage(3, log, [{"produit_id": first, "quantite": 3}], message_id="a"))
+    await orders._receive(FakeOrderMessage(4, log, [{"produit_id": second, "quantite": 50}], message_id="b"))
+    await orders._receive(FakeOrderMessage(5, log, [{"produit_id": second, "quantite": 5}], message_id="c"))
+    await orders.flush()
+
+    assert (quantity(client, first), quantity(client, second)) == (7, 5)
+    assert log == [("reject", 1, False), ("reject", 2, False), ("reject", 4, False), ("ack", 5, True)]
+    stats = orders.stats()
+    assert (stats["fallbacks"], stats["orders"], stats["rejected"]) == (1, 2, 3)
+
+
+async def test_orders_acked_on_their_own_channel(client, products, monkeypatch):
+    """Test that the order consumer acks on a channel no other consumer shares, given back when it stops"""
+    broker = InMemoryBroker()
+    monkeypatch.setattr(memory_broker, "memory_broker", broker)
+    connection = RabbitMQConnection("memory://", publish_channels=1)
+    events = EventConsumer(connection)
+    await events.connect()
+    orders = OrderStockConsumer(connection, TestingSessionLocal, FakeAlerts(), 10, 0.01, ["order.created"])
+    await orders.start()
+    assert orders.channel is not events.channel
+
+    order = {"event_type": "order.created", "data": {"lignes": [{"produit_id": products[0], "quantite": 3}]}}
+    await connection.publish(Message(json.dumps(order).encode()), "commandes.order.created")
+    for _ in range(100):
+        if orders.orders:
+            break
+        await asyncio.sleep(0.01)
+    await orders.stop()
+
+    assert quantity(client, products[0]) == 7
+    assert broker.stats()["acked"] == 1
+    assert connection.consume_channels == [events.channel]
+    await connection.close()
@@ -0,0 +1,145 @@
+from datetime import datetime, timedelta
+
+from app.config import settings
+from app.events.outbox import OutboxRelay, outbox_message_id
+from app.models.outbox import OutboxEvent
+from app.models.reservation import StockReservation
+from app.schemas.event import EventType
+from app.services.reservation_service import ReservationService
+from tests.conftest import TestingSessionLocal, create_product
+
+
+class FakeProducer:
+    """Stand-in for EventProducer: publish_message records (routing_key, body, message_id)"""
+
+    def __init__(self):
+        self.messages = []
+        self.fail = False
+        # Message ids failing on every attempt
+        self.poisoned = set()
+
+    async def publish_message(self, routing_key, body, message_id=None):
+        if self.fail or message_id in self.poisoned:
+            raise ConnectionError("broker unavailable")
+        self.messages.append((routing_key, body, message_id))
+
+
+def pending(db_session):
+    db_session.expire_all()
+    return (
+        db_session.query(OutboxEvent)
+        .filter(OutboxEvent.date_envoi.is_(None), OutboxEvent.date_echec.is_(None))
+        .order_by(OutboxEvent.id)
+        .all()
+    )
+
+
+def test_writes_stage_events_in_their_transaction(client, sample_category, db_session):
+    """Test that write endpoints write their events to the outbox, and failed writes none"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id)
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 5})
+    assert client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": -50}).status_code == 400
+    client.put(f"/api/v1/products/{product_id}", json={"nom": "Café Moka"})
+    client.delete(f"/api/v1/products/{product_id}")
+
+    events = pending(db_session)
+    assert [event.event_type for event in events] == [
+        EventType.PRODUCT_CREATED.value,
+        EventType.STOCK_UPDATED.value,
+        EventType.PRODUCT_UPDATED.value,
+        EventType.PRODUCT_DELETED.value,
+    ]
+    assert events[1].payload == {
+        "product_id": product_id,
+        "quantite_disponible": 5,
+        "quantite_reservee": 0,
+        "alerte_stock_bas": True,
+        "adjustment": 5,
+    }
+    assert events[2].payload["nom"] == "Café Moka"
+    assert events[0].routing_key == "products.product.created"
+
+
+def test_reservations_stage_stock_events(client, sample_category, db_session):
+    """Test that holds, their confirmation, release and expiry write STOCK_UPDATED to the outbox"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id)
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 10})
+    confirmed = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 3}).json()
+    client.post(f"/api/v1/stock/reservations/{confirmed['id']}/confirm")
+    released = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 2}).json()
+    client.post(f"/api/v1/stock/reservations/{released['id']}/release")
+    client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 4})
+    db_session.query(StockReservation).update({"date_expiration": datetime.utcnow() - timedelta(seconds=1)})
+    db_session.commit()
+    ReservationService(db_session).release_expired()
+
+    events = pending(db_session)[2:]
+    assert {event.event_type for event in events} == {EventType.STOCK_UPDATED.value}
+    assert [
+        (event.payload["reservation_id"], event.payload["quantite_disponible"], event.payload["quantite_reservee"])
+        for event in events[:4]
+    ] == [(confirmed["id"], 10, 3), (confirmed["id"], 7, 0), (released["id"], 7, 2), (released["id"], 7, 0)]
+    assert [item["quantite_reservee"] for item in events[5].payload["items"]] == [0]
+    assert events[5].payload["reservations_expirees"] == 1
+
+
+async def test_relay_publishes_and_marks_sent(client, sample_category, db_session, monkeypatch):
+    """Test that the relay publishes pending events in order, retries failures and purges sent ones"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    create_product(client, category_id)
+    bulk = [{"sku": "CAFE-002", "nom": "Café Robusta", "categorie_id": category_id, "prix_ht": "1.00"}]
+    assert client.post("/api/v1/products/bulk", json=bulk).json()["created"] == 1
+    producer = FakeProducer()
+    relay = OutboxRelay(producer, TestingSessionLocal, batch_size=10, interval=0)
+
+    producer.fail = True
+    assert await relay.relay_batch() == 0
+    # Same routing key: the second event is not tried past the failure of the first
+    assert [event.tentatives for event in pending(db_session)] == [1, 0]
+
+    producer.fail = False
+    assert await relay.relay_batch() == 2
+    assert await relay.relay_batch() == 0
+    assert pending(db_session) == []
+    routing_keys = [routing_key for routing_key, _, _ in producer.messages]
+    assert routing_keys == ["products.product.created"] * 2
+    message_ids = [message_id for _, _, message_id in producer.messages]
+    assert len(set(message_ids)) == 2
+
+    assert await relay.purge() == 0
+    monkeypatch.setattr(settings, "OUTBOX_RETENTION_HOURS", 0)
+    db_session.query(OutboxEvent).update({"date_envoi": datetime.utcnow() - timedelta(seconds=1)})
+    db_session.commit()
+    assert await relay.purge() == 2
+    assert relay.stats() == {"relayed": 2, "failed": 1, "parked": 0, "purged": 2}
+
+
+async def test_relay_keeps_key_order_and_parks_poison_events(client, sample_category, db_session, monkeypatch):
+    """Test that a failing event holds back the later ones of its routing key only, until it is parked"""
+    monkeypatch.setattr(settings, "OUTBOX_MAX_ATTEMPTS", 2)
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id)
+    for quantity in (5, 3):
+        client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": quantity})
+    created, poison, later = pending(db_session)
+    producer = FakeProducer()
+    producer.poisoned.add(outbox_message_id(poison.id))
+    relay = OutboxRelay(producer, TestingSessionLocal, batch_size=10, interval=0)
+
+    # The product event goes out; the second stock event waits behind the failed first one
+    assert await relay.relay_batch() == 1
+    assert [event.id for event in pending(db_session)] == [poison.id, later.id]
+    # Second failure: parked, and the relay moves on
+    assert await relay.relay_batch() == 0
+    assert await relay.relay_batch() == 1
+    assert pending(db_session) == []
+
+    parked = db_session.query(OutboxEvent).filter(OutboxEvent.date_echec.isnot(None)).all()
+    assert [(event.id, event.tentatives, event.date_envoi) for event in parked] == [(poison.id, 2, None)]
+    assert [message_id for _, _, message_id in producer.messages] == [
+        outbox_message_id(created.id),
+        outbox_message_id(later.id),
+    ]
+    assert relay.stats()["parked"] == 1
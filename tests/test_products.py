@@ -1,6 +1,15 @@
+import csv
+import io
+import json
 from decimal import Decimal
+from uuid import uuid4
 
+import fastapi.routing
 import pytest
+from sqlalchemy import event
+
+from app.config import settings
+from tests.conftest import async_engine
 
 
 def test_create_product(client, sample_category):
@@ -138,3 +147,244 @@ def test_prix_ttc_calculation(client, sample_category):
 
     # prix_ttc should be 12.00 (10.00 * 1.20)
     assert float(data["prix_ttc"]) == 12.00
+
+
+def test_cursor_pagination(client, sample_category):
+    """Test walking the product list with keyset cursors"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    for i in range(3):
+        product_data = {"sku": f"CAFE-00{i}", "nom": f"Café {i}", "categorie_id": category_id, "prix_ht": "10.00"}
+        client.post("/api/v1/products/", json=product_data)
+
+    # First page
+    response = client.get("/api/v1/products/?limit=2")
+    assert response.status_code == 200
+    first_page = response.json()
+    assert len(first_page) == 2
+    cursor = response.headers["X-Next-Cursor"]
+
+    # Second (last) page
+    response = client.get(f"/api/v1/products/?limit=2&cursor={cursor}")
+    assert response.status_code == 200
+    second_page = response.json()
+    assert len(second_page) == 1
+    assert "X-Next-Cursor" not in response.headers
+
+    ids = {p["id"] for p in first_page + second_page}
+    assert len(ids) == 3
+
+
+def test_invalid_cursor(client):
+    """Test that a malformed cursor is rejected"""
+    response = client.get("/api/v1/products/?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
+def test_full_text_search(client, sample_category):
+    """Test full-text search across description, origin and quality notes"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    product1 = {
+        "sku": "CAFE-001",
+        "nom": "Café Moka",
+        "categorie_id": category_id,
+        "prix_ht": "15.99",
+        "origine": "Éthiopie",
+        "notes_qualite": "Bio, notes florales",
+    }
+    product2 = {"sku": "CAFE-002", "nom": "Café Santos", "categorie_id": category_id, "prix_ht": "12.99"}
+    create_response = client.post("/api/v1/products/", json=product1)
+    client.post("/api/v1/products/", json=product2)
+
+    # Accent-insensitive match on the origin
+    response = client.get("/api/v1/products/?search=ethiopie")
+    assert [p["sku"] for p in response.json()] == ["CAFE-001"]
+
+    # Quality notes are indexed too
+    response = client.get("/api/v1/products/?search=florales")
+    assert [p["sku"] for p in response.json()] == ["CAFE-001"]
+
+    # The index follows updates
+    product_id = create_response.json()["id"]
+    client.put(f"/api/v1/products/{product_id}", json={"notes_qualite": "Torréfaction lente"})
+    response = client.get("/api/v1/products/?search=florales")
+    assert response.json() == []
+
+
+def test_bulk_create_products(client, sample_category):
+    """Test importing a JSON array of products with a per-row report"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+    client.post(
+        "/api/v1/products/", json={"sku": "CAFE-000", "nom": "Existant", "categorie_id": category_id, "prix_ht": "9.00"}
+    )
+
+    rows = [
+        {"sku": "CAFE-001", "nom": "Café 1", "categorie_id": category_id, "prix_ht": "10.00"},
+        {"sku": "CAFE-001", "nom": "Doublon", "categorie_id": category_id, "prix_ht": "10.00"},
+        {"sku": "CAFE-000", "nom": "Déjà présent", "categorie_id": category_id, "prix_ht": "10.00"},
+        {"sku": "CAFE-002", "nom": "Sans prix", "categorie_id": category_id},
+        {"sku": "CAFE-003", "nom": "Café 3", "categorie_id": str(uuid4()), "prix_ht": "10.00"},
+    ]
+    response = client.post("/api/v1/products/bulk", json=rows)
+    assert response.status_code == 200
+    report = response.json()
+    assert report["created"] == 1
+    assert report["failed"] == 4
+    assert [r["status"] for r in report["results"]] == ["created", "error", "error", "error", "error"]
+    assert "prix_ht" in report["results"][3]["error"]
+
+    # The product got its price and initial stock
+    product_id = report["results"][0]["id"]
+    product = client.get(f"/api/v1/products/{product_id}").json()
+    assert float(product["prix_ttc"]) == 12.00
+    stock = client.get(f"/api/v1/stock/product/{product_id}").json()
+    assert stock["quantite_disponible"] == 0
+
+
+def test_bulk_create_products_ndjson(client, sample_category):
+    """Test importing products from an NDJSON stream"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    lines = [
+        json.dumps({"sku": f"CAFE-{i:03d}", "nom": f"Café {i}", "categorie_id": category_id, "prix_ht": "10.00"})
+        for i in range(5)
+    ]
+    lines.insert(2, "{not json")
+    response = client.post(
+        "/api/v1/products/bulk",
+        content="\n".join(lines) + "\n",
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["created"] == 5
+    assert report["results"][2]["status"] == "error"
+    assert len(client.get("/api/v1/products/").json()) == 5
+
+
+def test_export_products_csv(client, sample_category):
+    """Test streaming the catalog as CSV with stock levels"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    rows = [
+        {"sku": f"CAFE-{i:03d}", "nom": f"Café {i}", "categorie_id": category_id, "prix_ht": "10.00"} for i in range(3)
+    ]
+    client.post("/api/v1/products/bulk", json=rows)
+
+    response = client.get("/api/v1/products/export?format=csv&include_stock=true")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    lines = list(csv.DictReader(io.StringIO(response.text)))
+    assert sorted(line["sku"] for line in lines) == ["CAFE-000", "CAFE-001", "CAFE-002"]
+    assert lines[0]["quantite_disponible"] == "0"
+    assert lines[0]["statut"] == "actif"
+
+
+def test_export_products_ndjson_filtered(client, sample_category):
+    """Test streaming the catalog as NDJSON with the list filters"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    product1 = {"sku": "CAFE-001", "nom": "Café Arabica", "categorie_id": category_id, "prix_ht": "10.00"}
+    product2 = {"sku": "CAFE-002", "nom": "Café Robusta", "categorie_id": category_id, "prix_ht": "10.00"}
+    client.post("/api/v1/products/", json=product1)
+    client.post("/api/v1/products/", json=product2)
+
+    response = client.get("/api/v1/products/export?format=ndjson&search=robusta")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["sku"] for line in lines] == ["CAFE-002"]
+    assert "quantite_disponible" not in lines[0]
+
+    assert client.get("/api/v1/products/export?format=xml").status_code == 422
+
+
+def test_fast_serialization_matches_fastapi(client, sample_category, monkeypatch):
+    """Test that the single-pass serialization produces the same JSON as response_model"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+    product_data = {"sku": "CAFE-001", "nom": "Café Arabica Premium", "categorie_id": category_id, "prix_ht": "15.99"}
+    product_id = client.post("/api/v1/products/", json=product_data).json()["id"]
+
+    async def no_second_pass(*args, **kwargs):
+        raise AssertionError("response_model serialization should be skipped")
+
+    urls = ["/api/v1/products/", f"/api/v1/products/{product_id}", "/api/v1/categories/", "/api/v1/stock/"]
+    with monkeypatch.context() as patch:
+        patch.setattr(fastapi.routing, "serialize_response", no_second_pass)
+        fast = [client.get(url) for url in urls]
+    monkeypatch.setattr(settings, "FAST_SERIALIZATION", False)
+    slow = [client.get(url) for url in urls]
+
+    for fast_response, slow_response in zip(fast, slow):
+        assert fast_response.headers["content-type"] == slow_response.headers["content-type"]
+        assert fast_response.headers["ETag"] == slow_response.headers["ETag"]
+        assert fast_response.content == slow_response.content
+
+
+def test_include_relations(client, sample_category, monkeypatch):
+    """Test embedding the stock and category, with both serialization paths"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+    product_data = {"sku": "CAFE-001", "nom": "Café Arabica", "categorie_id": category_id, "prix_ht": "10.00"}
+    product_id = client.post("/api/v1/products/", json=product_data).json()["id"]
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 50})
+
+    plain = client.get(f"/api/v1/products/{product_id}")
+    assert "stock" not in plain.json() and "categorie" not in plain.json()
+
+    for fast in (True, False):
+        monkeypatch.setattr(settings, "FAST_SERIALIZATION", fast)
+        response = client.get(f"/api/v1/products/{product_id}?include=stock")
+        assert response.json()["stock"]["quantite_disponible"] == 50
+        assert "categorie" not in response.json()
+        assert response.headers["ETag"] != plain.headers["ETag"]
+
+        products = client.get("/api/v1/products/?include=stock,category").json()
+        assert products[0]["stock"]["quantite_disponible"] == 50
+        assert products[0]["categorie"]["code"] == "ARAB"
+
+    etag = client.get(f"/api/v1/products/{product_id}?include=stock").headers["ETag"]
+    cached = client.get(f"/api/v1/products/{product_id}?include=stock", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": -5})
+    changed = client.get(f"/api/v1/products/{product_id}?include=stock", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["stock"]["quantite_disponible"] == 45
+
+    assert client.get("/api/v1/products/?include=stock,supplier").status_code == 400
+
+
+def test_include_query_count(client, sample_category):
+    """Test that embedding relations costs a fixed number of queries whatever the page size"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+    for i in range(10):
+        product_data = {"sku": f"CAFE-{i:03d}", "nom": f"Café {i}", "categorie_id": category_id, "prix_ht": "10.00"}
+        product_id = client.post("/api/v1/products/", json=product_data).json()["id"]
+        client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": i + 1})
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # The listing runs on the async sessions of the request handlers
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        counts = []
+        for limit in (2, 10):
+            statements.clear()
+            response = client.get(f"/api/v1/products/?limit={limit}&include=stock,category")
+            assert len(response.json()) == limit
+            assert all(product["stock"] and product["categorie"] for product in response.json())
+            counts.append(len(statements))
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", count)
+    assert 0 < counts[0] == counts[1] <= 3
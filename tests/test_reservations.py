@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.models.reservation import StockReservation
+from app.services.reservation_service import ReservationService
+
+
+@pytest.fixture
+def product_id(client, sample_category):
+    """A product with 10 units in stock"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    product_data = {"sku": "CAFE-001", "nom": "Café Arabica Premium", "categorie_id": category_id, "prix_ht": "15.99"}
+    product_id = client.post("/api/v1/products/", json=product_data).json()["id"]
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 10})
+    return product_id
+
+
+def get_stock(client, product_id):
+    return client.get(f"/api/v1/stock/product/{product_id}").json()
+
+
+def test_reserve_and_confirm(client, product_id):
+    """Test that a hold reduces availability and a confirmation ships it"""
+    response = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 7})
+    assert response.status_code == 201
+    reservation = response.json()
+    assert reservation["statut"] == "active"
+
+    stock = get_stock(client, product_id)
+    assert (stock["quantite_disponible"], stock["quantite_reservee"]) == (10, 7)
+
+    # Only 3 units are still available, for holds and stock exits alike
+    response = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 4})
+    assert response.status_code == 400
+    response = client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": -4})
+    assert response.status_code == 400
+
+    response = client.post(f"/api/v1/stock/reservations/{reservation['id']}/confirm")
+    assert response.status_code == 200
+    assert response.json()["statut"] == "confirmee"
+    stock = get_stock(client, product_id)
+    assert (stock["quantite_disponible"], stock["quantite_reservee"]) == (3, 0)
+    assert stock["date_derniere_sortie"] is not None
+
+    # A hold is closed only once
+    assert client.post(f"/api/v1/stock/reservations/{reservation['id']}/confirm").status_code == 400
+    assert client.post(f"/api/v1/stock/reservations/{reservation['id']}/release").status_code == 400
+
+
+def test_reserve_and_release(client, product_id):
+    """Test that a released hold is available again"""
+    reservation = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 10}).json()
+    assert get_stock(client, product_id)["alerte_stock_bas"] is True
+
+    response = client.post(f"/api/v1/stock/reservations/{reservation['id']}/release")
+    assert response.status_code == 200
+    assert response.json()["statut"] == "liberee"
+    stock = get_stock(client, product_id)
+    assert (stock["quantite_disponible"], stock["quantite_reservee"]) == (10, 0)
+
+    assert client.post(f"/api/v1/stock/reservations/{uuid4()}/release").status_code == 404
+    response = client.post("/api/v1/stock/reservations/", json={"produit_id": str(uuid4()), "quantite": 1})
+    assert response.status_code == 404
+
+
+def test_update_keeps_reserved_quantity(client, product_id):
+    """Test that a PUT can neither set the reserved quantity nor drop the stock below it"""
+    client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 7})
+    stock_id = get_stock(client, product_id)["id"]
+
+    response = client.put(f"/api/v1/stock/{stock_id}", json={"quantite_disponible": 6})
+    assert response.status_code == 400
+    assert "reserved" in response.json()["detail"]
+
+    response = client.put(f"/api/v1/stock/{stock_id}", json={"quantite_disponible": 8, "quantite_reservee": 0})
+    assert response.status_code == 200
+    stock = get_stock(client, product_id)
+    assert (stock["quantite_disponible"], stock["quantite_reservee"]) == (8, 7)
+
+
+def test_expired_reservations_are_swept(client, db_session, product_id):
+    """Test that expired holds cannot be confirmed and are released in bulk"""
+    ids = [
+        client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 2}).json()["id"]
+        for _ in range(3)
+    ]
+    db_session.query(StockReservation).filter(StockReservation.id.in_(ids[:2])).update(
+        {"date_expiration": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db_session.commit()
+
+    response = client.post(f"/api/v1/stock/reservations/{ids[0]}/confirm")
+    assert response.status_code == 400
+    assert "expired" in response.json()["detail"]
+
+    assert ReservationService(db_session).release_expired().released == 2
+    assert get_stock(client, product_id)["quantite_reservee"] == 2
+    assert client.get(f"/api/v1/stock/reservations/{ids[0]}").json()["statut"] == "expiree"
+    assert client.get(f"/api/v1/stock/reservations/{ids[2]}").json()["statut"] == "active"
+
+
+def test_deleted_stock_releases_its_reservations(client, product_id):
+    """Test that deleting a stock releases its holds, and a new stock starts with nothing reserved"""
+    reservation = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 4}).json()
+    assert client.delete(f"/api/v1/stock/{get_stock(client, product_id)['id']}").status_code == 204
+
+    response = client.post(f"/api/v1/stock/reservations/{reservation['id']}/confirm")
+    assert response.status_code == 400
+    assert "liberee" in response.json()["detail"]
+    assert client.get(f"/api/v1/stock/reservations/{reservation['id']}").json()["statut"] == "liberee"
+
+    stock = {"produit_id": product_id, "quantite_disponible": 5, "quantite_reservee": 5}
+    response = client.post("/api/v1/stock/", json=stock)
+    assert response.status_code == 201
+    assert response.json()["quantite_reservee"] == 0
@@ -0,0 +1,94 @@
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from app.config import settings
+from app.models.product import ProductStatus
+from app.schemas.product import ProductResponse
+from app.services.search_index import ProductSearchIndex, product_search_index, tokenize
+
+
+def make_product(nom, **fields):
+    now = datetime.utcnow()
+    data = {
+        "id": uuid4(),
+        "sku": f"SKU-{uuid4().hex[:8]}",
+        "nom": nom,
+        "categorie_id": uuid4(),
+        "prix_ht": Decimal("10.00"),
+        "prix_ttc": Decimal("12.00"),
+        "statut": ProductStatus.ACTIF,
+        "date_creation": now,
+        "date_modification": now,
+    }
+    data.update(fields)
+    return ProductResponse(**data)
+
+
+@pytest.fixture
+def memory_search(monkeypatch, db_session):
+    """Switch product search to the in-memory index, built from the test database"""
+    monkeypatch.setattr(settings, "SEARCH_BACKEND", "memory")
+    product_search_index.build(db_session)
+    yield product_search_index
+    product_search_index.build(db_session)
+
+
+def test_tokenize_strips_accents():
+    """Test that tokens are lowercase and accent-free"""
+    assert tokenize("Café d'Éthiopie") == ["cafe", "d", "ethiopie"]
+
+
+def test_index_ranking_and_prefix():
+    """Test BM25 ranking, prefix matching and AND semantics"""
+    index = ProductSearchIndex(max_documents=10)
+    index.ready = True
+    moka = make_product("Moka Arabica", origine="Éthiopie")
+    santos = make_product("Santos", description="Un arabica doux du Brésil")
+    robusta = make_product("Robusta", origine="Vietnam")
+    index.add_many([moka, santos, robusta])
+
+    results = index.search("arab")
+    # A match in the name weighs more than one in the description
+    assert [p.id for p in results] == [moka.id, santos.id]
+    assert [p.id for p in index.search("arabica ethiopie")] == [moka.id]
+    assert index.search("arabica vietnam") == []
+
+    index.remove(moka.id)
+    assert [p.id for p in index.search("arabica")] == [santos.id]
+
+
+def test_index_is_bounded():
+    """Test that a full index stops answering so the database is used"""
+    index = ProductSearchIndex(max_documents=1)
+    index.ready = True
+    index.add(make_product("Moka"))
+    index.add(make_product("Santos"))
+
+    stats = index.stats()
+    assert stats["documents"] == 1
+    assert stats["complete"] is False
+    assert stats["memory_bytes"] > 0
+    assert index.search("moka") is None
+
+
+def test_memory_search_follows_writes(client, sample_category, memory_search):
+    """Test that the in-memory index is kept in sync by product writes"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    product_data = {"sku": "CAFE-001", "nom": "Café Moka", "categorie_id": category_id, "prix_ht": "15.99"}
+    product_id = client.post("/api/v1/products/", json=product_data).json()["id"]
+
+    response = client.get("/api/v1/products/?search=moka")
+    assert [p["id"] for p in response.json()] == [product_id]
+
+    client.put(f"/api/v1/products/{product_id}", json={"nom": "Café Santos"})
+    assert client.get("/api/v1/products/?search=moka").json() == []
+    assert len(client.get("/api/v1/products/?search=santos").json()) == 1
+
+    client.delete(f"/api/v1/products/{product_id}")
+    assert client.get("/api/v1/products/?search=santos").json() == []
+    assert memory_search.stats()["documents"] == 0
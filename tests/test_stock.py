@@ -1,3 +1,5 @@
+from uuid import uuid4
+
 import pytest
 
 
@@ -81,6 +83,33 @@ def test_get_low_stock_alerts(client, sample_category):
     assert data[0]["alerte_stock_bas"] is True
 
 
+def test_low_stock_alerts_by_severity(client, sample_category):
+    """Test that alerts are paginated by severity and can embed the product"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    # Default minimum is 10: 7, 0, 3, then 12 which is not in alert
+    for i, quantity in enumerate([7, 0, 3, 12]):
+        product_data = {"sku": f"CAFE-{i:03d}", "nom": f"Café {i}", "categorie_id": category_id, "prix_ht": "10.00"}
+        product_id = client.post("/api/v1/products/", json=product_data).json()["id"]
+        if quantity:
+            client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": quantity})
+
+    first = client.get("/api/v1/stock/alerts?limit=2")
+    assert [alert["severite"] for alert in first.json()] == [0.0, 0.3]
+    assert "sku" not in first.json()[0]
+    second = client.get(f"/api/v1/stock/alerts?limit=2&cursor={first.headers['X-Next-Cursor']}")
+    assert [alert["quantite_disponible"] for alert in second.json()] == [7]
+    assert "X-Next-Cursor" not in second.headers
+
+    alerts = client.get("/api/v1/stock/alerts?include_product=true").json()
+    assert [(alert["sku"], alert["nom"]) for alert in alerts] == [
+        ("CAFE-001", "Café 1"),
+        ("CAFE-002", "Café 2"),
+        ("CAFE-000", "Café 0"),
+    ]
+
+
 def test_negative_stock_prevention(client, sample_category):
     """Test that stock cannot go negative"""
     # Create a category and product
@@ -95,3 +124,65 @@ def test_negative_stock_prevention(client, sample_category):
     adjustment = {"quantite": -100}
     response = client.post(f"/api/v1/stock/product/{product_id}/adjust", json=adjustment)
     assert response.status_code == 400
+
+
+def test_adjust_stock_movements(client, sample_category):
+    """Test that successive adjustments accumulate and record entry/exit dates"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    product_data = {"sku": "CAFE-001", "nom": "Café Arabica Premium", "categorie_id": category_id, "prix_ht": "15.99"}
+    product_id = client.post("/api/v1/products/", json=product_data).json()["id"]
+
+    data = client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 30}).json()
+    assert data["date_derniere_entree"] is not None
+    assert data["date_derniere_sortie"] is None
+    assert data["alerte_stock_bas"] is False
+
+    data = client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": -25}).json()
+    assert data["quantite_disponible"] == 5
+    assert data["date_derniere_sortie"] is not None
+    assert data["alerte_stock_bas"] is True
+
+    # A refused exit leaves the stock untouched
+    response = client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": -6})
+    assert response.status_code == 400
+    assert client.get(f"/api/v1/stock/product/{product_id}").json()["quantite_disponible"] == 5
+
+    response = client.post(f"/api/v1/stock/product/{uuid4()}/adjust", json={"quantite": 1})
+    assert response.status_code == 404
+
+
+def test_adjust_stock_batch(client, sample_category):
+    """Test that a batch is applied in one transaction, all or nothing"""
+    cat_response = client.post("/api/v1/categories/", json=sample_category)
+    category_id = cat_response.json()["id"]
+
+    product_ids = []
+    for sku in ("CAFE-001", "CAFE-002"):
+        product_data = {"sku": sku, "nom": f"Café {sku}", "categorie_id": category_id, "prix_ht": "15.99"}
+        product_ids.append(client.post("/api/v1/products/", json=product_data).json()["id"])
+    first, second = product_ids
+
+    lignes = [
+        {"produit_id": first, "quantite": 20},
+        {"produit_id": second, "quantite": 50},
+        {"produit_id": first, "quantite": -5},
+    ]
+    response = client.post("/api/v1/stock/adjust-batch", json={"lignes": lignes})
+    assert response.status_code == 200
+    quantities = {stock["produit_id"]: stock["quantite_disponible"] for stock in response.json()}
+    assert quantities == {first: 15, second: 50}
+
+    # The second line fails, so the first one is rolled back too
+    lignes = [{"produit_id": second, "quantite": -10}, {"produit_id": first, "quantite": -16}]
+    response = client.post("/api/v1/stock/adjust-batch", json={"lignes": lignes})
+    assert response.status_code == 400
+    assert client.get(f"/api/v1/stock/product/{second}").json()["quantite_disponible"] == 50
+
+    lignes = [{"produit_id": second, "quantite": -10}, {"produit_id": str(uuid4()), "quantite": 1}]
+    response = client.post("/api/v1/stock/adjust-batch", json={"lignes": lignes})
+    assert response.status_code == 400
+    assert client.get(f"/api/v1/stock/product/{second}").json()["quantite_disponible"] == 50
+
+    assert client.post("/api/v1/stock/adjust-batch", json={"lignes": []}).status_code == 422
@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+
+from app.events.stock_alerts import StockAlertPublisher, stock_alert_publisher
+from app.models.reservation import StockReservation
+from app.schemas.event import EventType
+from app.schemas.stock import StockResponse
+from app.services.reservation_service import ReservationService
+from app.services.stock_service import StockChange
+from tests.conftest import create_product
+
+
+class FakeProducer:
+    """Stand-in for EventProducer recording (event_type, data) instead of publishing"""
+
+    def __init__(self):
+        self.events = []
+        self.fail = False
+
+    async def publish_event(self, event_type, data, routing_key="products"):
+        if self.fail:
+            raise ConnectionError("broker unavailable")
+        self.events.append((event_type, data))
+
+    async def publish_events(self, event_type, items, routing_key="products", batch_size=100):
+        for data in items:
+            await self.publish_event(event_type, data, routing_key)
+
+
+def stock(product_id, quantity, minimum=10):
+    return StockResponse(
+        id=uuid4(),
+        produit_id=product_id,
+        quantite_disponible=quantity,
+        quantite_minimum=minimum,
+        alerte_stock_bas=quantity < minimum,
+        date_modification=datetime.utcnow(),
+    )
+
+
+def alerts(producer):
+    return [(event_type, data) for event_type, data in producer.events if event_type != EventType.STOCK_UPDATED]
+
+
+def test_alerts_only_on_edges(client, sample_category, monkeypatch):
+    """Test that writes publish an alert when the flag turns on and a recovery when it turns off"""
+    producer = FakeProducer()
+    monkeypatch.setattr(stock_alert_publisher, "producer", producer)
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id, "CAFE-001")
+
+    # Created at 0 under the default minimum of 10: already in alert, so no edge
+    for quantity in (3, 2):
+        client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": quantity})
+    assert alerts(producer) == []
+
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 20})
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 1})
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": -20})
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": -1})
+    assert [event_type for event_type, _ in alerts(producer)] == [
+        EventType.STOCK_ALERT_RECOVERED,
+        EventType.STOCK_LOW_ALERT,
+    ]
+    assert alerts(producer)[1][1]["quantite_disponible"] == 6
+
+    stock_id = client.get(f"/api/v1/stock/product/{product_id}").json()["id"]
+    client.put(f"/api/v1/stock/{stock_id}", json={"quantite_minimum": 5})
+    other_id = create_product(client, category_id, "CAFE-002")
+    lignes = [{"produit_id": product_id, "quantite": -4}, {"produit_id": other_id, "quantite": 50}]
+    client.post("/api/v1/stock/adjust-batch", json={"lignes": lignes})
+    assert [(event_type, data["product_id"]) for event_type, data in alerts(producer)[2:]] == [
+        (EventType.STOCK_ALERT_RECOVERED, product_id),
+        (EventType.STOCK_LOW_ALERT, product_id),
+        (EventType.STOCK_ALERT_RECOVERED, other_id),
+    ]
+
+
+def test_reservations_publish_alert_edges(client, sample_category, db_session, monkeypatch):
+    """Test that holds, their release, confirmation and expiry publish the edges they cause"""
+    producer = FakeProducer()
+    monkeypatch.setattr(stock_alert_publisher, "producer", producer)
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id, "CAFE-001")
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 20})
+    assert [event_type for event_type, _ in alerts(producer)] == [EventType.STOCK_ALERT_RECOVERED]
+
+    # 20 - 12 available: under the minimum of 10
+    reservation = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 12}).json()
+    assert alerts(producer)[1] == (
+        EventType.STOCK_LOW_ALERT,
+        {
+            "product_id": product_id,
+            "quantite_disponible": 20,
+            "quantite_reservee": 12,
+            "quantite_minimum": 10,
+            "alerte_stock_bas": True,
+        },
+    )
+    client.post(f"/api/v1/stock/reservations/{reservation['id']}/release")
+    assert alerts(producer)[2][0] == EventType.STOCK_ALERT_RECOVERED
+
+    # Confirmed: the stock drops to 8
+    reservation = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 12}).json()
+    client.post(f"/api/v1/stock/reservations/{reservation['id']}/confirm")
+    assert [event_type for event_type, _ in alerts(producer)[3:]] == [EventType.STOCK_LOW_ALERT]
+
+    client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": 12})
+    reservation = client.post("/api/v1/stock/reservations/", json={"produit_id": product_id, "quantite": 15}).json()
+    db_session.query(StockReservation).filter(StockReservation.id == reservation["id"]).update(
+        {"date_expiration": datetime.utcnow() - timedelta(seconds=1)}
+    )
+    db_session.commit()
+    expiry = ReservationService(db_session).release_expired()
+    assert [(change.stock.quantite_reservee, change.alert_changed) for change in expiry.changes] == [(0, True)]
+
+
+async def test_digest_coalesces_edges():
+    """Test that a window merges edges into one digest per flush, keeping only net changes"""
+    producer = FakeProducer()
+    publisher = StockAlertPublisher(producer, window=60)
+    flapping, recovering = uuid4(), uuid4()
+
+    await publisher.publish([StockChange(stock(flapping, 20), True)])
+    await publisher.publish([StockChange(stock(flapping, 5), False), StockChange(stock(recovering, 20), True)])
+    # Not an edge: ignored
+    await publisher.publish([StockChange(stock(uuid4(), 3), True)])
+    assert producer.events == []
+    assert publisher.stats()["coalesced"] == 1
+
+    producer.fail = True
+    with pytest.raises(ConnectionError):
+        await publisher.flush()
+    # Held again, with the state from the start of the window
+    await publisher.publish([StockChange(stock(recovering, 0), False)])
+    producer.fail = False
+    await publisher.flush()
+    await publisher.flush()
+    assert producer.events == []
+
+    await publisher.publish([StockChange(stock(flapping, 30), True)])
+    await publisher.flush()
+    event_type, data = producer.events[0]
+    assert event_type == EventType.STOCK_ALERT_DIGEST
+    assert data["alertes"] == []
+    assert [alert["product_id"] for alert in data["retablis"]] == [str(flapping)]
@@ -0,0 +1,77 @@
+import json
+from uuid import UUID
+
+from app.services.stock_stream import StockStreamHub
+from tests.conftest import TestingSessionLocal, create_product
+
+
+def drain(subscriber):
+    """(event, data) of the frames buffered for a subscriber"""
+    frames = []
+    while not subscriber.queue.empty():
+        frame = subscriber.queue.get_nowait()
+        if frame is None:
+            frames.append(None)
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.decode().strip().split("\n"))
+        frames.append((fields["event"], json.loads(fields["data"])))
+    return frames
+
+
+async def test_hub_streams_updates_and_alert_edges(client, sample_category):
+    """Test that subscribers get a snapshot, then coalesced updates of their products and alert edges"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    followed = create_product(client, category_id, "CAFE-001")
+    other = create_product(client, category_id, "CAFE-002")
+    hub = StockStreamHub(TestingSessionLocal, interval=3600, buffer_size=10)
+    try:
+        by_product = await hub.subscribe(frozenset([UUID(followed)]), alerts=False)
+        by_alert = await hub.subscribe(frozenset(), alerts=True)
+        assert [(event, data["quantite_disponible"]) for event, data in drain(by_product)] == [("stock.updated", 0)]
+        assert drain(by_alert) == []
+
+        # Two changes of the followed product within a poll: one frame with its current level
+        client.post(f"/api/v1/stock/product/{followed}/adjust", json={"quantite": 5})
+        client.post(f"/api/v1/stock/product/{followed}/adjust", json={"quantite": 45})
+        client.post(f"/api/v1/stock/product/{other}/adjust", json={"quantite": 3})
+        assert await hub.poll() == 2
+        assert [(event, data["quantite_disponible"]) for event, data in drain(by_product)] == [("stock.updated", 50)]
+        # Both products started in alert: only the followed one recovered
+        assert [(event, data["produit_id"]) for event, data in drain(by_alert)] == [("stock.alert_recovered", followed)]
+
+        client.post(f"/api/v1/stock/product/{followed}/adjust", json={"quantite": -45})
+        await hub.poll()
+        assert [event for event, _ in drain(by_alert)] == ["stock.low_alert"]
+        assert await hub.poll() == 0
+        assert hub.stats()["subscribers"] == 2
+    finally:
+        await hub.stop()
+
+
+async def test_slow_subscriber_is_disconnected(client, sample_category):
+    """Test that a subscriber whose buffer is full is dropped without holding back the others"""
+    category_id = client.post("/api/v1/categories/", json=sample_category).json()["id"]
+    product_id = create_product(client, category_id, "CAFE-001")
+    hub = StockStreamHub(TestingSessionLocal, interval=3600, buffer_size=1)
+    try:
+        slow = await hub.subscribe(frozenset([UUID(product_id)]), alerts=False)
+        fast = await hub.subscribe(frozenset([UUID(product_id)]), alerts=False)
+        drain(fast)
+        for quantity in (1, 2):
+            client.post(f"/api/v1/stock/product/{product_id}/adjust", json={"quantite": quantity})
+            await hub.poll()
+            assert len(drain(fast)) == 1
+
+        # The stream of the slow subscriber ends; it no longer receives anything
+        assert hub.stats()["dropped"] == 1
+        assert hub.stats()["subscribers"] == 1
+        frames = [frame async for frame in hub.stream(slow, heartbeat=1)]
+        assert frames == [b"retry: 3000\n\n"]
+        assert hub.stats()["subscribers"] == 1
+    finally:
+        await hub.stop()
+
+
+def test_stream_requires_a_subscription(client):
+    """Test that a stream without products nor alerts is rejected"""
+    assert client.get("/api/v1/stock/stream").status_code == 400